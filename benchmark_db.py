@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Database ingest benchmark.
+
+Compares the old logging pattern (connect, insert, commit and close for
+every row) with DatabaseLogger's persistent WAL connection and batched
+background writer, writing traffic_log rows into temporary databases,
+and with the writer appending to segment files instead (throughput
+includes folding the segments into the rollups).
+
+Usage:
+    python3 benchmark_db.py [rows]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from database_logger import DatabaseLogger
+
+
+def legacy_log_traffic(db_file, pid, process_name, upload_bytes, download_bytes,
+                       upload_rate, download_rate, protocols):
+    """The per-call connection pattern DatabaseLogger used to follow"""
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO traffic_log
+        (pid, process_name, upload_bytes, download_bytes,
+         upload_rate, download_rate, total_bytes, protocols)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (pid, process_name, upload_bytes, download_bytes,
+          upload_rate, download_rate, upload_bytes + download_bytes,
+          ','.join(protocols)))
+    conn.commit()
+    conn.close()
+
+
+def sample_rows(count):
+    """Generate synthetic traffic rows for 50 processes"""
+    for i in range(count):
+        pid = 1000 + i % 50
+        yield (pid, f"proc-{pid}", i * 1500, i * 3000, 1500.0, 3000.0, ['HTTPS'])
+
+
+def bench_legacy(rows):
+    """Rows/s for a new connection and commit per row"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'legacy.db')
+        # The single traffic_log table of the original schema
+        conn = sqlite3.connect(db_file)
+        conn.execute('''
+            CREATE TABLE traffic_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                pid INTEGER,
+                process_name TEXT,
+                upload_bytes INTEGER,
+                download_bytes INTEGER,
+                upload_rate REAL,
+                download_rate REAL,
+                total_bytes INTEGER,
+                protocols TEXT
+            )
+        ''')
+        conn.close()
+
+        start = time.perf_counter()
+        for row in sample_rows(rows):
+            legacy_log_traffic(db_file, *row)
+        return rows / (time.perf_counter() - start)
+
+
+def bench_persistent(rows, storage='sqlite'):
+    """Rows/s for DatabaseLogger.log_traffic until every row is committed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'persistent.db'), storage=storage)
+
+        start = time.perf_counter()
+        for row in sample_rows(rows):
+            logger.log_traffic(*row)
+        logger.flush()
+        elapsed = time.perf_counter() - start
+
+        # Rows refused by a full queue do not count towards throughput
+        written = logger.get_write_stats()['written']
+        logger.close()
+        return written / elapsed
+
+
+def main():
+    """Run the ingest benchmark"""
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print("=" * 70)
+    print(f"Database ingest benchmark ({rows} traffic_log rows)")
+    print("=" * 70)
+
+    legacy = bench_legacy(rows)
+    print(f"{'connect + commit per row':<32} {legacy:>12,.0f} rows/s")
+
+    persistent = bench_persistent(rows)
+    print(f"{'persistent WAL + batched writer':<32} {persistent:>12,.0f} rows/s "
+          f"({persistent / legacy:.1f}x)")
+
+    segments = bench_persistent(rows, storage='segments')
+    print(f"{'segment files + compaction':<32} {segments:>12,.0f} rows/s "
+          f"({segments / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Report latency benchmark.
+
+Fills a temporary database with synthetic traffic_log rows spread over the
+last 30 days for 200 processes, then times the report queries the GUI and
+report generator run, plus a raw one-hour range scan of the traffic_log
+view (answered from the covering (timestamp, pid, ...) index). Reports
+are timed with the report cache off, and once more repeated with it on.
+
+Usage:
+    python3 benchmark_reports.py [rows ...]     (default: 1000000 10000000)
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from database_logger import DatabaseLogger, DAY_MS
+from config import REPORT_CACHE_ENTRIES
+
+PROCESSES = 200
+DAYS = 30
+CHUNK_ROWS = 50000
+
+
+def fill(logger, rows):
+    """Write `rows` evenly spaced traffic rows ending now, in write-behind sized batches"""
+    end = int(time.time() * 1000)
+    step = max(1, DAYS * DAY_MS // rows)
+    start = end - step * rows
+
+    for offset in range(0, rows, CHUNK_ROWS):
+        batch = []
+        for i in range(offset, min(offset + CHUNK_ROWS, rows)):
+            pid = 1000 + i % PROCESSES
+            batch.append((
+                start + i * step, pid, f"proc-{pid}", 1500, 3000,
+                300.0, 600.0, 'HTTPS'
+            ))
+        logger.import_traffic(batch)
+
+
+def timed(function, *args, runs=5):
+    """Median wall time of `runs` calls, in milliseconds"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def raw_hour_scan(logger):
+    """Sum the last hour straight from the traffic_log view"""
+    cutoff = int(time.time() * 1000) - 60 * 60 * 1000
+    with logger.lock:
+        return logger.conn.execute('''
+            SELECT pid, SUM(upload_bytes), SUM(download_bytes)
+            FROM traffic_log WHERE timestamp >= ?
+            GROUP BY pid
+        ''', (cutoff,)).fetchall()
+
+
+def bench(rows):
+    """Fill a database with `rows` rows and print report latencies"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'reports.db'))
+
+        start = time.perf_counter()
+        fill(logger, rows)
+        print(f"  filled in {time.perf_counter() - start:.1f} s")
+
+        now = datetime.now()
+        # Unaligned bounds exercise the minute/hour edges as well as whole days
+        month_start = now - timedelta(days=29, hours=5, minutes=17, seconds=23)
+        week_start = now - timedelta(days=7)
+
+        # Time the queries themselves, not cache hits
+        logger.report_cache.max_entries = 0
+        cases = (
+            ("daily report", logger.get_daily_report),
+            ("7-day traffic report", lambda: logger.get_traffic_report(week_start, now)),
+            ("30-day detailed report", lambda: logger.get_detailed_report_data(month_start, now)),
+            ("30-day single PID", lambda: logger.get_traffic_report(month_start, now, 1000)),
+            ("raw last-hour scan", lambda: raw_hour_scan(logger)),
+        )
+        for label, function in cases:
+            print(f"  {label:<28} {timed(function):10.2f} ms")
+
+        logger.report_cache.max_entries = REPORT_CACHE_ENTRIES
+        print(f"  {'30-day detailed, cached':<28} "
+              f"{timed(logger.get_detailed_report_data, month_start, now):10.2f} ms")
+
+        logger.close()
+
+
+def main():
+    """Run the report benchmark for each row count"""
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000000, 10000000]
+
+    print("=" * 70)
+    print(f"Report latency ({PROCESSES} processes over {DAYS} days, median of 5)")
+    print("=" * 70)
+
+    for rows in sizes:
+        print(f"{rows:,} rows")
+        bench(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the GUI, TUI and headless entry points.
+
+Each entry point's startup imports are timed in a fresh interpreter, so
+nothing is cached between runs. Also reports whether Scapy, python-docx
+or NumPy was loaded, which should only happen when the Scapy capture
+backend, a .docx report or segment storage is used.
+
+Usage:
+    python3 benchmark_startup.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Modules each entry point imports before the UI/service is up
+ENTRY_POINTS = {
+    'main.py': ['tkinter', 'packet_capture', 'database_logger', 'gui'],
+    'main_tui.py': ['curses', 'packet_capture', 'database_logger', 'gui_tui'],
+    'main_headless.py': ['packet_capture', 'database_logger', 'headless'],
+}
+
+HEAVY_MODULES = ('scapy', 'docx', 'numpy')
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {modules}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ','.join(heavy))
+"""
+
+
+def measure_startup(modules, runs=5):
+    """
+    Import `modules` in `runs` fresh interpreters.
+    Returns (median seconds, heavy modules that got loaded), or
+    (None, error message) if the imports fail.
+    """
+    code = _PROBE.format(modules=', '.join(modules), heavy=HEAVY_MODULES)
+    times = []
+    heavy = []
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=PROJECT_DIR, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            return None, error[-1] if error else 'import failed'
+
+        fields = result.stdout.split()
+        times.append(float(fields[0]))
+        heavy = fields[1].split(',') if len(fields) > 1 else []
+
+    return statistics.median(times), heavy
+
+
+def main():
+    """Run the startup benchmark for every entry point"""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("=" * 70)
+    print(f"Startup import time (median of {runs} fresh interpreters)")
+    print("=" * 70)
+
+    for name, modules in ENTRY_POINTS.items():
+        elapsed, heavy = measure_startup(modules, runs)
+        if elapsed is None:
+            print(f"{name:<20} skipped: {heavy}")
+            continue
+        loaded = ', '.join(heavy) if heavy else 'none'
+        print(f"{name:<20} {elapsed * 1000:8.1f} ms   heavy modules loaded: {loaded}")
+
+
+if __name__ == "__main__":
+    main()
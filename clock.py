@@ -0,0 +1,35 @@
+"""
+Clock Module
+Coarse monotonic clock for the capture subsystem
+"""
+
+import time
+from datetime import datetime
+
+
+class CoarseClock:
+    """
+    Monotonic time that is read from the OS once per batch or tick rather
+    than once per packet. Timestamps are monotonic seconds and unaffected
+    by wall-clock adjustments; convert them with to_wall() only at the
+    UI/DB boundary.
+    """
+
+    def __init__(self):
+        self.tick()
+
+    def tick(self):
+        """Refresh the cached time and return it"""
+        now = time.monotonic()
+        # Re-anchor to wall time so conversions follow clock adjustments
+        self._wall_offset = time.time() - now
+        self._now = now
+        return now
+
+    def now(self):
+        """Get the cached monotonic time (as of the last tick)"""
+        return self._now
+
+    def to_wall(self, monotonic_time):
+        """Convert a monotonic timestamp to a wall-clock datetime"""
+        return datetime.fromtimestamp(monotonic_time + self._wall_offset)
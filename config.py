@@ -7,6 +7,49 @@ GUI_REFRESH_RATE = 1000
 
 # Database settings
 DATABASE_FILE = "network_monitor.db"
+DB_SYNCHRONOUS = 'NORMAL'  # Durable across crashes in WAL mode; FULL also survives power loss
+DB_CACHE_SIZE_KB = 16384  # Page cache per connection
+DB_MMAP_SIZE = 64 * 1024 * 1024  # Bytes of the database file read through mmap
+DB_BUSY_TIMEOUT = 5000  # Milliseconds to wait on a locked database
+DB_STATEMENT_CACHE = 128  # Prepared statements kept per connection
+DB_WRITE_QUEUE_SIZE = 10000  # Rows buffered for the background writer
+DB_FLUSH_INTERVAL = 1.0  # Seconds between batched commits
+DB_FLUSH_ROWS = 500  # Commit early once this many rows are queued
+DB_READ_POOL_SIZE = 4  # Read-only connections for reports (0 = share the writer's)
+DB_FETCH_ROWS = 1000  # Rows fetched per chunk by the streaming iter_* queries
+
+# Raw traffic storage: 'sqlite' writes day partition tables; 'segments'
+# appends fixed-width records to segment files next to the database and
+# folds them into the SQLite rollups in the background, for per-second
+# ingest at thousands of processes. Segment queries use NumPy if installed.
+DB_STORAGE = 'sqlite'
+SEGMENT_MAX_RECORDS = 1000000  # Records per segment file (48 bytes each)
+SEGMENT_INDEX_BLOCK = 4096  # Records per time index entry
+SEGMENT_COMPACT_INTERVAL = 5  # Seconds between background compactions
+SEGMENT_COMPACT_ROWS = 50000  # Records folded per transaction (holds the writer lock)
+
+# Data retention: raw traffic is kept in one table per day and expired
+# by dropping whole days
+DATA_RETENTION_DAYS = 30
+RETENTION_CHECK_INTERVAL = 3600  # Seconds between background retention runs
+INCREMENTAL_VACUUM_PAGES = 10000  # Free pages returned to the OS per run
+
+# Long-term archive: raw traffic leaving the DATA_RETENTION_DAYS window is
+# moved into compressed per-process, per-day column blocks and kept for
+# ARCHIVE_RETENTION_DAYS (0 = delete it at DATA_RETENTION_DAYS instead)
+ARCHIVE_RETENTION_DAYS = 365
+ARCHIVE_BLOCK_ROWS = 65536  # Rows per block; a busy process-day spans several
+ARCHIVE_COMPRESSION_LEVEL = 6  # zlib level
+
+# Report result cache: the past part of a report range is answered from
+# memory until a write lands in it; only the open tail is queried again
+REPORT_CACHE_ENTRIES = 256  # Cached ranges (0 = no caching)
+REPORT_CACHE_MAX_ROWS = 10000  # Larger alert/session results are not cached
+
+# Data export (compressed CSV/NDJSON)
+EXPORT_GZIP_LEVEL = 1  # Fastest gzip level; exports are bound by compression
+EXPORT_ZSTD_LEVEL = 3
+EXPORT_CHUNK_ROWS = 10000  # Rows fetched, rendered and written at a time
 
 # Bandwidth alert threshold (in KB/s)
 BANDWIDTH_ALERT_THRESHOLD = 1024  # 1 MB/s
@@ -15,6 +58,10 @@ BANDWIDTH_ALERT_THRESHOLD = 1024  # 1 MB/s
 CAPTURE_INTERFACE = None  # None = all interfaces
 PACKET_TIMEOUT = 1  # seconds
 
+# Header-only capture: bytes copied to user space per frame. The byte count
+# comes from the on-the-wire length. 0 = copy full frames and dissect with Scapy
+CAPTURE_SNAPLEN = 128
+
 # Bandwidth calculation window (seconds)
 BANDWIDTH_WINDOW = 1
 
@@ -23,3 +70,40 @@ WINDOW_WIDTH = 1200
 WINDOW_HEIGHT = 600
 FONT_FAMILY = "Courier"
 FONT_SIZE = 10
+
+# Hot-path profiling (can be toggled at runtime)
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 16  # Time 1 in N packets
+
+# Monitor self-overhead sampling interval (seconds)
+SELF_METRICS_INTERVAL = 1
+
+# Headless service mode (main_headless.py)
+HEADLESS_TICK_INTERVAL = 1  # Rate/alert calculation interval (seconds)
+HEADLESS_PERSIST_INTERVAL = 5  # Database write interval (seconds)
+
+# Packet sampling for high-rate links (1 = account every packet)
+SAMPLING_RATE = 1
+SAMPLING_MODE = 'deterministic'  # 'deterministic' (1-in-N) or 'random'
+SAMPLING_IN_KERNEL = True  # Drop unsampled packets with a BPF filter (random mode)
+
+# Per-flow attribution cache lifetime (seconds)
+FLOW_CACHE_TIMEOUT = 30
+
+# Packets held while the first process mapping is built at start
+WARMUP_PARK_LIMIT = 50000
+
+# Protocol classification table: (transport, port) -> (name, requires_payload)
+# A packet matches if either its source or destination port is listed.
+# Entries that require payload ignore bare ACKs/handshakes.
+PROTOCOL_PORTS = {
+    ('TCP', 80): ('HTTP', True),
+    ('TCP', 443): ('HTTPS', True),
+    ('TCP', 53): ('DNS', False),
+    ('UDP', 53): ('DNS', False),
+    ('UDP', 5353): ('DNS', False),
+    ('TCP', 22): ('SSH', False),
+    ('UDP', 443): ('QUIC', False),
+    ('TCP', 853): ('DNS-over-TLS', False),
+    ('TCP', 5432): ('Postgres', False),
+}
@@ -0,0 +1,140 @@
+"""
+Data Export Module
+Renders database rows as CSV or NDJSON text and writes it to compressed files
+"""
+
+import gzip
+import io
+import json
+
+from config import EXPORT_GZIP_LEVEL, EXPORT_ZSTD_LEVEL
+
+
+# Exportable datasets and their columns
+EXPORT_COLUMNS = {
+    'traffic': ('timestamp_ms', 'pid', 'process_name', 'upload_bytes', 'download_bytes',
+                'upload_rate', 'download_rate', 'protocols'),
+    'alerts': ('timestamp', 'pid', 'process_name', 'alert_type', 'bandwidth_value',
+               'threshold'),
+    'sessions': ('id', 'start_time', 'end_time', 'total_upload', 'total_download'),
+}
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COMPRESSIONS = ('gzip', 'zstd', 'none')
+
+_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+
+
+def export_filename(dataset, start_date, end_date, fmt='csv', compression='gzip'):
+    """Default file name for an exported dataset"""
+    period = f"{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+    return f"network_{dataset}_{period}.{fmt}{_EXTENSIONS[compression]}"
+
+
+def csv_field(value):
+    """Render one CSV field, quoting it if needed"""
+    if value is None:
+        return ''
+    text = str(value)
+    if ',' in text or '"' in text or '\n' in text or '\r' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def header_line(dataset, fmt='csv'):
+    """First line of an export file, if the format has one"""
+    if fmt == 'csv':
+        return ','.join(EXPORT_COLUMNS[dataset]) + '\n'
+    return ''
+
+
+def row_renderer(dataset, fmt='csv'):
+    """Function rendering a list of dataset rows as CSV or NDJSON text"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    columns = EXPORT_COLUMNS[dataset]
+
+    if fmt == 'csv':
+        def render(rows):
+            return ''.join([','.join(map(csv_field, row)) + '\n' for row in rows])
+    else:
+        def render(rows):
+            return ''.join([json.dumps(dict(zip(columns, row))) + '\n' for row in rows])
+    return render
+
+
+def traffic_renderer(fmt, processes, protocol_sets):
+    """
+    Function rendering raw partition rows (timestamp, process_id,
+    upload_bytes, download_bytes, upload_rate, download_rate,
+    protocol_set_id) as CSV or NDJSON text. processes yields
+    (id, pid, name) and protocol_sets (id, protocols); their fields are
+    rendered once here, so each row costs a single string format.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    if fmt == 'csv':
+        process_fields = {process_id: f"{pid},{csv_field(name)}"
+                          for process_id, pid, name in processes}
+        protocol_fields = {protocol_set_id: csv_field(protocols)
+                           for protocol_set_id, protocols in protocol_sets}
+        protocol_fields[None] = ''
+
+        def render(rows):
+            return ''.join([
+                f"{timestamp},{process_fields[process_id]},{upload},{download},"
+                f"{upload_rate!r},{download_rate!r},{protocol_fields[protocol_set_id]}\n"
+                for (timestamp, process_id, upload, download,
+                     upload_rate, download_rate, protocol_set_id) in rows
+            ])
+    else:
+        process_fields = {process_id: f'"pid": {pid}, "process_name": {json.dumps(name)}'
+                          for process_id, pid, name in processes}
+        protocol_fields = {protocol_set_id: json.dumps(protocols)
+                           for protocol_set_id, protocols in protocol_sets}
+        protocol_fields[None] = 'null'
+
+        def render(rows):
+            return ''.join([
+                f'{{"timestamp_ms": {timestamp}, {process_fields[process_id]}, '
+                f'"upload_bytes": {upload}, "download_bytes": {download}, '
+                f'"upload_rate": {upload_rate!r}, "download_rate": {download_rate!r}, '
+                f'"protocols": {protocol_fields[protocol_set_id]}}}\n'
+                for (timestamp, process_id, upload, download,
+                     upload_rate, download_rate, protocol_set_id) in rows
+            ])
+    return render
+
+
+def open_output(output_file, compression='gzip'):
+    """Open a text stream writing to a (compressed) file"""
+    if compression == 'gzip':
+        return gzip.open(output_file, 'wt', compresslevel=EXPORT_GZIP_LEVEL,
+                         encoding='utf-8', newline='')
+    if compression == 'zstd':
+        # Optional dependency, only needed for zstd output
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstandard not installed. Install with: pip install zstandard")
+        raw = open(output_file, 'wb')
+        stream = zstandard.ZstdCompressor(level=EXPORT_ZSTD_LEVEL).stream_writer(raw)
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if compression == 'none':
+        return open(output_file, 'w', encoding='utf-8', newline='')
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def write_chunks(chunks, output, progress=None):
+    """
+    Write (text, row count) chunks to an open text stream, calling
+    progress(rows_written) after each one. Returns the rows written.
+    """
+    written = 0
+    for text, rows in chunks:
+        output.write(text)
+        written += rows
+        if progress:
+            progress(written)
+    return written
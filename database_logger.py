@@ -3,41 +3,1100 @@ Database Logging Module
 Stores network traffic data in SQLite database
 """
 
+import calendar
+import json
+import queue
 import sqlite3
 import threading
-from datetime import datetime, timedelta
-from config import DATABASE_FILE
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from data_export import (EXPORT_COLUMNS, header_line, row_renderer, traffic_renderer,
+                         open_output, write_chunks)
+from segment_store import SegmentStore, have_numpy, bucket_totals, split_by_process
+from traffic_archive import encode_block, decode_block
+from report_cache import ReportCache
+from config import (DATABASE_FILE, DB_SYNCHRONOUS, DB_CACHE_SIZE_KB,
+                    DB_MMAP_SIZE, DB_BUSY_TIMEOUT, DB_STATEMENT_CACHE,
+                    DB_WRITE_QUEUE_SIZE, DB_FLUSH_INTERVAL, DB_FLUSH_ROWS,
+                    DB_READ_POOL_SIZE, DB_FETCH_ROWS, EXPORT_CHUNK_ROWS,
+                    DB_STORAGE, SEGMENT_COMPACT_INTERVAL, SEGMENT_COMPACT_ROWS,
+                    DATA_RETENTION_DAYS, RETENTION_CHECK_INTERVAL,
+                    INCREMENTAL_VACUUM_PAGES, ARCHIVE_RETENTION_DAYS,
+                    ARCHIVE_BLOCK_ROWS, REPORT_CACHE_ENTRIES, REPORT_CACHE_MAX_ROWS)
+
+
+# Schema version stored in PRAGMA user_version
+#   1: traffic_log rows hold per-interval byte deltas, not running totals
+#   2: traffic_rollup_* tables backfilled from traffic_log
+#   3: traffic_log is a view over per-day traffic_log_YYYYMMDD tables
+#   4: traffic timestamps and rollup buckets are integer epoch milliseconds
+#   5: traffic rows reference the processes/protocol_sets dimension tables
+SCHEMA_VERSION = 5
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Per-day raw traffic partitions
+PARTITION_PREFIX = 'traffic_log_'
+PARTITION_GLOB = PARTITION_PREFIX + '[0-9]' * 8
+
+# Rollup tables, coarsest first: (table, bucket size in ms). A row's
+# bucket is its epoch-ms timestamp rounded down to the bucket size (UTC).
+ROLLUPS = (
+    ('traffic_rollup_1d', DAY_MS),
+    ('traffic_rollup_1h', 60 * 60 * 1000),
+    ('traffic_rollup_1m', 60 * 1000),
+)
+
+# SQL expression converting a UTC 'YYYY-MM-DD HH:MM:SS' column to epoch ms
+TEXT_TO_EPOCH_MS = "CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
+ROLLUP_UPSERT = '''
+    INSERT INTO {table} 
+    (bucket, process_id, upload_bytes, download_bytes,
+     upload_rate_sum, upload_rate_max, download_rate_sum, download_rate_max,
+     samples, protocol_set_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (bucket, process_id) DO UPDATE SET
+        upload_bytes = upload_bytes + excluded.upload_bytes,
+        download_bytes = download_bytes + excluded.download_bytes,
+        upload_rate_sum = upload_rate_sum + excluded.upload_rate_sum,
+        upload_rate_max = MAX(upload_rate_max, excluded.upload_rate_max),
+        download_rate_sum = download_rate_sum + excluded.download_rate_sum,
+        download_rate_max = MAX(download_rate_max, excluded.download_rate_max),
+        samples = samples + excluded.samples,
+        protocol_set_id = excluded.protocol_set_id
+'''
+
+# Raw rows and rollup rows exposed with the same columns, so a report
+# range can be answered from a UNION ALL of both. Names are joined back
+# from the dimension tables after aggregating by process_id.
+RAW_SOURCE = '''
+    SELECT process_id, upload_bytes, download_bytes,
+           upload_rate AS upload_rate_sum, upload_rate AS upload_rate_max,
+           download_rate AS download_rate_sum, download_rate AS download_rate_max,
+           1 AS samples, protocol_set_id
+    FROM {table}
+    WHERE timestamp >= ? AND timestamp < ?
+'''
+
+ROLLUP_SOURCE = '''
+    SELECT process_id, upload_bytes, download_bytes,
+           upload_rate_sum, upload_rate_max, download_rate_sum, download_rate_max,
+           samples, protocol_set_id
+    FROM {table}
+    WHERE bucket >= ? AND bucket < ?
+'''
+
+# Archived days, answered from the totals stored with each block
+ARCHIVE_SOURCE = '''
+    SELECT process_id, upload_bytes, download_bytes,
+           upload_rate_sum, upload_rate_max, download_rate_sum, download_rate_max,
+           samples, protocol_set_id
+    FROM traffic_archive
+    WHERE day >= ? AND day < ?
+'''
+
+# Per-process totals computed in Python (from segment records or decoded
+# archive blocks), passed in as a single JSON array of rows in the rollup
+# source layout
+TOTALS_SOURCE = '''
+    SELECT json_extract(value, '$[0]') AS process_id,
+           json_extract(value, '$[1]') AS upload_bytes,
+           json_extract(value, '$[2]') AS download_bytes,
+           json_extract(value, '$[3]') AS upload_rate_sum,
+           json_extract(value, '$[4]') AS upload_rate_max,
+           json_extract(value, '$[5]') AS download_rate_sum,
+           json_extract(value, '$[6]') AS download_rate_max,
+           json_extract(value, '$[7]') AS samples,
+           json_extract(value, '$[8]') AS protocol_set_id
+    FROM json_each(?)
+'''
+
+# Open-ended range bounds, in epoch ms
+MIN_EPOCH_MS = -(2 ** 63)
+MAX_EPOCH_MS = 2 ** 63 - 1
+
+# Statements written by the background writer. Rows carry the time they
+# were queued: epoch ms for traffic (which goes to the day partition of
+# its timestamp), UTC text like DEFAULT CURRENT_TIMESTAMP otherwise.
+# Traffic rows are queued with the process name and protocol string; the
+# writer swaps them for dimension ids.
+INSERT_TRAFFIC = '''
+    INSERT INTO {table} 
+    (timestamp, process_id, upload_bytes, download_bytes, 
+     upload_rate, download_rate, protocol_set_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_ARCHIVE = '''
+    INSERT INTO traffic_archive
+    (day, process_id, upload_bytes, download_bytes,
+     upload_rate_sum, upload_rate_max, download_rate_sum, download_rate_max,
+     samples, protocol_set_id, block)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_ALERT = '''
+    INSERT INTO alerts 
+    (timestamp, pid, process_name, alert_type, bandwidth_value, threshold)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_SELF_METRICS = '''
+    INSERT INTO self_metrics 
+    (timestamp, cpu_percent, rss_bytes, threads, packets_per_sec, kernel_drops)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# Tells the writer thread to flush and exit
+_STOP = object()
+
+
+def _utc_timestamp():
+    """Current time formatted like SQLite's CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _sql_text(value):
+    """Text sqlite3 binds for a datetime or string range bound, or None"""
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, str):
+        return value
+    return None
+
+
+def _epoch_ms():
+    """Current time in integer epoch milliseconds"""
+    return int(time.time() * 1000)
+
+
+def _to_epoch_ms(value):
+    """Convert a datetime (naive means local time), ISO string or epoch-ms number"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+
+def _partition_name(epoch_ms):
+    """Day partition (UTC) holding an epoch-ms timestamp"""
+    return PARTITION_PREFIX + time.strftime('%Y%m%d', time.gmtime(epoch_ms // 1000))
+
+
+def _partition_start(table):
+    """Epoch ms of the first instant of a day partition"""
+    return calendar.timegm(time.strptime(table[len(PARTITION_PREFIX):], '%Y%m%d')) * 1000
+
+
+def _max(a, b):
+    """MAX() of two values, ignoring NULLs"""
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _combine_totals(a, b):
+    """Merge two rows in the rollup source layout as the report queries would"""
+    return (a[0], a[1] + b[1], a[2] + b[2], a[3] + b[3], _max(a[4], b[4]),
+            a[5] + b[5], _max(a[6], b[6]), a[7] + b[7], _max(a[8], b[8]))
+
+
+def _merge_totals(rows):
+    """Combine rows in the rollup source layout into one per process"""
+    merged = {}
+    for row in rows:
+        total = merged.get(row[0])
+        merged[row[0]] = row if total is None else _combine_totals(total, row)
+    return list(merged.values())
+
+
+def _cover_range(start, end, level=0):
+    """
+    Split [start, end) into spans answered by the coarsest rollup whose
+    whole buckets fit, with finer rollups (and finally raw rows) for
+    the edges. None means unbounded. Returns [(table or None, lo, hi)].
+    """
+    if start is not None and end is not None and start >= end:
+        return []
+    if level == len(ROLLUPS):
+        return [(None, start, end)]
+    
+    table, size = ROLLUPS[level]
+    inner_start = start
+    if start is not None:
+        inner_start = start - start % size
+        if inner_start < start:
+            inner_start += size
+    inner_end = end - end % size if end is not None else None
+    
+    if inner_start is not None and inner_end is not None and inner_start >= inner_end:
+        return _cover_range(start, end, level + 1)
+    
+    spans = []
+    if start is not None:
+        spans += _cover_range(start, inner_start, level + 1)
+    spans.append((table, inner_start, inner_end))
+    if end is not None:
+        spans += _cover_range(inner_end, end, level + 1)
+    return spans
 
 
 class DatabaseLogger:
-    def __init__(self, db_file=DATABASE_FILE):
+    def __init__(self, db_file=DATABASE_FILE, read_pool_size=DB_READ_POOL_SIZE,
+                 storage=DB_STORAGE, readonly=False):
+        if storage not in ('sqlite', 'segments'):
+            raise ValueError(f"Unknown storage: {storage}")
         self.db_file = db_file
         self.lock = threading.Lock()
-        self._init_database()
+        
+        # A readonly logger only queries a database another process
+        # writes: no writer, compaction, migration or retention, and
+        # it follows the writer's partitions on every flush()
+        self.readonly = readonly
+        
+        # One long-lived connection shared by all threads (serialized by
+        # self.lock). sqlite3 keeps each distinct SQL string prepared in a
+        # per-connection statement cache, so repeated INSERTs skip parsing.
+        self.partitions = set()
+        if readonly:
+            self.conn = self._connect_reader()
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self.conn.close()
+                raise RuntimeError(f"{db_file} has schema {version}, not {SCHEMA_VERSION}; "
+                                   f"open it read-write once to upgrade it")
+            self.partitions = self._load_partitions(self.conn.cursor())
+        else:
+            self.conn = self._connect()
+            self._init_database()
+        
+        # Dimension id caches: (pid, name) -> processes.id and
+        # protocol string -> protocol_sets.id (used under self.lock)
+        self.process_ids = {}
+        self.protocol_set_ids = {}
+        self._load_dimension_cache()
+        
+        # Traffic before the archive horizon (a UTC day start) has moved
+        # to the compressed archive; None if nothing was archived yet
+        self.archive_horizon = self._load_archive_horizon()
+        
+        # Read-only connections for report queries, opened on demand.
+        # WAL readers see the last commit without waiting on self.lock,
+        # so a long report never stalls the writer.
+        self.read_pool_size = read_pool_size
+        self.read_pool = queue.LifoQueue()
+        self.read_pool_lock = threading.Lock()
+        self.read_connections = 0
+        self.fetch_rows = DB_FETCH_ROWS
+        self.export_chunk_rows = EXPORT_CHUNK_ROWS
+        
+        # Results for past report ranges, dropped when a write lands in
+        # their range (see _cached_totals and _iter_cached_range). A
+        # readonly logger never sees the writes, so it doesn't cache.
+        self.report_cache = ReportCache(0 if readonly else REPORT_CACHE_ENTRIES)
+        
+        # With storage='segments', raw traffic is appended to segment files
+        # instead of the day partitions and folded into the rollups by a
+        # background compaction. Segments found next to the database are
+        # read whatever the storage, but only the logger owning the
+        # segment directory appends to and compacts them; another one
+        # logs to the day partitions.
+        self.storage = storage
+        self.segments = None
+        self.compacted = {}  # Segment name -> records folded into the rollups
+        segment_dir = Path(db_file).with_suffix('.segments')
+        if readonly:
+            if segment_dir.exists():
+                self.segments = SegmentStore(segment_dir, readonly=True)
+        elif storage == 'segments' or segment_dir.exists():
+            self.segments = SegmentStore(segment_dir)
+            if self.segments.owner:
+                self.compacted = self._load_compaction_state()
+            elif storage == 'segments':
+                print(f"Segments in {segment_dir} are in use, logging to the database instead")
+                self.storage = 'sqlite'
+        self.compact_interval = SEGMENT_COMPACT_INTERVAL
+        self.compact_rows = SEGMENT_COMPACT_ROWS
+        self.compaction_thread = None
+        self.compaction_stop = threading.Event()
+        
+        self.retention_thread = None
+        self.retention_stop = threading.Event()
+        
+        # Write-behind queue: log_* calls only enqueue; a background
+        # thread commits batches with executemany
+        self.write_queue = queue.Queue(maxsize=DB_WRITE_QUEUE_SIZE)
+        self.flush_interval = DB_FLUSH_INTERVAL
+        self.flush_rows = DB_FLUSH_ROWS
+        self.write_stats = {
+            'written': 0,   # Rows committed
+            'dropped': 0,   # Rows refused because the queue was full
+            'failed': 0,    # Rows lost to a failed batch
+            'batches': 0    # Committed transactions
+        }
+        self.writer_thread = None
+        if not readonly:
+            self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self.writer_thread.start()
+        
+        # Last cumulative totals seen per PID, to turn snapshots into deltas
+        self.last_totals = {}
+        self.totals_lock = threading.Lock()
+        
+        if self.segments is not None and self.segments.owner:
+            self.compaction_thread = threading.Thread(target=self._compaction_loop,
+                                                      daemon=True)
+            self.compaction_thread.start()
+    
+    def _connect(self):
+        """Open the database connection in WAL mode with tuned pragmas"""
+        conn = sqlite3.connect(self.db_file, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE,
+                               timeout=DB_BUSY_TIMEOUT / 1000)
+        
+        # WAL lets readers run during writes and turns each commit into a
+        # sequential append; NORMAL only fsyncs at checkpoints in WAL mode
+        # Takes effect on new databases; existing ones switch during the
+        # schema 3 migration
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}')
+        conn.execute(f'PRAGMA mmap_size={int(DB_MMAP_SIZE)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT)}')
+        return conn
+    
+    def _connect_reader(self):
+        """Open a read-only connection to the (already WAL-mode) database"""
+        uri = Path(self.db_file).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE,
+                               timeout=DB_BUSY_TIMEOUT / 1000)
+        conn.execute(f'PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}')
+        conn.execute(f'PRAGMA mmap_size={int(DB_MMAP_SIZE)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT)}')
+        return conn
+    
+    @contextmanager
+    def _reader(self):
+        """
+        Borrow a pooled read-only connection, opening one if fewer than
+        read_pool_size exist and waiting for a free one otherwise. With
+        a pool size of 0, reads share the writer connection and lock.
+        """
+        if not self.read_pool_size:
+            with self.lock:
+                yield self.conn
+            return
+        
+        conn = None
+        with self.read_pool_lock:
+            if self.read_pool.empty() and self.read_connections < self.read_pool_size:
+                conn = self._connect_reader()
+                self.read_connections += 1
+        if conn is None:
+            conn = self.read_pool.get()
+        
+        try:
+            yield conn
+        finally:
+            self.read_pool.put(conn)
+    
+    def close(self):
+        """Flush queued rows, stop the writer and close all connections"""
+        self.stop_retention_job()
+        if self.writer_thread is not None:
+            self.write_queue.put(_STOP)
+            self.writer_thread.join()
+            self.writer_thread = None
+        
+        if self.compaction_thread is not None:
+            self.compaction_stop.set()
+            self.compaction_thread.join()
+            self.compaction_thread = None
+            self.compact_segments()
+        if self.segments is not None:
+            self.segments.close()
+        
+        with self.read_pool_lock:
+            while self.read_connections:
+                self.read_pool.get().close()
+                self.read_connections -= 1
+        
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+    
+    def _enqueue(self, statement, row):
+        """
+        Queue a row for the writer without ever blocking the caller.
+        Returns False if the row was dropped.
+        """
+        if self.writer_thread is None:
+            self.write_stats['dropped'] += 1
+            return False
+        try:
+            self.write_queue.put_nowait((statement, row))
+        except queue.Full:
+            # Back-pressure: the disk cannot keep up, shed the newest rows
+            self.write_stats['dropped'] += 1
+            return False
+        return True
+    
+    def _writer_loop(self):
+        """
+        Background writer. Commits queued rows in one transaction once
+        flush_rows are waiting or flush_interval has passed since the
+        first of them was queued, whichever comes first.
+        """
+        batch = []
+        waiters = []
+        deadline = 0
+        running = True
+        
+        while running:
+            timeout = max(0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self.write_queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            
+            if item is _STOP:
+                running = False
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+            
+            if batch and (not running or waiters or len(batch) >= self.flush_rows or
+                          time.monotonic() >= deadline):
+                self._write_batch(batch)
+                batch = []
+            
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+    
+    def _write_batch(self, batch):
+        """Write a batch of queued rows in a single transaction"""
+        rows_by_statement = {}
+        for statement, row in batch:
+            rows_by_statement.setdefault(statement, []).append(row)
+        
+        traffic_rows = rows_by_statement.pop(INSERT_TRAFFIC, None)
+        
+        with self.lock:
+            try:
+                if traffic_rows:
+                    traffic_rows = [
+                        (timestamp, self._process_id(pid, name), upload, download,
+                         upload_rate, download_rate, self._protocol_set_id(protocols))
+                        for (timestamp, pid, name, upload, download,
+                             upload_rate, download_rate, protocols) in traffic_rows
+                    ]
+                traffic_span = None
+                if traffic_rows:
+                    stamps = [row[0] for row in traffic_rows]
+                    traffic_span = (min(stamps), max(stamps))
+                segment_rows = None
+                if self.storage == 'segments':
+                    segment_rows, traffic_rows = traffic_rows, None
+                rollup_rows = self._rollup_rows(traffic_rows) if traffic_rows else {}
+                
+                rows_by_day = {}
+                for row in traffic_rows or ():
+                    rows_by_day.setdefault(row[0] // DAY_MS, []).append(row)
+                
+                for day, rows in rows_by_day.items():
+                    table = _partition_name(day * DAY_MS)
+                    self._ensure_partition(table)
+                    self.conn.executemany(INSERT_TRAFFIC.format(table=table), rows)
+                for statement, rows in rows_by_statement.items():
+                    self.conn.executemany(statement, rows)
+                for table, rows in rollup_rows.items():
+                    self.conn.executemany(ROLLUP_UPSERT.format(table=table), rows)
+                self.conn.commit()
+                # Appended after the commit, so records only ever
+                # reference committed dimension ids
+                if segment_rows:
+                    self.segments.append(segment_rows)
+                if traffic_span:
+                    self.report_cache.invalidate('traffic', *traffic_span)
+                if INSERT_ALERT in rows_by_statement:
+                    stamps = [row[0] for row in rows_by_statement[INSERT_ALERT]]
+                    self.report_cache.invalidate('alerts', min(stamps), max(stamps))
+                self.write_stats['written'] += len(batch)
+                self.write_stats['batches'] += 1
+            except Exception as e:
+                self._rollback()
+                # Ids interned by the failed transaction no longer exist
+                self._load_dimension_cache()
+                self.write_stats['failed'] += len(batch)
+                print(f"Database write error: {e}")
+    
+    def _load_dimension_cache(self):
+        """Fill the dimension id caches from the database"""
+        try:
+            self.process_ids = {
+                (pid, name): process_id for process_id, pid, name in
+                self.conn.execute('SELECT id, pid, name FROM processes')
+            }
+            self.protocol_set_ids = {
+                protocols: protocol_set_id for protocol_set_id, protocols in
+                self.conn.execute('SELECT id, protocols FROM protocol_sets')
+            }
+        except Exception as e:
+            self.process_ids = {}
+            self.protocol_set_ids = {}
+            print(f"Dimension cache error: {e}")
+    
+    def _process_id(self, pid, name):
+        """Id of a (pid, name) process identity, added on first use (caller holds the lock)"""
+        key = (pid, name)
+        process_id = self.process_ids.get(key)
+        if process_id is None:
+            self.conn.execute('INSERT OR IGNORE INTO processes (pid, name) VALUES (?, ?)', key)
+            process_id = self.conn.execute(
+                'SELECT id FROM processes WHERE pid = ? AND name = ?', key
+            ).fetchone()[0]
+            self.process_ids[key] = process_id
+        return process_id
+    
+    def _protocol_set_id(self, protocols):
+        """Id of a protocol set string, added on first use (caller holds the lock)"""
+        protocol_set_id = self.protocol_set_ids.get(protocols)
+        if protocol_set_id is None:
+            self.conn.execute('INSERT OR IGNORE INTO protocol_sets (protocols) VALUES (?)',
+                              (protocols,))
+            protocol_set_id = self.conn.execute(
+                'SELECT id FROM protocol_sets WHERE protocols = ?', (protocols,)
+            ).fetchone()[0]
+            self.protocol_set_ids[protocols] = protocol_set_id
+        return protocol_set_id
+    
+    def _create_partition(self, cursor, table):
+        """Create a day partition table holding integer-only traffic rows"""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                timestamp INTEGER NOT NULL,
+                process_id INTEGER,
+                upload_bytes INTEGER,
+                download_bytes INTEGER,
+                upload_rate REAL,
+                download_rate REAL,
+                protocol_set_id INTEGER
+            )
+        ''')
+        
+        # Covering indexes: range and per-process report queries are
+        # answered from the index alone, without going back to the table
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{table}_range ON {table}
+            (timestamp, process_id, upload_bytes, download_bytes,
+             upload_rate, download_rate, protocol_set_id)
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{table}_process ON {table}
+            (process_id, timestamp, upload_bytes, download_bytes,
+             upload_rate, download_rate, protocol_set_id)
+        ''')
+        self.partitions.add(table)
+    
+    def _ensure_partition(self, table):
+        """Create a day partition on first write (caller holds the lock)"""
+        if table not in self.partitions:
+            cursor = self.conn.cursor()
+            self._create_partition(cursor, table)
+            self._rebuild_traffic_view(cursor)
+    
+    def _rebuild_traffic_view(self, cursor):
+        """
+        Point the traffic_log view at the current set of day partitions,
+        with process names and protocols joined back from the dimensions
+        """
+        if not self.partitions:
+            # Keep the view valid with no data: an empty partition for today
+            self._create_partition(cursor, _partition_name(_epoch_ms()))
+        
+        arms = ' UNION ALL '.join(f'SELECT * FROM {table}'
+                                  for table in sorted(self.partitions))
+        cursor.execute('DROP VIEW IF EXISTS traffic_log')
+        cursor.execute(f'''
+            CREATE VIEW traffic_log AS
+            SELECT t.id, t.timestamp, p.pid, p.name AS process_name,
+                   t.upload_bytes, t.download_bytes, t.upload_rate, t.download_rate,
+                   t.upload_bytes + t.download_bytes AS total_bytes, s.protocols
+            FROM ({arms}) t
+            JOIN processes p ON p.id = t.process_id
+            LEFT JOIN protocol_sets s ON s.id = t.protocol_set_id
+        ''')
+    
+    def _rollup_rows(self, traffic_rows):
+        """Pre-aggregate a batch of traffic rows into rollup upsert rows"""
+        return {table: self._bucket_rows(traffic_rows, size) for table, size in ROLLUPS}
+    
+    def _bucket_rows(self, traffic_rows, size, max_protocol=False):
+        """
+        Per (bucket, process_id) totals of traffic rows, as rollup upsert
+        rows carrying the last protocol set seen (or the highest id, as
+        MAX() over the raw rows gives)
+        """
+        buckets = {}
+        for (timestamp, process_id, upload, download,
+             upload_rate, download_rate, protocol_set_id) in traffic_rows:
+            key = (timestamp - timestamp % size, process_id)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [upload, download, upload_rate, upload_rate,
+                                download_rate, download_rate, 1, protocol_set_id]
+            else:
+                bucket[0] += upload
+                bucket[1] += download
+                bucket[2] += upload_rate
+                bucket[3] = max(bucket[3], upload_rate)
+                bucket[4] += download_rate
+                bucket[5] = max(bucket[5], download_rate)
+                bucket[6] += 1
+                bucket[7] = max(bucket[7], protocol_set_id) if max_protocol else protocol_set_id
+        return [key + tuple(values) for key, values in buckets.items()]
+    
+    def _segment_buckets(self, records, size, max_protocol=False):
+        """_bucket_rows for records read from segments, vectorized with NumPy"""
+        if have_numpy():
+            return bucket_totals(records, size, max_protocol)
+        return self._bucket_rows(records, size, max_protocol)
+    
+    def _segment_totals(self, start, end):
+        """Per-process totals of the segment records in [start, end)"""
+        totals = []
+        for segment, count in self.segments.overlapping(start, end):
+            records = self.segments.read(segment, start, end, last=count)
+            totals += [row[1:] for row in self._segment_buckets(records, DAY_MS, True)]
+        return totals
+    
+    def compact_segments(self):
+        """Fold segment records not yet counted in the rollups into them"""
+        if self.segments is None or not self.segments.owner:
+            return True
+        with self.lock:
+            return self._compact_segments()
+    
+    def _compact_segments(self):
+        """
+        Fold new segment records into the rollups, up to compact_rows per
+        transaction. The same transaction stores how far each segment has
+        been folded, so every record is counted once even across crashes.
+        Returns False if a transaction failed (caller holds the lock).
+        Only the owner of the segment directory compacts, so no record
+        is folded by two loggers.
+        """
+        if not self.segments.owner:
+            return True
+        for segment, count in self.segments.list_segments():
+            folded = self.compacted.get(segment.name, 0)
+            while folded < count:
+                last = min(count, folded + self.compact_rows)
+                records = self.segments.read(segment, MIN_EPOCH_MS, MAX_EPOCH_MS, folded, last)
+                try:
+                    for table, size in ROLLUPS:
+                        self.conn.executemany(ROLLUP_UPSERT.format(table=table),
+                                              self._segment_buckets(records, size))
+                    self.conn.execute('''
+                        INSERT OR REPLACE INTO segment_compaction (segment, records)
+                        VALUES (?, ?)
+                    ''', (segment.name, last))
+                    self.conn.commit()
+                except Exception as e:
+                    self._rollback()
+                    print(f"Segment compaction error: {e}")
+                    return False
+                self.compacted[segment.name] = folded = last
+                # Cached rollup spans were computed without these records
+                if have_numpy():
+                    stamps = records['timestamp']
+                    self.report_cache.invalidate('traffic', int(stamps.min()), int(stamps.max()))
+                else:
+                    stamps = [record[0] for record in records]
+                    self.report_cache.invalidate('traffic', min(stamps), max(stamps))
+        return True
+    
+    def _load_compaction_state(self):
+        """Records folded per segment, forgetting segments that are gone"""
+        with self.lock:
+            names = {segment.name for segment, _ in self.segments.list_segments()}
+            compacted = {}
+            for name, records in self.conn.execute(
+                'SELECT segment, records FROM segment_compaction'
+            ).fetchall():
+                if name in names:
+                    compacted[name] = records
+                else:
+                    self.conn.execute('DELETE FROM segment_compaction WHERE segment = ?', (name,))
+            self.conn.commit()
+        return compacted
+    
+    def _compaction_loop(self):
+        """Background segment compaction"""
+        while not self.compaction_stop.wait(self.compact_interval):
+            self.compact_segments()
+    
+    def _load_archive_horizon(self):
+        """Archive horizon stored by the last archiving run"""
+        with self.lock:
+            try:
+                return self.conn.execute('SELECT MAX(horizon) FROM archive_state').fetchone()[0]
+            except sqlite3.OperationalError:
+                # Readonly on a database not opened read-write since the
+                # archive was added
+                return None
+    
+    def _set_archive_horizon(self, cursor, horizon):
+        """
+        Store a new archive horizon and delete the rollup rows before it,
+        which the archive now answers (caller holds the lock and commits)
+        """
+        cursor.execute('DELETE FROM archive_state')
+        cursor.execute('INSERT INTO archive_state (horizon) VALUES (?)', (horizon,))
+        for table, _ in ROLLUPS:
+            cursor.execute(f'DELETE FROM {table} WHERE bucket < ?', (horizon,))
+    
+    def _archive_blocks(self, conn, lo, hi):
+        """
+        Rows of the archive blocks holding traffic in [lo, hi), a block at
+        a time: by day, then process, each block in time order. Only the
+        blocks of days overlapping the range are decompressed.
+        """
+        cursor = conn.execute('''
+            SELECT day, process_id, block FROM traffic_archive
+            WHERE day >= ? AND day < ?
+            ORDER BY day, process_id
+        ''', (max(lo - lo % DAY_MS, MIN_EPOCH_MS), hi))
+        for day, process_id, block in cursor:
+            rows = decode_block(block, day, process_id)
+            if day < lo or day + DAY_MS > hi:
+                rows = [row for row in rows if lo <= row[0] < hi]
+            if rows:
+                yield rows
+    
+    def _iter_archive(self, lo, hi):
+        """_archive_blocks on a pooled read connection; errors end the iteration"""
+        with self._reader() as conn:
+            try:
+                yield from self._archive_blocks(conn, lo, hi)
+            except Exception as e:
+                print(f"Archive read error: {e}")
+    
+    def _archive_totals(self, spans):
+        """
+        Per-process totals of the archived rows in (lo, hi, size) spans.
+        Rows are bucketed by size first, like the rollup that answers
+        such a span (None = raw rows), so protocol sets combine the same
+        way. Each day the spans touch is decompressed once.
+        """
+        totals = []
+        days = set()
+        for lo, hi, _ in spans:
+            days.update(range(lo - lo % DAY_MS, hi, DAY_MS))
+        for day in sorted(days):
+            day_spans = [span for span in spans if span[0] < day + DAY_MS and span[1] > day]
+            for rows in self._iter_archive(day, day + DAY_MS):
+                for lo, hi, size in day_spans:
+                    span_rows = [row for row in rows if lo <= row[0] < hi]
+                    totals += _merge_totals(
+                        row[1:] for row in self._bucket_rows(span_rows, size or DAY_MS,
+                                                             max_protocol=size is None))
+                totals = _merge_totals(totals)
+        return totals
+    
+    def _archive_sources(self, start, end):
+        """
+        Subquery parts and parameters for the archived traffic in [start,
+        end) (start None is unbounded): whole days from the totals stored
+        with each block, and the edges from the blocks of their days
+        """
+        parts = []
+        params = []
+        edges = []
+        sizes = dict(ROLLUPS)
+        for table, lo, hi in _cover_range(start, end):
+            if table == ROLLUPS[0][0]:
+                parts.append(ARCHIVE_SOURCE)
+                params += [lo if lo is not None else MIN_EPOCH_MS, hi]
+            else:
+                edges.append((lo, hi, sizes.get(table)))
+        totals = self._archive_totals(edges) if edges else None
+        if totals:
+            parts.append(TOTALS_SOURCE)
+            params.append(json.dumps(totals))
+        return parts, params
+    
+    def _encode_blocks(self, day, rows):
+        """Archive rows for one process's traffic rows on a day, in blocks of ARCHIVE_BLOCK_ROWS"""
+        archived = []
+        for offset in range(0, len(rows), ARCHIVE_BLOCK_ROWS):
+            chunk = rows[offset:offset + ARCHIVE_BLOCK_ROWS]
+            (totals,) = self._bucket_rows(chunk, DAY_MS)
+            archived.append(totals + (encode_block(chunk, day),))
+        return archived
+    
+    def _encode_archive_day(self, day):
+        """
+        Encode a UTC day of raw traffic into archive rows: its day
+        partition and, unless archived already, its segment records.
+        Reads go through a pooled connection, not the writer's.
+        """
+        archived = []
+        table = _partition_name(day)
+        if table in self.partitions:
+            with self._reader() as conn:
+                cursor = conn.execute(f'''
+                    SELECT timestamp, process_id, upload_bytes, download_bytes,
+                           upload_rate, download_rate, protocol_set_id
+                    FROM {table}
+                    ORDER BY process_id, timestamp
+                ''')
+                for _, rows in groupby(cursor, key=itemgetter(1)):
+                    archived += self._encode_blocks(day, list(rows))
+        
+        if self.segments is not None and (self.archive_horizon is None or
+                                          day >= self.archive_horizon):
+            for segment, count in self.segments.overlapping(day, day + DAY_MS):
+                records = self.segments.read(segment, day, day + DAY_MS, last=count)
+                for _, rows in split_by_process(records):
+                    archived += self._encode_blocks(day, rows)
+        return archived
+    
+    def _archive_day(self, day):
+        """
+        Move a UTC day of raw traffic into the archive: the blocks are
+        stored, the partition dropped and the horizon advanced in one
+        transaction. Returns False on failure.
+        """
+        try:
+            archived = self._encode_archive_day(day)
+        except Exception as e:
+            print(f"Archive error: {e}")
+            return False
+        
+        table = _partition_name(day)
+        with self.lock:
+            try:
+                cursor = self.conn.cursor()
+                cursor.executemany(INSERT_ARCHIVE, archived)
+                if table in self.partitions:
+                    self.partitions.discard(table)
+                    self._rebuild_traffic_view(cursor)
+                    cursor.execute(f'DROP TABLE {table}')
+                self._set_archive_horizon(cursor, day + DAY_MS)
+                self.conn.commit()
+                self.archive_horizon = day + DAY_MS
+                self.report_cache.invalidate('traffic')
+            except Exception as e:
+                self._rollback()
+                self.partitions = self._load_partitions(self.conn.cursor())
+                print(f"Archive error: {e}")
+                return False
+        return True
+    
+    def _archive_expired(self, horizon):
+        """
+        Move raw traffic from before horizon (a UTC day start) into the
+        archive, oldest day first. Returns False if a day failed.
+        """
+        days = {_partition_start(table) for table in self.partitions
+                if _partition_start(table) < horizon}
+        if self.segments is not None:
+            for segment, _ in self.segments.list_segments():
+                bounds = segment.bounds()
+                if bounds is None:
+                    continue
+                low = bounds[0]
+                if self.archive_horizon is not None:
+                    low = max(low, self.archive_horizon)
+                days.update(range(low - low % DAY_MS, min(bounds[1] + 1, horizon), DAY_MS))
+        
+        for day in sorted(days):
+            if not self._archive_day(day):
+                return False
+        return True
+    
+    def _span_sources(self, table, lo, hi):
+        """
+        Subquery parts and parameters for the live traffic in [lo, hi)
+        (None is unbounded): a rollup table, or the raw rows of the day
+        partitions and segments it overlaps
+        """
+        lo = lo if lo is not None else MIN_EPOCH_MS
+        hi = hi if hi is not None else MAX_EPOCH_MS
+        if table is not None:
+            return [ROLLUP_SOURCE.format(table=table)], [lo, hi]
+        
+        parts = []
+        params = []
+        # Raw edges only read the day partitions they overlap
+        for partition in sorted(self.partitions):
+            day_start = _partition_start(partition)
+            if day_start < hi and day_start + DAY_MS > lo:
+                parts.append(RAW_SOURCE.format(table=partition))
+                params += [lo, hi]
+        if self.segments is not None:
+            totals = self._segment_totals(lo, hi)
+            if totals:
+                parts.append(TOTALS_SOURCE)
+                params.append(json.dumps(totals))
+        return parts, params
+    
+    def _source_totals(self, parts, params):
+        """Per-process totals of subquery parts, in the rollup source layout"""
+        if not parts:
+            return []
+        with self._reader() as conn:
+            return conn.execute(f'''
+                SELECT process_id, SUM(upload_bytes), SUM(download_bytes),
+                       SUM(upload_rate_sum), MAX(upload_rate_max),
+                       SUM(download_rate_sum), MAX(download_rate_max),
+                       SUM(samples), MAX(protocol_set_id)
+                FROM ({' UNION ALL '.join(parts)})
+                GROUP BY process_id
+            ''', params).fetchall()
+    
+    def _cached_totals(self, key, lo, hi, now, build, *args):
+        """
+        Per-process totals of the traffic in [lo, hi), whose subquery
+        parts build(*args) returns, if the span ended by now. They are
+        kept in the report cache until a write lands in the span.
+        Returns None for spans that are still open (or on errors).
+        """
+        if hi is None or hi > now or not self.report_cache.max_entries:
+            return None
+        
+        totals = self.report_cache.get('traffic', key)
+        if totals is None:
+            generation = self.report_cache.generation
+            try:
+                totals = self._source_totals(*build(*args))
+            except Exception as e:
+                print(f"Report cache error: {e}")
+                return None
+            self.report_cache.put('traffic', key, lo, hi, totals, generation)
+        return totals
+    
+    def _range_source(self, start_date, end_date):
+        """
+        Build a subquery returning the traffic in [start_date, end_date]
+        (inclusive, like BETWEEN), read from the coarsest rollups that
+        cover it and from raw rows only for sub-minute edges. The part
+        before the archive horizon is read from the archive. Totals of
+        spans that are over come from the report cache, so a repeated
+        report only queries the open tail.
+        """
+        start = _to_epoch_ms(start_date) if start_date is not None else None
+        end = None
+        if end_date is not None:
+            # The end second is included in full, as with BETWEEN on
+            # second-resolution timestamps
+            end = _to_epoch_ms(end_date)
+            end = end - end % 1000 + 1000
+        
+        parts = []
+        params = []
+        totals = []  # Cached totals of the closed spans
+        now = _epoch_ms()
+        horizon = self.archive_horizon
+        if horizon is not None and (start is None or start < horizon):
+            archive_end = horizon if end is None else min(end, horizon)
+            archive_totals = self._cached_totals(('archive', start, archive_end),
+                                                 start, archive_end, now,
+                                                 self._archive_sources, start, archive_end)
+            if archive_totals is None:
+                parts, params = self._archive_sources(start, archive_end)
+            else:
+                totals += archive_totals
+            start = horizon if start is None else max(start, horizon)
+        
+        sizes = dict(ROLLUPS)
+        for table, lo, hi in _cover_range(start, end):
+            # A rollup span reaching into the current bucket is split, so
+            # its whole past buckets can be cached
+            spans = [(lo, hi)]
+            if table is not None and (hi is None or hi > now):
+                split = now - now % sizes[table]
+                if lo is None or lo < split:
+                    spans = [(lo, split), (split, hi)]
+            for lo, hi in spans:
+                span_totals = self._cached_totals((table, lo, hi), lo, hi, now,
+                                                  self._span_sources, table, lo, hi)
+                if span_totals is None:
+                    span_parts, span_params = self._span_sources(table, lo, hi)
+                    parts += span_parts
+                    params += span_params
+                else:
+                    totals += span_totals
+        
+        if totals:
+            parts.append(TOTALS_SOURCE)
+            params.append(json.dumps(_merge_totals(totals)))
+        if not parts:
+            parts.append(RAW_SOURCE.format(table=sorted(self.partitions)[0]))
+            params += [MAX_EPOCH_MS, MAX_EPOCH_MS]
+        return ' UNION ALL '.join(parts), params
+    
+    def flush(self, timeout=None):
+        """
+        Wait until every row queued so far is committed (and, with
+        segments, folded into the rollups that reports read).
+        Returns False if the writer did not finish within timeout.
+        A readonly logger instead picks up the day partitions and
+        archive horizon of the process writing the database.
+        """
+        if self.readonly:
+            with self.lock:
+                self.partitions = self._load_partitions(self.conn.cursor())
+            self.archive_horizon = self._load_archive_horizon()
+            return True
+        if self.writer_thread is not None:
+            done = threading.Event()
+            self.write_queue.put(done)
+            if not done.wait(timeout):
+                return False
+        self.compact_segments()
+        return True
+    
+    def get_write_stats(self):
+        """Get writer counters and the current queue depth"""
+        stats = dict(self.write_stats)
+        stats['pending'] = self.write_queue.qsize()
+        return stats
+    
+    def _rollback(self):
+        """Discard a failed write so it is not committed with the next one"""
+        try:
+            self.conn.rollback()
+        except Exception:
+            pass
     
     def _init_database(self):
         """Initialize database schema"""
         with self.lock:
-            conn = sqlite3.connect(self.db_file)
+            conn = self.conn
             cursor = conn.cursor()
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
             
-            # Create traffic log table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS traffic_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    pid INTEGER,
-                    process_name TEXT,
-                    upload_bytes INTEGER,
-                    download_bytes INTEGER,
-                    upload_rate REAL,
-                    download_rate REAL,
-                    total_bytes INTEGER,
-                    protocols TEXT
-                )
-            ''')
+            # Unpartitioned traffic log table (schema < 3 only; it is split
+            # into day partitions by the schema 3 migration)
+            if version < 3:
+                self._create_legacy_traffic_table(cursor)
             
-            # Create session table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS sessions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -61,68 +1120,389 @@ class DatabaseLogger:
                 )
             ''')
             
-            # Create index for faster queries
+            # Create monitor self-overhead table
             cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_timestamp 
-                ON traffic_log(timestamp)
+                CREATE TABLE IF NOT EXISTS self_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    cpu_percent REAL,
+                    rss_bytes INTEGER,
+                    threads INTEGER,
+                    packets_per_sec REAL,
+                    kernel_drops INTEGER
+                )
+            ''')
+            
+            # Dimension tables: traffic rows store these small integer ids
+            # instead of repeating process names and protocol strings
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS processes (
+                    id INTEGER PRIMARY KEY,
+                    pid INTEGER,
+                    name TEXT,
+                    UNIQUE (pid, name)
+                )
             ''')
             
             cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_pid 
-                ON traffic_log(pid)
+                CREATE TABLE IF NOT EXISTS protocol_sets (
+                    id INTEGER PRIMARY KEY,
+                    protocols TEXT UNIQUE
+                )
             ''')
             
+            # How many records of each segment file the rollups include
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS segment_compaction (
+                    segment TEXT PRIMARY KEY,
+                    records INTEGER
+                )
+            ''')
+            
+            # Long-term archive: one row per block of a process's traffic
+            # on a UTC day, with the block's totals in the rollup layout
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS traffic_archive (
+                    day INTEGER,
+                    process_id INTEGER,
+                    upload_bytes INTEGER,
+                    download_bytes INTEGER,
+                    upload_rate_sum REAL,
+                    upload_rate_max REAL,
+                    download_rate_sum REAL,
+                    download_rate_max REAL,
+                    samples INTEGER,
+                    protocol_set_id INTEGER,
+                    block BLOB
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_traffic_archive_day
+                ON traffic_archive (day, process_id)
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archive_state (
+                    horizon INTEGER
+                )
+            ''')
+            
+            # Per-process traffic rollups, maintained as rows are written
+            # (existing tables in an older layout are rebuilt by the
+            # schema 5 migration)
+            for table, _ in ROLLUPS:
+                self._create_rollup(cursor, table)
+            
+            self._migrate_schema(cursor)
             conn.commit()
-            conn.close()
+            
+            # Switching an existing database to incremental auto-vacuum
+            # needs a one-time VACUUM, which cannot run in a transaction
+            if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                cursor.execute('VACUUM')
+    
+    def _create_rollup(self, cursor, table):
+        """Create a rollup table keyed by bucket and process id"""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket INTEGER,
+                process_id INTEGER,
+                upload_bytes INTEGER,
+                download_bytes INTEGER,
+                upload_rate_sum REAL,
+                upload_rate_max REAL,
+                download_rate_sum REAL,
+                download_rate_max REAL,
+                samples INTEGER,
+                protocol_set_id INTEGER,
+                PRIMARY KEY (bucket, process_id)
+            ) WITHOUT ROWID
+        ''')
+    
+    def _create_legacy_traffic_table(self, cursor):
+        """Create the unpartitioned traffic log table used before schema 3"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS traffic_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                pid INTEGER,
+                process_name TEXT,
+                upload_bytes INTEGER,
+                download_bytes INTEGER,
+                upload_rate REAL,
+                download_rate REAL,
+                total_bytes INTEGER,
+                protocols TEXT
+            )
+        ''')
+        
+        # Create index for faster queries
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_timestamp 
+            ON traffic_log(timestamp)
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_pid 
+            ON traffic_log(pid)
+        ''')
+    
+    def _migrate_schema(self, cursor):
+        """Upgrade an existing database to SCHEMA_VERSION"""
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        
+        if version < 1:
+            self._migrate_to_deltas(cursor)
+        if version < 2:
+            self._backfill_rollups(cursor)
+        if version < 3:
+            self._partition_traffic_log(cursor)
+        
+        # Pick up the day partitions
+        self.partitions = self._load_partitions(cursor)
+        if version < 5:
+            self._normalize_traffic_tables(cursor)
+        if version < 5 or not self.partitions:
+            self._rebuild_traffic_view(cursor)
+        
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    
+    def _load_partitions(self, cursor):
+        """Names of the existing day partition tables"""
+        return {
+            row[0] for row in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+                (PARTITION_GLOB,)
+            )
+        }
+    
+    def _partition_traffic_log(self, cursor):
+        """Move rows from the single traffic_log table into day partitions"""
+        days = [row[0] for row in cursor.execute(
+            'SELECT DISTINCT substr(timestamp, 1, 10) FROM traffic_log'
+        ).fetchall()]
+        
+        self._intern_dimensions(cursor, 'traffic_log')
+        for day in days:
+            table = PARTITION_PREFIX + day.replace('-', '')
+            self._create_partition(cursor, table)
+            self._copy_traffic_rows(cursor, table, 'traffic_log',
+                                    "substr(t.timestamp, 1, 10) = ?", (day,))
+        
+        cursor.execute('DROP TABLE traffic_log')
+    
+    def _column_type(self, cursor, table, column):
+        """Declared type of a table column"""
+        for row in cursor.execute(f'PRAGMA table_info({table})'):
+            if row[1] == column:
+                return row[2].upper()
+        return None
+    
+    def _intern_dimensions(self, cursor, source):
+        """Add the process identities and protocol sets of a legacy table"""
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO processes (pid, name)
+            SELECT DISTINCT pid, IFNULL(process_name, '') FROM {source}
+        ''')
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO protocol_sets (protocols)
+            SELECT DISTINCT protocols FROM {source} WHERE protocols IS NOT NULL
+        ''')
+    
+    def _copy_traffic_rows(self, cursor, table, source, where='1=1', params=()):
+        """
+        Copy rows of a legacy traffic table (text or epoch-ms timestamps,
+        inline names and protocols) into a partition as dimension ids
+        """
+        epoch_ms = TEXT_TO_EPOCH_MS.format(column='t.timestamp')
+        cursor.execute(f'''
+            INSERT INTO {table} 
+            (timestamp, process_id, upload_bytes, download_bytes,
+             upload_rate, download_rate, protocol_set_id)
+            SELECT CASE WHEN typeof(t.timestamp) = 'text' THEN {epoch_ms}
+                        ELSE t.timestamp END,
+                   p.id, t.upload_bytes, t.download_bytes,
+                   t.upload_rate, t.download_rate, s.id
+            FROM {source} t
+            JOIN processes p ON p.pid = t.pid AND p.name = IFNULL(t.process_name, '')
+            LEFT JOIN protocol_sets s ON s.protocols = t.protocols
+            WHERE {where}
+            ORDER BY t.id
+        ''', params)
+    
+    def _normalize_traffic_tables(self, cursor):
+        """
+        Rebuild day partitions and rollups created before schema 5 (text
+        DATETIME timestamps, inline process names and protocols) with
+        epoch-ms timestamps, dimension ids and covering indexes
+        """
+        cursor.execute('DROP VIEW IF EXISTS traffic_log')
+        
+        for table in sorted(self.partitions):
+            if self._column_type(cursor, table, 'process_id') is not None:
+                continue
+            for suffix in ('timestamp', 'pid', 'range', 'pid_range'):
+                cursor.execute(f'DROP INDEX IF EXISTS idx_{table}_{suffix}')
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+            self._intern_dimensions(cursor, f'{table}_old')
+            self._create_partition(cursor, table)
+            self._copy_traffic_rows(cursor, table, f'{table}_old')
+            cursor.execute(f'DROP TABLE {table}_old')
+        
+        for table, _ in ROLLUPS:
+            if self._column_type(cursor, table, 'process_id') is not None:
+                continue
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+            self._intern_dimensions(cursor, f'{table}_old')
+            self._create_rollup(cursor, table)
+            cursor.execute(f'''
+                INSERT INTO {table}
+                SELECT CASE WHEN typeof(r.bucket) = 'text'
+                            THEN {TEXT_TO_EPOCH_MS.format(column='r.bucket')}
+                            ELSE r.bucket END,
+                       p.id, r.upload_bytes, r.download_bytes,
+                       r.upload_rate_sum, r.upload_rate_max,
+                       r.download_rate_sum, r.download_rate_max,
+                       r.samples, s.id
+                FROM {table}_old r
+                JOIN processes p ON p.pid = r.pid AND p.name = IFNULL(r.process_name, '')
+                LEFT JOIN protocol_sets s ON s.protocols = r.protocols
+            ''')
+            cursor.execute(f'DROP TABLE {table}_old')
+    
+    def _migrate_to_deltas(self, cursor):
+        """
+        Convert cumulative traffic_log snapshots into per-interval deltas.
+        Each row becomes the difference to the previous row of the same
+        PID; a total that went backwards (stats reset, PID reuse) starts
+        over from zero. Rows that carried no new traffic are removed.
+        """
+        cursor.execute('''
+            CREATE TEMP TABLE traffic_deltas (
+                id INTEGER PRIMARY KEY,
+                upload_delta INTEGER,
+                download_delta INTEGER
+            )
+        ''')
+        
+        cursor.execute('''
+            INSERT INTO traffic_deltas (id, upload_delta, download_delta)
+            SELECT id,
+                   CASE WHEN upload_bytes >= prev_upload
+                        THEN upload_bytes - prev_upload ELSE upload_bytes END,
+                   CASE WHEN download_bytes >= prev_download
+                        THEN download_bytes - prev_download ELSE download_bytes END
+            FROM (
+                SELECT id, upload_bytes, download_bytes,
+                       LAG(upload_bytes, 1, 0) OVER w AS prev_upload,
+                       LAG(download_bytes, 1, 0) OVER w AS prev_download
+                FROM traffic_log
+                WINDOW w AS (PARTITION BY pid ORDER BY id)
+            )
+        ''')
+        
+        cursor.execute('''
+            DELETE FROM traffic_log WHERE id IN (
+                SELECT id FROM traffic_deltas
+                WHERE upload_delta = 0 AND download_delta = 0
+            )
+        ''')
+        
+        cursor.execute('''
+            UPDATE traffic_log SET
+                upload_bytes = (SELECT upload_delta FROM traffic_deltas d
+                                WHERE d.id = traffic_log.id),
+                download_bytes = (SELECT download_delta FROM traffic_deltas d
+                                  WHERE d.id = traffic_log.id),
+                total_bytes = (SELECT upload_delta + download_delta FROM traffic_deltas d
+                               WHERE d.id = traffic_log.id)
+        ''')
+        
+        cursor.execute('DROP TABLE traffic_deltas')
+    
+    def _backfill_rollups(self, cursor):
+        """Build the rollup tables from existing traffic_log rows"""
+        self._intern_dimensions(cursor, 'traffic_log')
+        epoch_ms = TEXT_TO_EPOCH_MS.format(column='t.timestamp')
+        for table, size in ROLLUPS:
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO {table}
+                SELECT ts - ts % {size}, process_id,
+                       SUM(upload_bytes), SUM(download_bytes),
+                       SUM(upload_rate), MAX(upload_rate),
+                       SUM(download_rate), MAX(download_rate),
+                       COUNT(*), MAX(protocol_set_id)
+                FROM (
+                    SELECT {epoch_ms} AS ts, p.id AS process_id, s.id AS protocol_set_id,
+                           t.upload_bytes, t.download_bytes, t.upload_rate, t.download_rate
+                    FROM traffic_log t
+                    JOIN processes p ON p.pid = t.pid AND p.name = IFNULL(t.process_name, '')
+                    LEFT JOIN protocol_sets s ON s.protocols = t.protocols
+                )
+                GROUP BY 1, process_id
+            ''')
     
     def log_traffic(self, pid, process_name, upload_bytes, download_bytes, 
                     upload_rate, download_rate, protocols):
-        """Log traffic data for a process"""
-        with self.lock:
-            try:
-                conn = sqlite3.connect(self.db_file)
-                cursor = conn.cursor()
-                
-                total_bytes = upload_bytes + download_bytes
-                protocols_str = ','.join(protocols) if protocols else 'UNKNOWN'
-                
-                cursor.execute('''
-                    INSERT INTO traffic_log 
-                    (pid, process_name, upload_bytes, download_bytes, 
-                     upload_rate, download_rate, total_bytes, protocols)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (pid, process_name, upload_bytes, download_bytes,
-                      upload_rate, download_rate, total_bytes, protocols_str))
-                
-                conn.commit()
-                conn.close()
-            except Exception as e:
-                print(f"Database logging error: {e}")
+        """
+        Queue traffic for a process. upload_bytes/download_bytes are the
+        process's running totals; only the bytes since the previous call
+        are stored, and nothing is written if there were none. If the row
+        is dropped, its bytes are carried into the next call's delta.
+        """
+        protocols_str = ','.join(protocols) if protocols else 'UNKNOWN'
+        
+        with self.totals_lock:
+            last_upload, last_download = self.last_totals.get(pid, (0, 0))
+            
+            # Totals go backwards after a statistics reset or PID reuse
+            upload_delta = upload_bytes - last_upload if upload_bytes >= last_upload else upload_bytes
+            download_delta = (download_bytes - last_download
+                              if download_bytes >= last_download else download_bytes)
+            if not upload_delta and not download_delta:
+                return
+            
+            if self._enqueue(INSERT_TRAFFIC, (
+                _epoch_ms(), pid, process_name, upload_delta, download_delta,
+                upload_rate, download_rate, protocols_str
+            )):
+                self.last_totals[pid] = (upload_bytes, download_bytes)
     
     def log_alert(self, pid, process_name, alert_type, bandwidth_value, threshold):
-        """Log a bandwidth alert"""
-        with self.lock:
-            try:
-                conn = sqlite3.connect(self.db_file)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO alerts 
-                    (pid, process_name, alert_type, bandwidth_value, threshold)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (pid, process_name, alert_type, bandwidth_value, threshold))
-                
-                conn.commit()
-                conn.close()
-            except Exception as e:
-                print(f"Alert logging error: {e}")
+        """Queue a bandwidth alert"""
+        self._enqueue(INSERT_ALERT, (
+            _utc_timestamp(), pid, process_name, alert_type, bandwidth_value, threshold
+        ))
+    
+    def log_self_metrics(self, cpu_percent, rss_bytes, threads, 
+                         packets_per_sec, kernel_drops):
+        """Queue a sample of the monitor's own resource usage"""
+        self._enqueue(INSERT_SELF_METRICS, (
+            _utc_timestamp(), cpu_percent, rss_bytes, threads, packets_per_sec, kernel_drops
+        ))
+    
+    def import_traffic(self, rows):
+        """
+        Write traffic rows that carry their own time, bypassing the queue
+        (for loading history, tests and benchmarks): (timestamp epoch ms,
+        pid, process_name, upload_bytes, download_bytes, upload_rate,
+        download_rate, protocols string), with byte deltas, not totals
+        """
+        self._write_batch([(INSERT_TRAFFIC, row) for row in rows])
+    
+    def import_alerts(self, rows):
+        """
+        Write alert rows that carry their own time, bypassing the queue:
+        (UTC 'YYYY-MM-DD HH:MM:SS' timestamp, pid, process_name,
+        alert_type, bandwidth_value, threshold)
+        """
+        self._write_batch([(INSERT_ALERT, row) for row in rows])
     
     def start_session(self):
         """Start a new monitoring session"""
         with self.lock:
             try:
-                conn = sqlite3.connect(self.db_file)
-                cursor = conn.cursor()
+                cursor = self.conn.cursor()
                 
                 cursor.execute('''
                     INSERT INTO sessions (start_time, total_upload, total_download)
@@ -130,19 +1510,21 @@ class DatabaseLogger:
                 ''', (datetime.now(),))
                 
                 session_id = cursor.lastrowid
-                conn.commit()
-                conn.close()
+                self.conn.commit()
+                self.report_cache.invalidate('sessions')
                 return session_id
             except Exception as e:
+                self._rollback()
                 print(f"Session start error: {e}")
                 return None
     
     def end_session(self, session_id, total_upload, total_download):
-        """End a monitoring session"""
+        """End a monitoring session, flushing all queued rows first"""
+        self.flush()
+        
         with self.lock:
             try:
-                conn = sqlite3.connect(self.db_file)
-                cursor = conn.cursor()
+                cursor = self.conn.cursor()
                 
                 cursor.execute('''
                     UPDATE sessions 
@@ -150,51 +1532,60 @@ class DatabaseLogger:
                     WHERE id = ?
                 ''', (datetime.now(), total_upload, total_download, session_id))
                 
-                conn.commit()
-                conn.close()
+                self.conn.commit()
+                self.report_cache.invalidate('sessions')
             except Exception as e:
+                self._rollback()
                 print(f"Session end error: {e}")
     
-    def get_traffic_report(self, start_date=None, end_date=None, pid=None):
-        """Generate traffic report for specified time period"""
-        with self.lock:
+    def _iter_query(self, query, params, label):
+        """
+        Run a read query and yield its rows fetchmany() chunks at a time,
+        holding one pooled read connection until the generator finishes
+        or is closed. Errors are printed and end the iteration.
+        """
+        with self._reader() as conn:
             try:
-                conn = sqlite3.connect(self.db_file)
                 cursor = conn.cursor()
-                
-                query = '''
-                    SELECT pid, process_name, 
-                           SUM(upload_bytes) as total_upload,
-                           SUM(download_bytes) as total_download,
-                           SUM(total_bytes) as total_data,
-                           COUNT(*) as records
-                    FROM traffic_log
-                    WHERE 1=1
-                '''
-                params = []
-                
-                if start_date:
-                    query += ' AND timestamp >= ?'
-                    params.append(start_date)
-                
-                if end_date:
-                    query += ' AND timestamp <= ?'
-                    params.append(end_date)
-                
-                if pid:
-                    query += ' AND pid = ?'
-                    params.append(pid)
-                
-                query += ' GROUP BY pid, process_name ORDER BY total_data DESC'
-                
                 cursor.execute(query, params)
-                results = cursor.fetchall()
-                
-                conn.close()
-                return results
+                while True:
+                    rows = cursor.fetchmany(self.fetch_rows)
+                    if not rows:
+                        break
+                    yield from rows
             except Exception as e:
-                print(f"Report generation error: {e}")
-                return []
+                print(f"{label} error: {e}")
+    
+    def iter_traffic_report(self, start_date=None, end_date=None, pid=None):
+        """Stream per-process traffic totals for a time period, largest first"""
+        self.flush()
+        
+        source, params = self._range_source(start_date or None, end_date or None)
+        where = '1=1'
+        if pid:
+            where = 'process_id IN (SELECT id FROM processes WHERE pid = ?)'
+            params.append(pid)
+        
+        yield from self._iter_query(f'''
+            SELECT p.pid, p.name, t.total_upload, t.total_download,
+                   t.total_data, t.records
+            FROM (
+                SELECT process_id,
+                       SUM(upload_bytes) as total_upload,
+                       SUM(download_bytes) as total_download,
+                       SUM(upload_bytes + download_bytes) as total_data,
+                       SUM(samples) as records
+                FROM ({source})
+                WHERE {where}
+                GROUP BY process_id
+            ) t
+            JOIN processes p ON p.id = t.process_id
+            ORDER BY t.total_data DESC
+        ''', params, "Report generation")
+    
+    def get_traffic_report(self, start_date=None, end_date=None, pid=None):
+        """Generate traffic report for specified time period"""
+        return list(self.iter_traffic_report(start_date, end_date, pid))
     
     def get_daily_report(self):
         """Get today's traffic report"""
@@ -204,9 +1595,10 @@ class DatabaseLogger:
     
     def get_recent_alerts(self, limit=10):
         """Get recent bandwidth alerts"""
-        with self.lock:
+        self.flush()
+        
+        with self._reader() as conn:
             try:
-                conn = sqlite3.connect(self.db_file)
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -218,120 +1610,497 @@ class DatabaseLogger:
                 ''', (limit,))
                 
                 results = cursor.fetchall()
-                conn.close()
                 return results
             except Exception as e:
                 print(f"Alert retrieval error: {e}")
                 return []
     
-    def get_alerts_by_date_range(self, start_date, end_date):
-        """Get alerts within date range for report"""
-        with self.lock:
+    def _iter_cached_range(self, kind, query, column, start_date, end_date, now, label):
+        """
+        Stream the rows of a newest-first range query whose {lower}
+        placeholder compares row column `column` with the range start.
+        The part of the range up to now is kept in the report cache under
+        its start, so a later call for the same start (with any end) only
+        queries the rows after it. Results over REPORT_CACHE_MAX_ROWS
+        rows are streamed without caching.
+        """
+        lo, hi = _sql_text(start_date), _sql_text(end_date)
+        if lo is None or hi is None or not self.report_cache.max_entries:
+            yield from self._iter_query(query.format(lower='>='), (start_date, end_date), label)
+            return
+        
+        generation = self.report_cache.generation
+        split, cached = self.report_cache.get(kind, lo) or (None, [])
+        if split is not None and split >= hi:
+            yield from (row for row in cached if row[column] <= hi)
+            return
+        
+        closed = min(hi, now)
+        collected = []
+        with self._reader() as conn:
             try:
-                conn = sqlite3.connect(self.db_file)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT timestamp, pid, process_name, alert_type, 
-                           bandwidth_value, threshold
-                    FROM alerts
-                    WHERE timestamp BETWEEN ? AND ?
-                    ORDER BY timestamp DESC
-                ''', (start_date, end_date))
-                
-                results = cursor.fetchall()
-                conn.close()
-                return results
+                if split is None:
+                    cursor = conn.execute(query.format(lower='>='), (lo, hi))
+                else:
+                    cursor = conn.execute(query.format(lower='>'), (split, hi))
+                while True:
+                    rows = cursor.fetchmany(self.fetch_rows)
+                    if not rows:
+                        break
+                    if collected is not None:
+                        collected += [row for row in rows if row[column] <= closed]
+                        if len(collected) + len(cached) > REPORT_CACHE_MAX_ROWS:
+                            collected = None
+                    yield from rows
             except Exception as e:
-                print(f"Alert retrieval error: {e}")
-                return []
+                print(f"{label} error: {e}")
+                return
+        yield from cached
+        
+        if collected is not None and (split is None or closed > split):
+            self.report_cache.put(kind, lo, lo, closed, (closed, collected + cached), generation)
+    
+    def _count_cached_range(self, kind, query, column, start_date, end_date, label):
+        """
+        COUNT(*) of a range query like _iter_cached_range, counting the
+        cached part of the range in memory
+        """
+        lo, hi = _sql_text(start_date), _sql_text(end_date)
+        split, cached = (None, [])
+        if lo is not None and hi is not None:
+            split, cached = self.report_cache.get(kind, lo) or (None, [])
+        if split is None:
+            query, params = query.format(lower='>='), (start_date, end_date)
+        else:
+            query, params = query.format(lower='>'), (split, hi)
+        
+        count = sum(1 for row in cached if row[column] <= hi)
+        if split is None or split < hi:
+            for (rows,) in self._iter_query(query, params, label):
+                count += rows
+        return count
+    
+    def iter_alerts_by_date_range(self, start_date, end_date):
+        """Stream alerts within a date range, newest first"""
+        self.flush()
+        
+        yield from self._iter_cached_range('alerts', '''
+            SELECT timestamp, pid, process_name, alert_type, 
+                   bandwidth_value, threshold
+            FROM alerts
+            WHERE timestamp {lower} ? AND timestamp <= ?
+            ORDER BY timestamp DESC
+        ''', 0, start_date, end_date, _utc_timestamp(), "Alert retrieval")
+    
+    def get_alerts_by_date_range(self, start_date, end_date):
+        """Get alerts within date range for report"""
+        return list(self.iter_alerts_by_date_range(start_date, end_date))
+    
+    def count_alerts_by_date_range(self, start_date, end_date):
+        """Number of alerts within a date range"""
+        return self._count_cached_range(
+            'alerts', 'SELECT COUNT(*) FROM alerts WHERE timestamp {lower} ? AND timestamp <= ?',
+            0, start_date, end_date, "Alert count"
+        )
+    
+    def get_overall_stats(self, start_date, end_date):
+        """Overall traffic statistics for a time period"""
+        self.flush()
+        
+        # Read from rollups wherever whole buckets cover the range
+        source, params = self._range_source(start_date, end_date)
+        for row in self._iter_query(f'''
+            SELECT 
+                COUNT(DISTINCT p.pid) as unique_processes,
+                SUM(upload_bytes) as total_upload,
+                SUM(download_bytes) as total_download,
+                SUM(upload_rate_sum) / SUM(samples) as avg_upload_rate,
+                SUM(download_rate_sum) / SUM(samples) as avg_download_rate,
+                MAX(upload_rate_max) as max_upload_rate,
+                MAX(download_rate_max) as max_download_rate
+            FROM ({source}) t
+            JOIN processes p ON p.id = t.process_id
+        ''', params, "Detailed report"):
+            return row
+        return None
+    
+    def iter_process_stats(self, start_date, end_date):
+        """Stream per-process statistics for a time period, largest first"""
+        self.flush()
+        
+        source, params = self._range_source(start_date, end_date)
+        yield from self._iter_query(f'''
+            SELECT 
+                p.pid, 
+                p.name,
+                t.total_upload, t.total_download,
+                t.avg_upload_rate, t.avg_download_rate,
+                t.max_upload_rate, t.max_download_rate,
+                t.records,
+                s.protocols
+            FROM (
+                SELECT 
+                    process_id,
+                    SUM(upload_bytes) as total_upload,
+                    SUM(download_bytes) as total_download,
+                    SUM(upload_rate_sum) / SUM(samples) as avg_upload_rate,
+                    SUM(download_rate_sum) / SUM(samples) as avg_download_rate,
+                    MAX(upload_rate_max) as max_upload_rate,
+                    MAX(download_rate_max) as max_download_rate,
+                    SUM(samples) as records,
+                    MAX(protocol_set_id) as protocol_set_id
+                FROM ({source})
+                GROUP BY process_id
+            ) t
+            JOIN processes p ON p.id = t.process_id
+            LEFT JOIN protocol_sets s ON s.id = t.protocol_set_id
+            ORDER BY (t.total_upload + t.total_download) DESC
+        ''', params, "Detailed report")
     
     def get_detailed_report_data(self, start_date, end_date):
         """Get detailed data for report generation"""
-        with self.lock:
-            try:
-                conn = sqlite3.connect(self.db_file)
-                cursor = conn.cursor()
-                
-                # Get overall statistics
-                cursor.execute('''
-                    SELECT 
-                        COUNT(DISTINCT pid) as unique_processes,
-                        SUM(upload_bytes) as total_upload,
-                        SUM(download_bytes) as total_download,
-                        AVG(upload_rate) as avg_upload_rate,
-                        AVG(download_rate) as avg_download_rate,
-                        MAX(upload_rate) as max_upload_rate,
-                        MAX(download_rate) as max_download_rate
-                    FROM traffic_log
-                    WHERE timestamp BETWEEN ? AND ?
-                ''', (start_date, end_date))
-                
-                overall_stats = cursor.fetchone()
-                
-                # Get per-process statistics
-                cursor.execute('''
-                    SELECT 
-                        pid, 
-                        process_name,
-                        SUM(upload_bytes) as total_upload,
-                        SUM(download_bytes) as total_download,
-                        AVG(upload_rate) as avg_upload_rate,
-                        AVG(download_rate) as avg_download_rate,
-                        MAX(upload_rate) as max_upload_rate,
-                        MAX(download_rate) as max_download_rate,
-                        COUNT(*) as records,
-                        protocols
-                    FROM traffic_log
-                    WHERE timestamp BETWEEN ? AND ?
-                    GROUP BY pid, process_name
-                    ORDER BY (SUM(upload_bytes) + SUM(download_bytes)) DESC
-                ''', (start_date, end_date))
-                
-                process_stats = cursor.fetchall()
-                
-                conn.close()
-                return overall_stats, process_stats
-            except Exception as e:
-                print(f"Detailed report error: {e}")
-                return None, []
+        overall_stats = self.get_overall_stats(start_date, end_date)
+        if overall_stats is None:
+            return None, []
+        return overall_stats, list(self.iter_process_stats(start_date, end_date))
+    
+    def _partition_range(self, start_date, end_date):
+        """
+        Epoch-ms bounds [start, end) of the live part of an inclusive date
+        range (None is unbounded), the day partitions that overlap it,
+        oldest first, and the bounds of the archived part (or None)
+        """
+        start = _to_epoch_ms(start_date) if start_date is not None else MIN_EPOCH_MS
+        end = MAX_EPOCH_MS
+        if end_date is not None:
+            end = _to_epoch_ms(end_date)
+            end = end - end % 1000 + 1000
+        
+        archived = None
+        horizon = self.archive_horizon
+        if horizon is not None and start < horizon:
+            archived = (start, min(end, horizon))
+            start = max(start, horizon)
+        
+        tables = [table for table in sorted(self.partitions)
+                  if _partition_start(table) < end and
+                  _partition_start(table) + DAY_MS > start]
+        return start, end, tables, archived
+    
+    def _dimension_names(self):
+        """process_id -> (pid, name) and protocol_set_id -> protocols maps"""
+        processes = {process_id: (pid, name) for process_id, pid, name in
+                     self._iter_query('SELECT id, pid, name FROM processes', (),
+                                      "Traffic export")}
+        protocols = dict(self._iter_query('SELECT id, protocols FROM protocol_sets', (),
+                                          "Traffic export"))
+        return processes, protocols
+    
+    def _named_rows(self, rows, processes, protocols):
+        """
+        Traffic rows in the iter_traffic_rows layout, from rows holding
+        dimension ids; rows of processes no longer known are skipped
+        """
+        for (timestamp, process_id, upload, download,
+             upload_rate, download_rate, protocol_set_id) in rows:
+            if process_id in processes:
+                yield ((timestamp,) + processes[process_id] +
+                       (upload, download, upload_rate, download_rate,
+                        protocols.get(protocol_set_id)))
+    
+    def iter_traffic_rows(self, start_date=None, end_date=None):
+        """
+        Stream raw traffic rows (timestamp in epoch ms, pid, process_name,
+        upload_bytes, download_bytes, upload_rate, download_rate,
+        protocols): archived rows a block (process and day) at a time,
+        then the day partitions in time order, followed by the rows held
+        in segment files
+        """
+        self.flush()
+        
+        start, end, tables, archived = self._partition_range(start_date, end_date)
+        if archived or self.segments is not None:
+            processes, protocols = self._dimension_names()
+        if archived:
+            for rows in self._iter_archive(*archived):
+                yield from self._named_rows(rows, processes, protocols)
+        
+        for table in tables:
+            yield from self._iter_query(f'''
+                SELECT t.timestamp, p.pid, p.name, t.upload_bytes, t.download_bytes,
+                       t.upload_rate, t.download_rate, s.protocols
+                FROM {table} t
+                JOIN processes p ON p.id = t.process_id
+                LEFT JOIN protocol_sets s ON s.id = t.protocol_set_id
+                WHERE t.timestamp >= ? AND t.timestamp < ?
+                ORDER BY t.timestamp
+            ''', (start, end), "Traffic export")
+        
+        if self.segments is not None:
+            for rows in self.segments.iter_rows(start, end, self.fetch_rows):
+                yield from self._named_rows(rows, processes, protocols)
+    
+    def count_traffic_rows(self, start_date=None, end_date=None):
+        """Number of raw traffic rows within a date range"""
+        self.flush()
+        
+        start, end, tables, archived = self._partition_range(start_date, end_date)
+        count = 0
+        if archived:
+            lo, hi = archived
+            parts, params = self._archive_sources(lo if lo > MIN_EPOCH_MS else None, hi)
+            if parts:
+                for (rows,) in self._iter_query(
+                    f'SELECT COALESCE(SUM(samples), 0) FROM ({" UNION ALL ".join(parts)})',
+                    params, "Traffic count"
+                ):
+                    count += rows
+        for table in tables:
+            for (rows,) in self._iter_query(
+                f'SELECT COUNT(*) FROM {table} WHERE timestamp >= ? AND timestamp < ?',
+                (start, end), "Traffic count"
+            ):
+                count += rows
+        if self.segments is not None:
+            count += self.segments.count(start, end)
+        return count
+    
+    def iter_sessions_in_range(self, start_date, end_date):
+        """Stream monitoring sessions within a date range, newest first"""
+        # Session times are stored as local datetimes
+        yield from self._iter_cached_range('sessions', '''
+            SELECT id, start_time, end_time, total_upload, total_download
+            FROM sessions
+            WHERE start_time {lower} ? AND start_time <= ?
+            ORDER BY start_time DESC
+        ''', 1, start_date, end_date, _sql_text(datetime.now()), "Session retrieval")
     
     def get_sessions_in_range(self, start_date, end_date):
         """Get monitoring sessions within date range"""
-        with self.lock:
+        return list(self.iter_sessions_in_range(start_date, end_date))
+    
+    def count_sessions_in_range(self, start_date, end_date):
+        """Number of monitoring sessions within a date range"""
+        return self._count_cached_range(
+            'sessions', 'SELECT COUNT(*) FROM sessions WHERE start_time {lower} ? AND start_time <= ?',
+            1, start_date, end_date, "Session count"
+        )
+    
+    def iter_export_chunks(self, dataset, start_date, end_date, fmt='csv'):
+        """
+        Stream a dataset ('traffic', 'alerts' or 'sessions') within a date
+        range as (CSV or NDJSON text, row count) chunks, oldest first.
+        Everything is read in one transaction on one pooled connection,
+        so names and rows come from the same snapshot.
+        """
+        self.flush()
+        
+        with self._reader() as conn:
+            conn.execute('BEGIN')
             try:
-                conn = sqlite3.connect(self.db_file)
-                cursor = conn.cursor()
+                if dataset == 'traffic':
+                    # Raw integer rows straight off the covering index; names
+                    # are filled in from the dimension tables while rendering
+                    processes = conn.execute('SELECT id, pid, name FROM processes').fetchall()
+                    render = traffic_renderer(
+                        fmt, processes,
+                        conn.execute('SELECT id, protocols FROM protocol_sets')
+                    )
+                    start, end, tables, archived = self._partition_range(start_date, end_date)
+                    if archived:
+                        for rows in self._archive_blocks(conn, *archived):
+                            for offset in range(0, len(rows), self.export_chunk_rows):
+                                chunk = rows[offset:offset + self.export_chunk_rows]
+                                yield render(chunk), len(chunk)
+                    queries = [(f'''
+                        SELECT timestamp, process_id, upload_bytes, download_bytes,
+                               upload_rate, download_rate, protocol_set_id
+                        FROM {table}
+                        WHERE timestamp >= ? AND timestamp < ?
+                        ORDER BY timestamp
+                    ''', (start, end)) for table in tables]
+                elif dataset == 'alerts':
+                    render = row_renderer(dataset, fmt)
+                    queries = [('''
+                        SELECT timestamp, pid, process_name, alert_type,
+                               bandwidth_value, threshold
+                        FROM alerts
+                        WHERE timestamp BETWEEN ? AND ?
+                        ORDER BY timestamp
+                    ''', (start_date, end_date))]
+                else:
+                    render = row_renderer(dataset, fmt)
+                    queries = [('''
+                        SELECT id, start_time, end_time, total_upload, total_download
+                        FROM sessions
+                        WHERE start_time BETWEEN ? AND ?
+                        ORDER BY start_time
+                    ''', (start_date, end_date))]
                 
-                cursor.execute('''
-                    SELECT id, start_time, end_time, total_upload, total_download
-                    FROM sessions
-                    WHERE start_time BETWEEN ? AND ?
-                    ORDER BY start_time DESC
-                ''', (start_date, end_date))
+                for query, params in queries:
+                    cursor = conn.execute(query, params)
+                    while True:
+                        rows = cursor.fetchmany(self.export_chunk_rows)
+                        if not rows:
+                            break
+                        yield render(rows), len(rows)
                 
-                results = cursor.fetchall()
-                conn.close()
-                return results
-            except Exception as e:
-                print(f"Session retrieval error: {e}")
-                return []
+                if dataset == 'traffic' and self.segments is not None:
+                    # Segment records of expired processes are skipped, as
+                    # the join does for partition rows
+                    known = {row[0] for row in processes}
+                    for rows in self.segments.iter_rows(start, end, self.export_chunk_rows):
+                        rows = [row for row in rows if row[1] in known]
+                        if rows:
+                            yield render(rows), len(rows)
+            finally:
+                conn.rollback()
+    
+    def export_data(self, output_file, dataset, start_date, end_date,
+                    fmt='csv', compression='gzip', progress=None):
+        """
+        Export 'traffic', 'alerts' or 'sessions' rows in a date range to a
+        gzip/zstd-compressed (or plain) CSV or NDJSON file. Rows are
+        streamed in chunks, so memory use does not depend on the range.
+        progress(rows_written, total_rows) is called after each chunk.
+        Returns (success, rows written or error message).
+        """
+        counters = {
+            'traffic': self.count_traffic_rows,
+            'alerts': self.count_alerts_by_date_range,
+            'sessions': self.count_sessions_in_range,
+        }
+        if dataset not in counters:
+            return False, f"Unknown dataset: {dataset}"
+        
+        try:
+            total = counters[dataset](start_date, end_date)
+            if progress:
+                progress(0, total)
+            
+            with open_output(output_file, compression) as output:
+                output.write(header_line(dataset, fmt))
+                written = write_chunks(
+                    self.iter_export_chunks(dataset, start_date, end_date, fmt), output,
+                    progress=(lambda rows: progress(rows, total)) if progress else None
+                )
+            return True, written
+        except Exception as e:
+            print(f"Export error: {e}")
+            return False, str(e)
     
-    def cleanup_old_data(self, days=30):
-        """Delete data older than specified days"""
+    def cleanup_old_data(self, days=DATA_RETENTION_DAYS, archive_days=ARCHIVE_RETENTION_DAYS):
+        """
+        Delete data older than specified days. Raw traffic is dropped a
+        whole day partition (or segment file) at a time, and freed pages
+        are returned to the file system with an incremental vacuum. If
+        archive_days is longer, expiring raw traffic is moved to the
+        compressed archive first and kept there for archive_days.
+        """
+        if self.readonly:
+            return
+        cutoff_ms = _epoch_ms() - days * DAY_MS
+        cutoff_table = _partition_name(cutoff_ms)
+        archiving = archive_days > days
+        horizon = _partition_start(cutoff_table)
+        if archiving and not self._archive_expired(horizon):
+            return
+        archive_cutoff = _partition_start(
+            _partition_name(_epoch_ms() - max(days, archive_days) * DAY_MS))
+        
         with self.lock:
             try:
-                conn = sqlite3.connect(self.db_file)
-                cursor = conn.cursor()
+                # Expired processes are found through the daily rollup, so
+                # every segment record must be folded into it first
+                if self.segments is not None and not self._compact_segments():
+                    return
                 
-                cutoff_date = datetime.now() - timedelta(days=days)
+                cursor = self.conn.cursor()
+                
+                cutoff_date = (datetime.now(timezone.utc) - timedelta(days=days)
+                               ).strftime('%Y-%m-%d %H:%M:%S')
+                
+                # When archiving, expired partitions were moved already (one
+                # written since is archived by the next run)
+                expired = [] if archiving else [table for table in self.partitions
+                                                if table < cutoff_table]
+                if expired:
+                    self.partitions.difference_update(expired)
+                    self._rebuild_traffic_view(cursor)
+                    for table in expired:
+                        cursor.execute(f'DROP TABLE {table}')
+                if self.segments is not None:
+                    # Only files holding nothing but expired (or archived)
+                    # days are deleted
+                    for name in self.segments.drop_before(horizon):
+                        cursor.execute('DELETE FROM segment_compaction WHERE segment = ?',
+                                       (name,))
+                        self.compacted.pop(name, None)
                 
-                cursor.execute('DELETE FROM traffic_log WHERE timestamp < ?', 
-                             (cutoff_date,))
                 cursor.execute('DELETE FROM alerts WHERE timestamp < ?', 
                              (cutoff_date,))
+                cursor.execute('DELETE FROM self_metrics WHERE timestamp < ?', 
+                             (cutoff_date,))
+                if archiving:
+                    horizon = max(horizon, self.archive_horizon or horizon)
+                    self._set_archive_horizon(cursor, horizon)
+                else:
+                    # Rollups go a whole day at a time like the partitions,
+                    # and not past the records kept in segment files
+                    rollup_cutoff = horizon
+                    if self.segments is not None:
+                        for segment, _ in self.segments.list_segments():
+                            bounds = segment.bounds()
+                            if bounds is not None:
+                                rollup_cutoff = min(rollup_cutoff, _partition_start(
+                                    _partition_name(bounds[0])))
+                    for table, _ in ROLLUPS:
+                        cursor.execute(f'DELETE FROM {table} WHERE bucket < ?', 
+                                     (rollup_cutoff,))
+                cursor.execute('DELETE FROM traffic_archive WHERE day < ?', 
+                             (archive_cutoff,))
+                
+                # Every retained raw row is also counted in a daily rollup
+                # or an archive block, so processes missing from both are
+                # no longer referenced (unless another logger's segment
+                # records are still waiting to be folded)
+                if self.segments is None or self.segments.owner:
+                    cursor.execute('''
+                        DELETE FROM processes WHERE id NOT IN
+                        (SELECT process_id FROM traffic_rollup_1d)
+                        AND id NOT IN (SELECT process_id FROM traffic_archive)
+                    ''')
                 
-                conn.commit()
-                conn.close()
+                self.conn.commit()
+                if archiving:
+                    self.archive_horizon = horizon
+                self.report_cache.invalidate()
+                self._load_dimension_cache()
+                cursor.execute(f'PRAGMA incremental_vacuum({int(INCREMENTAL_VACUUM_PAGES)})').fetchall()
             except Exception as e:
+                self._rollback()
+                self.partitions = self._load_partitions(self.conn.cursor())
                 print(f"Cleanup error: {e}")
+    
+    def _retention_loop(self, days, interval):
+        """Background retention job"""
+        while not self.retention_stop.is_set():
+            self.cleanup_old_data(days)
+            self.retention_stop.wait(interval)
+    
+    def start_retention_job(self, days=DATA_RETENTION_DAYS, interval=RETENTION_CHECK_INTERVAL):
+        """Run cleanup_old_data(days) now and then every `interval` seconds"""
+        if self.retention_thread is not None or not days or self.readonly:
+            return
+        self.retention_stop.clear()
+        self.retention_thread = threading.Thread(
+            target=self._retention_loop, args=(days, interval), daemon=True
+        )
+        self.retention_thread.start()
+    
+    def stop_retention_job(self):
+        """Stop the background retention job"""
+        if self.retention_thread is not None:
+            self.retention_stop.set()
+            self.retention_thread.join()
+            self.retention_thread = None
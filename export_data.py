@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Network Bandwidth Monitor - Data Export
+Exports traffic history, alerts and sessions to compressed CSV or NDJSON
+
+Usage:
+    python3 export_data.py [--start YYYY-MM-DD[ HH:MM]] [--end YYYY-MM-DD[ HH:MM]]
+                           [--datasets traffic alerts sessions]
+                           [--format csv|ndjson] [--compression gzip|zstd|none]
+                           [--output-dir DIR] [--db FILE]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from config import DATABASE_FILE
+from data_export import (EXPORT_COLUMNS, EXPORT_FORMATS, EXPORT_COMPRESSIONS,
+                         export_filename)
+
+
+def parse_date(value):
+    """Parse 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM[:SS]'"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {value}")
+
+
+def parse_args():
+    """Parse command line options"""
+    now = datetime.now()
+    parser = argparse.ArgumentParser(description="Export network monitor data")
+    parser.add_argument('--start', type=parse_date, default=now - timedelta(days=7),
+                        help="Start of the range (default: 7 days ago)")
+    parser.add_argument('--end', type=parse_date, default=now,
+                        help="End of the range, inclusive (default: now)")
+    parser.add_argument('--datasets', nargs='+', choices=list(EXPORT_COLUMNS),
+                        default=list(EXPORT_COLUMNS),
+                        help="Datasets to export (default: all)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv',
+                        help="Output format (default: csv)")
+    parser.add_argument('--compression', choices=EXPORT_COMPRESSIONS, default='gzip',
+                        help="Output compression (default: gzip)")
+    parser.add_argument('--output-dir', default='.',
+                        help="Directory for the exported files (default: current)")
+    parser.add_argument('--db', default=DATABASE_FILE,
+                        help=f"Database file (default: {DATABASE_FILE})")
+    return parser.parse_args()
+
+
+def print_progress(dataset):
+    """Progress callback printing a single updating line"""
+    def progress(rows, total):
+        percent = rows * 100 / total if total else 100
+        print(f"\r  {dataset:<10} {rows:>12,} / {total:,} rows ({percent:5.1f}%)",
+              end='', flush=True)
+    return progress
+
+
+def main():
+    """Data export entry point"""
+    args = parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"ERROR: Database not found: {args.db}")
+        sys.exit(1)
+
+    from database_logger import DatabaseLogger
+    # Read-only, so the monitor can keep writing the database meanwhile
+    try:
+        database_logger = DatabaseLogger(db_file=args.db, readonly=True)
+    except Exception as e:
+        print(f"ERROR: Cannot open database: {e}")
+        sys.exit(1)
+
+    print(f"Exporting {args.start:%Y-%m-%d %H:%M} to {args.end:%Y-%m-%d %H:%M}")
+    failed = False
+    try:
+        for dataset in args.datasets:
+            output_file = os.path.join(args.output_dir, export_filename(
+                dataset, args.start, args.end, args.format, args.compression
+            ))
+            start = time.perf_counter()
+            success, result = database_logger.export_data(
+                output_file, dataset, args.start, args.end,
+                args.format, args.compression, print_progress(dataset)
+            )
+            print()
+            if success:
+                print(f"  ✓ {output_file} ({result:,} rows in "
+                      f"{time.perf_counter() - start:.1f} s)")
+            else:
+                print(f"  ✗ {dataset}: {result}")
+                failed = True
+    finally:
+        database_logger.close()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
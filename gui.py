@@ -12,6 +12,9 @@ import os
 from config import (GUI_REFRESH_RATE, WINDOW_WIDTH, WINDOW_HEIGHT, 
                     FONT_FAMILY, FONT_SIZE, BANDWIDTH_ALERT_THRESHOLD)
 from report_generator import ReportGenerator
+from data_export import EXPORT_COLUMNS, export_filename
+from self_metrics import SelfMetrics
+from protocols import protocol_names, protocols_by_bytes
 
 
 class NetworkMonitorGUI:
@@ -20,8 +23,10 @@ class NetworkMonitorGUI:
         self.packet_capture = packet_capture
         self.database_logger = database_logger
         self.report_generator = ReportGenerator(database_logger)
+        self.self_metrics = SelfMetrics(packet_capture)
         self.monitoring = False
         self.session_id = None
+        self.mappings_reported = False
         self.alert_threshold = BANDWIDTH_ALERT_THRESHOLD * 1024  # Convert to bytes
         self.alerted_processes = set()
         
@@ -163,6 +168,20 @@ class NetworkMonitorGUI:
                                          font=(FONT_FAMILY, FONT_SIZE))
         self.active_proc_label.grid(row=0, column=5, padx=10, pady=5)
         
+        # Attribution hit rate and lookup latency
+        tk.Label(stats_frame, text="Attributed:", 
+                font=(FONT_FAMILY, FONT_SIZE, "bold")).grid(row=1, column=0, padx=10, pady=5)
+        self.attribution_label = tk.Label(stats_frame, text="N/A", 
+                                         font=(FONT_FAMILY, FONT_SIZE))
+        self.attribution_label.grid(row=1, column=1, columnspan=2, padx=10, pady=5, sticky=tk.W)
+        
+        # Unattributed traffic by reason
+        tk.Label(stats_frame, text="Unattributed:", 
+                font=(FONT_FAMILY, FONT_SIZE, "bold")).grid(row=1, column=3, padx=10, pady=5)
+        self.unattributed_label = tk.Label(stats_frame, text="N/A", 
+                                          font=(FONT_FAMILY, FONT_SIZE))
+        self.unattributed_label.grid(row=1, column=4, columnspan=3, padx=10, pady=5, sticky=tk.W)
+        
     def create_process_table(self):
         """Create the main process table"""
         # Table Frame
@@ -207,7 +226,7 @@ class NetworkMonitorGUI:
         self.tree.column("Download (KB/s)", width=120)
         self.tree.column("Total Upload", width=120)
         self.tree.column("Total Download", width=120)
-        self.tree.column("Protocols", width=150)
+        self.tree.column("Protocols", width=300)
         
         self.tree.pack(fill=tk.BOTH, expand=True)
         
@@ -239,7 +258,16 @@ class NetworkMonitorGUI:
             font=(FONT_FAMILY, FONT_SIZE),
             anchor=tk.W
         )
-        self.status_label.pack(fill=tk.X, padx=5)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        # Monitor self-overhead (CPU, RSS, threads, packet rate, drops)
+        self.self_metrics_label = tk.Label(
+            status_frame, 
+            text="",
+            font=(FONT_FAMILY, FONT_SIZE),
+            anchor=tk.E
+        )
+        self.self_metrics_label.pack(side=tk.RIGHT, padx=5)
         
     def start_monitoring(self):
         """Start network monitoring"""
@@ -264,15 +292,10 @@ class NetworkMonitorGUI:
         # Start session in database
         self.session_id = self.database_logger.start_session()
         
-        # Update process mappings before starting
+        # Start packet capture right away; process mappings are built in
+        # the background and early packets are held until they are ready
         self.add_alert("Updating process mappings...", "INFO")
-        self.packet_capture.process_mapper.update_socket_mappings()
-        
-        # Get initial network process count
-        network_procs = self.packet_capture.process_mapper.get_all_network_processes()
-        self.add_alert(f"Found {len(network_procs)} processes with network connections", "INFO")
-        
-        # Start packet capture
+        self.mappings_reported = False
         self.packet_capture.start()
         
         # Start GUI update loop
@@ -334,6 +357,12 @@ class NetworkMonitorGUI:
         # Calculate bandwidth rates
         self.packet_capture.calculate_bandwidth()
         
+        # Report once the background mapping warm-up has finished
+        if not self.mappings_reported and self.packet_capture.mapping_ready.is_set():
+            self.mappings_reported = True
+            count = self.packet_capture.process_mapper.indexed_process_count()
+            self.add_alert(f"Found {count} processes with network connections", "INFO")
+        
         # Get process statistics
         stats = self.packet_capture.get_process_stats()
         
@@ -345,6 +374,29 @@ class NetworkMonitorGUI:
         self.total_download_label.config(text=f"{total_download / (1024*1024):.2f} MB")
         self.active_proc_label.config(text=str(len(stats)))
         
+        # Update attribution metrics
+        attribution = self.packet_capture.get_attribution_stats()
+        unattributed = attribution['unattributed']
+        self.attribution_label.config(
+            text=f"{attribution['hit_rate']:.1f}% pkts, {attribution['byte_hit_rate']:.1f}% bytes "
+                 f"(lookup {attribution['avg_lookup_us']:.1f} us)"
+                 f"{self.format_sampling()}"
+        )
+        self.unattributed_label.config(
+            text=f"No match: {unattributed['no_socket_match']['bytes'] / (1024*1024):.2f} MB | "
+                 f"Parse error: {unattributed['parse_error']['packets']} pkts | "
+                 f"Non-local: {unattributed['non_local']['bytes'] / (1024*1024):.2f} MB"
+        )
+        
+        # Sample and log monitor self-overhead
+        sample = self.self_metrics.maybe_sample()
+        if sample:
+            self.self_metrics_label.config(text=self.self_metrics.format_status())
+            self.database_logger.log_self_metrics(
+                sample['cpu_percent'], sample['rss_bytes'], sample['threads'],
+                sample['packets_per_sec'], sample['kernel_drops']
+            )
+        
         # Update process table
         # Clear existing items
         for item in self.tree.get_children():
@@ -359,7 +411,11 @@ class NetworkMonitorGUI:
             download_rate_kb = data['download_rate'] / 1024
             total_up_mb = data['upload_bytes'] / (1024 * 1024)
             total_down_mb = data['download_bytes'] / (1024 * 1024)
-            protocols = ', '.join(sorted(data['protocols'])) if data['protocols'] else 'N/A'
+            # Bytes per protocol, busiest first
+            protocols = ', '.join(
+                f"{name} {byte_count / (1024 * 1024):.2f} MB"
+                for name, byte_count in protocols_by_bytes(data['protocol_bytes'])
+            ) or 'N/A'
             
             # Check for bandwidth spike
             tags = ()
@@ -401,12 +457,21 @@ class NetworkMonitorGUI:
                 pid, data['name'], 
                 data['upload_bytes'], data['download_bytes'],
                 data['upload_rate'], data['download_rate'],
-                list(data['protocols'])
+                protocol_names(data['protocols'])
             )
         
         # Schedule next update
         self.root.after(GUI_REFRESH_RATE, self.update_display)
         
+    def format_sampling(self):
+        """Describe the sampling mode and its accuracy bound, if sampling"""
+        sampling = self.packet_capture.get_sampling_info()
+        if sampling['rate'] <= 1:
+            return ""
+        where = "kernel" if sampling['in_kernel'] else sampling['mode']
+        return (f" | Sampling 1/{sampling['rate']} ({where}), "
+                f"+/-{sampling['packets_error_percent']:.1f}% @95%")
+        
     def add_alert(self, message, alert_type="INFO"):
         """Add an alert to the alert panel"""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -507,7 +572,7 @@ class NetworkMonitorGUI:
         """Show dialog to generate custom report with date range"""
         dialog = tk.Toplevel(self.root)
         dialog.title("Generate Custom Report")
-        dialog.geometry("500x350")
+        dialog.geometry("500x470")
         dialog.transient(self.root)
         dialog.grab_set()
         
@@ -589,19 +654,37 @@ class NetworkMonitorGUI:
         tk.Radiobutton(format_frame, text="Word Document (.docx)", variable=format_var, value="docx", font=(FONT_FAMILY, FONT_SIZE)).pack(anchor=tk.W, padx=10)
         tk.Radiobutton(format_frame, text="Both Formats", variable=format_var, value="both", font=(FONT_FAMILY, FONT_SIZE)).pack(anchor=tk.W, padx=10)
         
+        # Raw data export (traffic, alerts and sessions as gzip files)
+        export_frame = tk.LabelFrame(dialog, text="Data Export", font=(FONT_FAMILY, FONT_SIZE))
+        export_frame.pack(fill=tk.X, padx=20, pady=5)
+        
+        export_format_var = tk.StringVar(value="csv")
+        tk.Radiobutton(export_frame, text="CSV (.csv.gz)", variable=export_format_var, value="csv", font=(FONT_FAMILY, FONT_SIZE)).pack(side=tk.LEFT, padx=10)
+        tk.Radiobutton(export_frame, text="NDJSON (.ndjson.gz)", variable=export_format_var, value="ndjson", font=(FONT_FAMILY, FONT_SIZE)).pack(side=tk.LEFT, padx=10)
+        export_status_var = tk.StringVar(value="")
+        tk.Label(dialog, textvariable=export_status_var, font=(FONT_FAMILY, FONT_SIZE)).pack()
+        
+        def get_date_range():
+            """Parse the dialog's date range; None if it is invalid"""
+            # Parse dates
+            start_date_str = f"{start_date_var.get()} {start_time_var.get()}:00"
+            end_date_str = f"{end_date_var.get()} {end_time_var.get()}:59"
+            
+            start_date = datetime.strptime(start_date_str, "%Y-%m-%d %H:%M:%S")
+            end_date = datetime.strptime(end_date_str, "%Y-%m-%d %H:%M:%S")
+            
+            if start_date >= end_date:
+                messagebox.showerror("Invalid Date Range", "Start date must be before end date!")
+                return None
+            return start_date, end_date
+        
         # Generate button
         def generate_report():
             try:
-                # Parse dates
-                start_date_str = f"{start_date_var.get()} {start_time_var.get()}:00"
-                end_date_str = f"{end_date_var.get()} {end_time_var.get()}:59"
-                
-                start_date = datetime.strptime(start_date_str, "%Y-%m-%d %H:%M:%S")
-                end_date = datetime.strptime(end_date_str, "%Y-%m-%d %H:%M:%S")
-                
-                if start_date >= end_date:
-                    messagebox.showerror("Invalid Date Range", "Start date must be before end date!")
+                date_range = get_date_range()
+                if not date_range:
                     return
+                start_date, end_date = date_range
                 
                 # Ask for output directory
                 output_dir = filedialog.askdirectory(title="Select Output Directory")
@@ -647,6 +730,79 @@ class NetworkMonitorGUI:
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to generate report: {e}")
         
+        # Export button: runs in a background thread, polled for progress
+        def export_data():
+            try:
+                date_range = get_date_range()
+            except ValueError as e:
+                messagebox.showerror("Invalid Date", f"Please enter valid dates in YYYY-MM-DD format\n\n{e}")
+                return
+            if not date_range:
+                return
+            start_date, end_date = date_range
+            
+            output_dir = filedialog.askdirectory(title="Select Export Directory")
+            if not output_dir:
+                return
+            
+            export_format = export_format_var.get()
+            state = {'status': "Starting export...", 'results': None}
+            
+            def run_export():
+                results = []
+                try:
+                    for dataset in EXPORT_COLUMNS:
+                        output_file = os.path.join(output_dir, export_filename(
+                            dataset, start_date, end_date, export_format
+                        ))
+                        
+                        def progress(rows, total, dataset=dataset):
+                            state['status'] = f"Exporting {dataset}: {rows:,} / {total:,} rows"
+                        
+                        success, result = self.database_logger.export_data(
+                            output_file, dataset, start_date, end_date,
+                            export_format, 'gzip', progress
+                        )
+                        results.append((dataset, output_file, success, result))
+                except Exception as e:
+                    results.append(("export", None, False, e))
+                state['results'] = results
+            
+            def poll_export():
+                # Polled on the main window, so the outcome is still
+                # reported there if the dialog was closed meanwhile
+                dialog_open = dialog.winfo_exists()
+                if state['results'] is None:
+                    if dialog_open:
+                        export_status_var.set(state['status'])
+                    else:
+                        self.status_label.config(text=state['status'])
+                    self.root.after(200, poll_export)
+                    return
+                
+                if dialog_open:
+                    export_status_var.set("")
+                failed = [f"{dataset}: {result}" for dataset, _, success, result
+                          in state['results'] if not success]
+                if failed:
+                    self.status_label.config(text="Data export failed")
+                    self.add_alert("Data export failed: " + "; ".join(failed), "ERROR")
+                    if dialog_open:
+                        messagebox.showerror("Error", "Export failed:\n\n" +
+                                             "\n".join(f"- {line}" for line in failed))
+                else:
+                    rows = sum(result for _, _, _, result in state['results'])
+                    self.status_label.config(text=f"Data exported to {output_dir}")
+                    self.add_alert(f"Data exported to {output_dir} ({rows:,} rows)")
+                    if dialog_open:
+                        msg = "Data exported successfully:\n\n"
+                        for _, output_file, _, rows in state['results']:
+                            msg += f"- {output_file} ({rows:,} rows)\n"
+                        messagebox.showinfo("Success", msg)
+            
+            threading.Thread(target=run_export, daemon=True).start()
+            poll_export()
+        
         button_frame = tk.Frame(dialog)
         button_frame.pack(pady=10)
         
@@ -660,6 +816,14 @@ class NetworkMonitorGUI:
             width=15
         ).pack(side=tk.LEFT, padx=5)
         
+        tk.Button(
+            button_frame,
+            text="Export Data",
+            command=export_data,
+            font=(FONT_FAMILY, FONT_SIZE),
+            width=12
+        ).pack(side=tk.LEFT, padx=5)
+        
         tk.Button(
             button_frame,
             text="Cancel",
@@ -7,6 +7,8 @@ import curses
 import time
 from datetime import datetime
 from config import BANDWIDTH_ALERT_THRESHOLD
+from self_metrics import SelfMetrics
+from protocols import protocol_names, protocols_by_bytes
 
 
 class NetworkMonitorTUI:
@@ -14,6 +16,7 @@ class NetworkMonitorTUI:
         self.stdscr = stdscr
         self.packet_capture = packet_capture
         self.database_logger = database_logger
+        self.self_metrics = SelfMetrics(packet_capture)
         self.monitoring = False
         self.session_id = None
         self.alert_threshold = BANDWIDTH_ALERT_THRESHOLD * 1024
@@ -78,7 +81,7 @@ class NetworkMonitorTUI:
         status_color = curses.color_pair(1) if self.monitoring else curses.color_pair(4)
         
         controls = [
-            f"[S]tart  [Q]uit  [R]eset  [H]elp  [T]hreshold  Status: ",
+            f"[S]tart  [Q]uit  [R]eset  [H]elp  [T]hreshold  [P]rofile  Status: ",
             f"{status}"
         ]
         
@@ -108,6 +111,26 @@ class NetworkMonitorTUI:
             self.stdscr.attroff(curses.color_pair(2))
         except:
             pass
+        
+        # Attribution hit rate, lookup latency and unattributed traffic
+        attribution = self.packet_capture.get_attribution_stats()
+        unattributed = attribution['unattributed']
+        line = (f"Attributed: {attribution['hit_rate']:.1f}% "
+                f"(lookup {attribution['avg_lookup_us']:.1f}us)  "
+                f"Unattributed - no match: {self.format_bytes(unattributed['no_socket_match']['bytes'])}, "
+                f"parse err: {unattributed['parse_error']['packets']}, "
+                f"non-local: {self.format_bytes(unattributed['non_local']['bytes'])}")
+        
+        sampling = self.packet_capture.get_sampling_info()
+        if sampling['rate'] > 1:
+            line += (f"  Sampling 1/{sampling['rate']} "
+                     f"+/-{sampling['packets_error_percent']:.1f}%")
+        
+        try:
+            height, width = self.stdscr.getmaxyx()
+            self.stdscr.addstr(y_pos + 1, 2, line[:width-4])
+        except:
+            pass
     
     def draw_process_table(self, y_pos):
         """Draw process table"""
@@ -139,7 +162,10 @@ class NetworkMonitorTUI:
             
             upload_rate_kb = data['upload_rate'] / 1024
             download_rate_kb = data['download_rate'] / 1024
-            protocols = ','.join(sorted(data['protocols']))[:14] if data['protocols'] else 'N/A'
+            # Busiest protocols first, so the narrow column shows the main ones
+            protocols = ','.join(
+                name for name, _ in protocols_by_bytes(data['protocol_bytes'])
+            )[:14] or 'N/A'
             
             # Check for high bandwidth
             is_alert = (upload_rate_kb * 1024 > self.alert_threshold or 
@@ -179,7 +205,7 @@ class NetworkMonitorTUI:
                     pid, data['name'], 
                     data['upload_bytes'], data['download_bytes'],
                     data['upload_rate'], data['download_rate'],
-                    list(data['protocols'])
+                    protocol_names(data['protocols'])
                 )
             except:
                 pass
@@ -219,6 +245,7 @@ class NetworkMonitorTUI:
             "R - Reset statistics",
             "H - Toggle this help",
             "T - Set bandwidth threshold",
+            "P - Toggle hot-path profiling",
             "",
             "Press any key to continue..."
         ]
@@ -305,9 +332,20 @@ class NetworkMonitorTUI:
                 table_end = self.draw_process_table(7)
                 self.draw_alerts(max(table_end + 1, height - 8))
                 
+                # Sample and log monitor self-overhead
+                if self.monitoring:
+                    sample = self.self_metrics.maybe_sample()
+                    if sample:
+                        self.database_logger.log_self_metrics(
+                            sample['cpu_percent'], sample['rss_bytes'], sample['threads'],
+                            sample['packets_per_sec'], sample['kernel_drops']
+                        )
+                
                 # Status bar
                 try:
-                    status_text = f" Threshold: {self.alert_threshold/1024:.0f} KB/s | Time: {datetime.now().strftime('%H:%M:%S')} "
+                    status_text = (f" Threshold: {self.alert_threshold/1024:.0f} KB/s | "
+                                   f"{self.self_metrics.format_status()} | "
+                                   f"Time: {datetime.now().strftime('%H:%M:%S')} ")
                     self.stdscr.attron(curses.color_pair(6))
                     self.stdscr.addstr(height - 1, 0, status_text.ljust(width))
                     self.stdscr.attroff(curses.color_pair(6))
@@ -342,6 +380,19 @@ class NetworkMonitorTUI:
                     if self.alert_threshold > 10240 * 1024:  # Max 10 MB
                         self.alert_threshold = 512 * 1024  # Reset to 512 KB
                     self.add_alert(f"Threshold set to {self.alert_threshold/1024:.0f} KB/s", "INFO")
+                elif key == ord('p') or key == ord('P'):
+                    enabled = not self.packet_capture.profiler.enabled
+                    self.packet_capture.set_profiling(enabled)
+                    if enabled:
+                        self.add_alert("Profiling enabled", "INFO")
+                    else:
+                        # Summarize the slowest per-packet stages before turning off
+                        stages = self.packet_capture.get_profile()['stages']
+                        summary = ", ".join(
+                            f"{name} p99={s['p99_us']:.1f}us"
+                            for name, s in stages.items() if s['count']
+                        )
+                        self.add_alert(f"Profiling disabled - {summary or 'no samples'}", "INFO")
                 
                 time.sleep(0.1)
                 
@@ -362,9 +413,11 @@ def main_tui(stdscr):
     
     packet_capture = PacketCapture(interface=CAPTURE_INTERFACE)
     database_logger = DatabaseLogger()
+    database_logger.start_retention_job()
     
     app = NetworkMonitorTUI(stdscr, packet_capture, database_logger)
     app.run()
+    database_logger.close()
 
 
 if __name__ == "__main__":
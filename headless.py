@@ -0,0 +1,152 @@
+"""
+Headless Service Module
+Runs capture, rate/alert calculation and database persistence without a UI
+"""
+
+import threading
+from datetime import datetime
+
+from config import (BANDWIDTH_ALERT_THRESHOLD, HEADLESS_TICK_INTERVAL,
+                    HEADLESS_PERSIST_INTERVAL)
+from self_metrics import SelfMetrics
+from protocols import protocol_names
+
+
+class HeadlessMonitor:
+    def __init__(self, packet_capture, database_logger,
+                 tick_interval=HEADLESS_TICK_INTERVAL,
+                 persist_interval=HEADLESS_PERSIST_INTERVAL):
+        self.packet_capture = packet_capture
+        self.database_logger = database_logger
+        self.self_metrics = SelfMetrics(packet_capture)
+        self.tick_interval = tick_interval
+        self.persist_interval = persist_interval
+        self.alert_threshold = BANDWIDTH_ALERT_THRESHOLD * 1024
+        self.alerted_processes = set()
+        self.session_id = None
+        self.persist_thread = None
+        self.stop_event = threading.Event()
+        self.profile_requested = threading.Event()
+
+    def log(self, message):
+        """Print a timestamped status line (captured by journald under systemd)"""
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+    def check_alerts(self):
+        """Raise and log alerts for processes above the bandwidth threshold"""
+        for pid, data in self.packet_capture.get_process_stats().items():
+            is_alert = (data['upload_rate'] > self.alert_threshold or
+                        data['download_rate'] > self.alert_threshold)
+
+            if is_alert and pid not in self.alerted_processes:
+                upload_rate_kb = data['upload_rate'] / 1024
+                download_rate_kb = data['download_rate'] / 1024
+                self.log(f"ALERT: {data['name']} (PID {pid}) - "
+                         f"Up:{upload_rate_kb:.1f} Down:{download_rate_kb:.1f} KB/s")
+                self.alerted_processes.add(pid)
+
+                self.database_logger.log_alert(
+                    pid, data['name'], "BANDWIDTH_SPIKE",
+                    max(upload_rate_kb, download_rate_kb), self.alert_threshold / 1024
+                )
+            elif not is_alert:
+                self.alerted_processes.discard(pid)
+
+    def sample_self_metrics(self):
+        """Sample and queue the monitor's own overhead once per metrics interval"""
+        sample = self.self_metrics.maybe_sample()
+        if sample:
+            self.database_logger.log_self_metrics(
+                sample['cpu_percent'], sample['rss_bytes'], sample['threads'],
+                sample['packets_per_sec'], sample['kernel_drops']
+            )
+
+    def request_profile(self):
+        """Ask the tick loop to log the profile; safe to call from a signal handler"""
+        self.profile_requested.set()
+
+    def log_profile(self):
+        """Log the hot-path profile table"""
+        self.log("Hot-path profile:\n" + self.packet_capture.format_profile())
+
+    def persist(self):
+        """Write the latest per-process statistics to the database"""
+        for pid, data in self.packet_capture.get_process_stats().items():
+            self.database_logger.log_traffic(
+                pid, data['name'],
+                data['upload_bytes'], data['download_bytes'],
+                data['upload_rate'], data['download_rate'],
+                protocol_names(data['protocols'])
+            )
+
+    def _persist_loop(self):
+        """Background persistence loop"""
+        while not self.stop_event.wait(self.persist_interval):
+            try:
+                self.persist()
+            except Exception as e:
+                print(f"Persistence error: {e}")
+
+    def start(self):
+        """Start capture and the persistence thread"""
+        self.stop_event.clear()
+        self.session_id = self.database_logger.start_session()
+        self.packet_capture.start()
+
+        self.persist_thread = threading.Thread(target=self._persist_loop, daemon=True)
+        self.persist_thread.start()
+        self.log(f"Monitoring started (session {self.session_id})")
+
+    def run(self):
+        """
+        Run the rate/alert tick until stop() is called. Blocks the
+        calling thread, which should be the main thread so signals
+        are delivered.
+        """
+        self.start()
+        try:
+            while not self.stop_event.wait(self.tick_interval):
+                try:
+                    self.packet_capture.calculate_bandwidth()
+                    self.check_alerts()
+                    self.sample_self_metrics()
+                    if self.profile_requested.is_set():
+                        self.profile_requested.clear()
+                        self.log_profile()
+                except Exception as e:
+                    print(f"Tick error: {e}")
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        """Request shutdown; safe to call from a signal handler"""
+        self.stop_event.set()
+
+    def shutdown(self):
+        """Stop capture, flush the final statistics and close the session"""
+        self.stop_event.set()
+        if self.persist_thread:
+            self.persist_thread.join(timeout=5)
+            self.persist_thread = None
+
+        if self.packet_capture.running:
+            self.packet_capture.stop()
+
+        if self.packet_capture.profiler.enabled:
+            self.log_profile()
+
+        try:
+            self.persist()
+        except Exception as e:
+            print(f"Persistence error: {e}")
+
+        stats = self.packet_capture.get_process_stats()
+        total_upload = sum(s['upload_bytes'] for s in stats.values())
+        total_download = sum(s['download_bytes'] for s in stats.values())
+
+        if self.session_id:
+            self.database_logger.end_session(self.session_id, total_upload, total_download)
+            self.log(f"Session {self.session_id} closed")
+            self.session_id = None
+
+        self.database_logger.close()
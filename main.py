@@ -24,8 +24,11 @@ Usage:
 
 import tkinter as tk
 import sys
+import importlib.util
 import os
 
+from config import CAPTURE_SNAPLEN
+
 
 def check_root():
     """Check if the application is running with root privileges"""
@@ -44,21 +47,17 @@ def check_root():
 
 def check_dependencies():
     """Check if all required dependencies are installed"""
+    # Locate packages without importing them (scapy alone takes seconds)
     missing = []
     
-    try:
-        import scapy
-    except ImportError:
+    # Scapy is only used by the full-frame capture backend
+    if CAPTURE_SNAPLEN == 0 and importlib.util.find_spec("scapy") is None:
         missing.append("scapy")
     
-    try:
-        import psutil
-    except ImportError:
+    if importlib.util.find_spec("psutil") is None:
         missing.append("psutil")
     
-    try:
-        import netifaces
-    except ImportError:
+    if importlib.util.find_spec("netifaces") is None:
         missing.append("netifaces")
     
     if missing:
@@ -68,6 +67,9 @@ def check_dependencies():
         print("\nThe following Python packages are not installed:")
         for pkg in missing:
             print(f"  - {pkg}")
+        if "scapy" in missing:
+            print("\nScapy is required because CAPTURE_SNAPLEN = 0 (full-frame")
+            print("capture); set a snaplen in config.py to capture headers without it.")
         print("\nPlease install them using:")
         print(f"  sudo pip3 install {' '.join(missing)}")
         print("\nOr install all requirements:")
@@ -110,6 +112,7 @@ def main():
         # Initialize components
         packet_capture = PacketCapture(interface=CAPTURE_INTERFACE)
         database_logger = DatabaseLogger()
+        database_logger.start_retention_job()
         
         print("[✓] Packet capture engine initialized")
         print("[✓] Database logger initialized")
@@ -134,6 +137,7 @@ def main():
         print("\n[*] Shutting down...")
         if packet_capture.running:
             packet_capture.stop()
+        database_logger.close()
         print("[✓] Cleanup complete")
         print("\nThank you for using Network Bandwidth Monitor!")
         
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Network Bandwidth Monitor - Headless Service
+OS-Level Network Monitoring with Per-Process Tracking
+
+Captures traffic and records it to the database without any UI, for
+servers and systemd. SIGTERM/SIGINT stop capture and close the session.
+
+Usage:
+    sudo python3 main_headless.py [--interface IFACE] [--db FILE]
+                                  [--tick SECONDS] [--persist SECONDS]
+                                  [--storage sqlite|segments]
+"""
+
+import sys
+import importlib.util
+import os
+import signal
+import argparse
+
+from config import (CAPTURE_INTERFACE, DATABASE_FILE, DB_STORAGE, CAPTURE_SNAPLEN,
+                    HEADLESS_TICK_INTERVAL, HEADLESS_PERSIST_INTERVAL)
+
+
+def check_root():
+    """Check if the application is running with root privileges"""
+    if os.geteuid() != 0:
+        print("ERROR: This application requires root privileges!")
+        print("Network packet capture requires raw socket access.")
+        print("Please run with sudo:")
+        print("  sudo python3 main_headless.py")
+        return False
+    return True
+
+
+def check_dependencies():
+    """Check if all required dependencies are installed"""
+    # Locate packages without importing them (scapy alone takes seconds)
+    missing = []
+
+    # Scapy is only used by the full-frame capture backend
+    if CAPTURE_SNAPLEN == 0 and importlib.util.find_spec("scapy") is None:
+        missing.append("scapy")
+
+    if importlib.util.find_spec("psutil") is None:
+        missing.append("psutil")
+
+    if importlib.util.find_spec("netifaces") is None:
+        missing.append("netifaces")
+
+    if missing:
+        print(f"ERROR: Missing required dependencies: {', '.join(missing)}")
+        if "scapy" in missing:
+            print("Scapy is required because CAPTURE_SNAPLEN = 0 (full-frame capture);")
+            print("set a snaplen in config.py to capture headers without it.")
+        print("Please install them:")
+        print(f"  sudo pip3 install {' '.join(missing)}")
+        return False
+
+    return True
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Headless network bandwidth monitor")
+    parser.add_argument('--interface', default=CAPTURE_INTERFACE,
+                        help="Interface to capture on (default: all)")
+    parser.add_argument('--db', default=DATABASE_FILE,
+                        help=f"Database file (default: {DATABASE_FILE})")
+    parser.add_argument('--tick', type=float, default=HEADLESS_TICK_INTERVAL,
+                        help=f"Rate/alert interval in seconds (default: {HEADLESS_TICK_INTERVAL})")
+    parser.add_argument('--persist', type=float, default=HEADLESS_PERSIST_INTERVAL,
+                        help=f"Database write interval in seconds (default: {HEADLESS_PERSIST_INTERVAL})")
+    parser.add_argument('--storage', choices=('sqlite', 'segments'), default=DB_STORAGE,
+                        help=f"Raw traffic storage (default: {DB_STORAGE})")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the capture hot path (log with SIGUSR1 and at exit)")
+    return parser.parse_args()
+
+
+def main():
+    """Headless service entry point"""
+    args = parse_args()
+
+    if not check_root():
+        sys.exit(1)
+
+    if not check_dependencies():
+        sys.exit(1)
+
+    try:
+        from packet_capture import PacketCapture
+        from database_logger import DatabaseLogger
+        from headless import HeadlessMonitor
+
+        packet_capture = PacketCapture(interface=args.interface)
+        if args.profile:
+            packet_capture.set_profiling(True)
+        database_logger = DatabaseLogger(db_file=args.db, storage=args.storage)
+        database_logger.start_retention_job()
+        monitor = HeadlessMonitor(packet_capture, database_logger,
+                                  tick_interval=args.tick,
+                                  persist_interval=args.persist)
+
+        # Clean shutdown on systemd stop / Ctrl+C
+        def handle_signal(signum, frame):
+            monitor.log(f"Received {signal.Signals(signum).name}, shutting down")
+            monitor.stop()
+
+        signal.signal(signal.SIGTERM, handle_signal)
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGUSR1, lambda signum, frame: monitor.request_profile())
+
+        monitor.run()
+
+    except Exception as e:
+        print(f"Fatal error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
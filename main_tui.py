@@ -11,7 +11,10 @@ Usage:
 """
 
 import sys
+import importlib.util
 import os
+
+from config import CAPTURE_SNAPLEN
 import curses
 
 
@@ -31,21 +34,17 @@ def check_root():
 
 def check_dependencies():
     """Check if all required dependencies are installed"""
+    # Locate packages without importing them (scapy alone takes seconds)
     missing = []
     
-    try:
-        import scapy
-    except ImportError:
+    # Scapy is only used by the full-frame capture backend
+    if CAPTURE_SNAPLEN == 0 and importlib.util.find_spec("scapy") is None:
         missing.append("scapy")
     
-    try:
-        import psutil
-    except ImportError:
+    if importlib.util.find_spec("psutil") is None:
         missing.append("psutil")
     
-    try:
-        import netifaces
-    except ImportError:
+    if importlib.util.find_spec("netifaces") is None:
         missing.append("netifaces")
     
     if missing:
@@ -55,6 +54,9 @@ def check_dependencies():
         print("\nThe following Python packages are not installed:")
         for pkg in missing:
             print(f"  - {pkg}")
+        if "scapy" in missing:
+            print("\nScapy is required because CAPTURE_SNAPLEN = 0 (full-frame")
+            print("capture); set a snaplen in config.py to capture headers without it.")
         print("\nPlease install them:")
         print(f"  sudo pip3 install {' '.join(missing)}")
         print("\nOr install all requirements:")
@@ -1,18 +1,69 @@
 """
 Packet Capture Module
-Captures network packets using Scapy and maps them to processes
+Captures network packets (raw header-only sockets, or Scapy) and maps them to processes
 """
 
+import ctypes
+import math
+import random
+import struct
 import threading
 import time
-from collections import defaultdict
-from datetime import datetime
-from scapy.all import sniff, IP, TCP, UDP, DNS, Raw
-from scapy.layers.http import HTTPRequest
+from collections import defaultdict, deque
+from types import MappingProxyType
 import socket
 
-from process_mapper import ProcessMapper
-from config import PACKET_TIMEOUT, BANDWIDTH_WINDOW
+from clock import CoarseClock
+from packet_parser import parse_frame, ETH_P_ALL
+from process_mapper import ProcessMapper, pack_ip
+from protocols import classify
+from profiler import (StageProfiler, STAGE_PARSE, STAGE_LOOKUP, STAGE_LOCK_WAIT,
+                      STAGE_ACCOUNTING, STAGE_CALCULATE_BANDWIDTH)
+from config import (PACKET_TIMEOUT, BANDWIDTH_WINDOW, SAMPLING_RATE, SAMPLING_MODE,
+                    SAMPLING_IN_KERNEL, FLOW_CACHE_TIMEOUT, CAPTURE_SNAPLEN,
+                    WARMUP_PARK_LIMIT)
+
+
+# Reasons a packet ends up in the unattributed bucket
+UNATTRIBUTED_NO_MATCH = 'no_socket_match'
+UNATTRIBUTED_PARSE_ERROR = 'parse_error'
+UNATTRIBUTED_NON_LOCAL = 'non_local'
+UNATTRIBUTED_REASONS = (UNATTRIBUTED_NO_MATCH, UNATTRIBUTED_PARSE_ERROR,
+                        UNATTRIBUTED_NON_LOCAL)
+
+# getsockopt(SOL_PACKET, PACKET_STATISTICS) -> struct tpacket_stats
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+
+# Classic BPF socket filter support
+SO_ATTACH_FILTER = 26
+SKF_AD_RANDOM = 0xfffff000 + 56  # SKF_AD_OFF + SKF_AD_RANDOM
+
+SAMPLING_DETERMINISTIC = 'deterministic'
+SAMPLING_RANDOM = 'random'
+
+# z-score for the reported 95% accuracy bounds
+Z_95 = 1.96
+
+# Refresh the coarse clock every N packets (it is also ticked per round/tick)
+CLOCK_BATCH_MASK = 0xFF
+
+# How often the capture thread hands its accumulated deltas to the merge side
+HANDOFF_INTERVAL = 0.1  # seconds
+
+
+def build_sampling_filter(rate):
+    """
+    Build a classic BPF program that keeps 1 in `rate` packets at random:
+        ld rand; mod #rate; jeq #0, accept, drop
+    """
+    return [
+        (0x20, 0, 0, SKF_AD_RANDOM),  # ld  rand
+        (0x94, 0, 0, rate),           # mod #rate
+        (0x15, 0, 1, 0),              # jeq #0, next, drop
+        (0x06, 0, 0, 0x40000),        # ret #262144 (accept)
+        (0x06, 0, 0, 0),              # ret #0      (drop)
+    ]
 
 
 class PacketCapture:
@@ -20,34 +71,105 @@ class PacketCapture:
         self.interface = interface
         self.running = False
         self.capture_thread = None
-        self.process_mapper = ProcessMapper()
+        self.capture_socket = None
+        
+        # Header-only capture copies at most `snaplen` bytes per frame
+        # (0 = full frames dissected by Scapy)
+        self.snaplen = CAPTURE_SNAPLEN
+        self.scapy_backend = None  # Imported only when snaplen is 0
+        
+        # Monotonic time source for last_seen, rate windows and flow expiry
+        self.clock = CoarseClock()
+        
+        # Capture counters (not cleared by reset_stats)
+        self.packets_seen = 0
+        self.kernel_packets = 0
+        self.kernel_drops = 0
+        
+        # Packet sampling (every accounted packet stands for `sampling_rate` packets)
+        self.sampling_rate = max(1, int(SAMPLING_RATE))
+        self.sampling_mode = SAMPLING_MODE
+        self.kernel_sampling = False
+        self._sample_countdown = self.sampling_rate
+        
+        # Per-flow attribution cache: flow key -> (process_info, cached_at)
+        self.flow_cache = {}
         
-        # Statistics per process
-        self.process_stats = defaultdict(lambda: {
+        # Set once the first socket mapping is built after start(); packets
+        # seen before then are parked and replayed
+        self.mapping_ready = threading.Event()
+        self._parking = False
+        self._parked = deque()
+        
+        self.profiler = StageProfiler()
+        self.process_mapper = ProcessMapper(profiler=self.profiler)
+        
+        # Per-process deltas accumulated by the capture thread without any
+        # lock. They are handed off through a deque every HANDOFF_INTERVAL
+        # and merged into the totals on each calculate_bandwidth() tick.
+        self._pending = {}
+        self._handoff = deque()
+        self._next_handoff = 0
+        self._generation = 0
+        self._pending_generation = 0
+        
+        # Merged totals per process (tick side only, guarded by self.lock)
+        self.process_stats = {}
+        # Immutable snapshot published on every tick
+        self._snapshot = MappingProxyType({})
+        
+        self._init_attribution_counters()
+        
+        self.local_ips = self._get_local_ips()
+        self.lock = threading.Lock()
+        
+        # Resolving the hostname can block on DNS; do it off the startup path
+        threading.Thread(target=self._add_hostname_ips, daemon=True).start()
+    
+    def _new_process_record(self, name):
+        """Create an empty per-process statistics record"""
+        now = self.clock.now()
+        return {
             'upload_bytes': 0,
             'download_bytes': 0,
             'upload_packets': 0,
             'download_packets': 0,
-            'protocols': set(),
-            'last_seen': datetime.now(),
-            'name': 'Unknown',
+            'protocols': 0,  # Bitmask, see protocols.protocol_names()
+            'protocol_bytes': {},  # Protocol bitmask -> bytes
+            'last_seen': now,  # Monotonic, see clock.to_wall()
+            'name': name,
             'upload_rate': 0,
             'download_rate': 0,
             'last_upload_bytes': 0,
             'last_download_bytes': 0,
-            'last_calc_time': time.time()
-        })
-        
-        self.local_ips = self._get_local_ips()
-        self.lock = threading.Lock()
+            'last_calc_time': now,
+            # Sampling accuracy: sampled packets and sum of squared sizes
+            'sampled_packets': 0,
+            'sampled_sq_bytes': 0,
+            'bytes_error': 0
+        }
+    
+    def _init_attribution_counters(self):
+        """Reset attribution counters (written by the capture thread only)"""
+        self.attributed_packets = 0
+        self.attributed_bytes = 0
+        self.unattributed = {
+            reason: {'packets': 0, 'bytes': 0} for reason in UNATTRIBUTED_REASONS
+        }
+        self.lookup_count = 0
+        self.lookup_time_ns = 0
+        self.lookup_time_max_ns = 0
+    
+    def _count_unattributed(self, reason, packet_size, weight=1):
+        """Add a packet to the unattributed bucket for the given reason"""
+        bucket = self.unattributed[reason]
+        bucket['packets'] += weight
+        bucket['bytes'] += packet_size * weight
         
     def _get_local_ips(self):
-        """Get all local IP addresses"""
+        """Get all local IP addresses (packed, IPv4 and IPv6)"""
         local_ips = set()
         try:
-            # Get hostname and IP
-            hostname = socket.gethostname()
-            local_ips.add(socket.gethostbyname(hostname))
             local_ips.add('127.0.0.1')
             local_ips.add('::1')
             
@@ -56,8 +178,8 @@ class PacketCapture:
             for interface in netifaces.interfaces():
                 try:
                     addrs = netifaces.ifaddresses(interface)
-                    if netifaces.AF_INET in addrs:
-                        for addr in addrs[netifaces.AF_INET]:
+                    for family in (netifaces.AF_INET, netifaces.AF_INET6):
+                        for addr in addrs.get(family, []):
                             local_ips.add(addr['addr'])
                 except:
                     pass
@@ -67,129 +189,395 @@ class PacketCapture:
             addrs = psutil.net_if_addrs()
             for interface, addr_list in addrs.items():
                 for addr in addr_list:
-                    if addr.family == socket.AF_INET:
+                    if addr.family in (socket.AF_INET, socket.AF_INET6):
                         local_ips.add(addr.address)
         
-        return local_ips
+        packed_ips = set()
+        for ip in local_ips:
+            try:
+                packed_ips.add(pack_ip(ip))
+            except (OSError, ValueError):
+                pass
+        
+        return packed_ips
+    
+    def _add_hostname_ips(self):
+        """Add the addresses the hostname resolves to (e.g. 127.0.1.1)"""
+        try:
+            for info in socket.getaddrinfo(socket.gethostname(), None):
+                self.local_ips.add(pack_ip(info[4][0]))
+        except (OSError, ValueError):
+            pass
     
-    def _classify_protocol(self, packet):
-        """Classify the protocol of a packet"""
-        protocols = []
+    def _process_packet(self, packet, link_type=None, wire_length=0):
+        """
+        Process a captured packet: either a Scapy packet, or a raw
+        header-only frame with its link type and on-the-wire length
+        """
+        self.packets_seen += 1
+        if not self.packets_seen & CLOCK_BATCH_MASK:
+            self.clock.tick()
+        if self.clock.now() >= self._next_handoff:
+            self._hand_off_pending()
         
-        if packet.haslayer(TCP):
-            protocols.append('TCP')
-            # Check for common ports
-            if packet.haslayer(Raw):
-                if packet[TCP].dport == 80 or packet[TCP].sport == 80:
-                    protocols.append('HTTP')
-                elif packet[TCP].dport == 443 or packet[TCP].sport == 443:
-                    protocols.append('HTTPS')
+        # User-space sampling (skipped when the kernel filter already
+        # samples). It comes before parking, so parked packets carry
+        # the weight they were sampled with.
+        weight = self.sampling_rate
+        if weight > 1 and not self.kernel_sampling:
+            if self.sampling_mode == SAMPLING_RANDOM:
+                if random.random() * weight >= 1:
+                    return
+            else:
+                self._sample_countdown -= 1
+                if self._sample_countdown:
+                    return
+                self._sample_countdown = weight
         
-        if packet.haslayer(UDP):
-            protocols.append('UDP')
-            if packet[UDP].dport == 53 or packet[UDP].sport == 53:
-                protocols.append('DNS')
+        # Until the first socket mapping is ready, packets cannot be
+        # attributed; park them and replay them once it is
+        if self._parking:
+            if not self.mapping_ready.is_set():
+                self._park_packet(packet, link_type, wire_length, weight)
+                return
+            self._replay_parked()
         
-        if packet.haslayer(DNS):
-            protocols.append('DNS')
-            
-        return protocols if protocols else ['OTHER']
+        self._handle_packet(packet, link_type, wire_length, weight)
     
-    def _process_packet(self, packet):
-        """Process a captured packet"""
+    def _handle_packet(self, packet, link_type, wire_length, weight):
+        """Parse, attribute and account one sampled packet standing for `weight` packets"""
+        packet_size = wire_length
+        profiler = self.profiler
+        timed = profiler.enabled and profiler.tick()
+        if timed:
+            parse_start = time.perf_counter_ns()
         try:
-            if not packet.haslayer(IP):
-                return
+            if link_type is None:
+                header = self.scapy_backend.parse_packet(packet)
+                packet_size = len(packet)
+            else:
+                header = parse_frame(packet, link_type)
             
-            ip_layer = packet[IP]
-            src_ip = ip_layer.src
-            dst_ip = ip_layer.dst
-            packet_size = len(packet)
-            
-            # Determine protocol and ports
-            src_port = 0
-            dst_port = 0
-            protocol = 'OTHER'
-            
-            if packet.haslayer(TCP):
-                src_port = packet[TCP].sport
-                dst_port = packet[TCP].dport
-                protocol = 'TCP'
-            elif packet.haslayer(UDP):
-                src_port = packet[UDP].sport
-                dst_port = packet[UDP].dport
-                protocol = 'UDP'
+            if header is None:
+                return
+            src_ip, dst_ip, proto, src_port, dst_port, payload_len = header
             
             # Determine if this is upload or download
             is_upload = src_ip in self.local_ips
             is_download = dst_ip in self.local_ips
             
             if not (is_upload or is_download):
+                self._count_unattributed(UNATTRIBUTED_NON_LOCAL, packet_size, weight)
                 return
             
             # Find the process responsible for this packet
-            process_info = None
+            # (per-flow cache, then exact connection match, then local port)
+            lookup_start = time.perf_counter_ns()
+            if timed:
+                profiler.record(STAGE_PARSE, lookup_start - parse_start)
+            if is_upload:
+                flow = (src_ip, src_port, dst_ip, dst_port)
+            else:
+                flow = (dst_ip, dst_port, src_ip, src_port)
             
-            # Try multiple methods to find the process
+            cached = self.flow_cache.get(flow)
+            if cached is not None:
+                process_info = cached[0]
+            else:
+                process_info = self.process_mapper.lookup(*flow)
+                if process_info:
+                    self.flow_cache[flow] = (process_info, self.clock.now())
+            lookup_time = time.perf_counter_ns() - lookup_start
+            
+            self.lookup_count += 1
+            self.lookup_time_ns += lookup_time
+            if lookup_time > self.lookup_time_max_ns:
+                self.lookup_time_max_ns = lookup_time
+            if timed:
+                profiler.record(STAGE_LOOKUP, lookup_time)
+            
+            if not process_info:
+                self._count_unattributed(UNATTRIBUTED_NO_MATCH, packet_size, weight)
+                return
+            
+            pid = process_info['pid']
+            protocol_mask = classify(proto, src_port, dst_port, payload_len)
+            
+            if timed:
+                accounting_start = time.perf_counter_ns()
+            
+            # Accumulate into the capture thread's own deltas (no lock)
+            stats = self._pending.get(pid)
+            if stats is None:
+                stats = self._pending[pid] = self._new_process_record(process_info['name'])
+            stats['last_seen'] = self.clock.now()
+            
+            # Scale sampled packets back up to estimated totals
+            accounted_bytes = packet_size * weight
             if is_upload:
-                process_info = self.process_mapper.get_process_by_connection(
-                    src_ip, src_port, dst_ip, dst_port, protocol
-                )
-                # Fallback: try finding by local port only
-                if not process_info:
-                    process_info = self.process_mapper.get_process_by_port(src_port, protocol)
+                stats['upload_bytes'] += accounted_bytes
+                stats['upload_packets'] += weight
             else:
-                process_info = self.process_mapper.get_process_by_connection(
-                    dst_ip, dst_port, src_ip, src_port, protocol
-                )
-                # Fallback: try finding by local port only
-                if not process_info:
-                    process_info = self.process_mapper.get_process_by_port(dst_port, protocol)
+                stats['download_bytes'] += accounted_bytes
+                stats['download_packets'] += weight
             
-            if process_info:
-                pid = process_info['pid']
-                protocols = self._classify_protocol(packet)
-                
-                with self.lock:
-                    stats = self.process_stats[pid]
-                    stats['name'] = process_info['name']
-                    stats['last_seen'] = datetime.now()
-                    
-                    if is_upload:
-                        stats['upload_bytes'] += packet_size
-                        stats['upload_packets'] += 1
-                    else:
-                        stats['download_bytes'] += packet_size
-                        stats['download_packets'] += 1
+            if weight > 1:
+                stats['sampled_packets'] += 1
+                stats['sampled_sq_bytes'] += packet_size * packet_size
+            
+            stats['protocols'] |= protocol_mask
+            protocol_bytes = stats['protocol_bytes']
+            protocol_bytes[protocol_mask] = protocol_bytes.get(protocol_mask, 0) + accounted_bytes
+            
+            if timed:
+                profiler.record(STAGE_ACCOUNTING, time.perf_counter_ns() - accounting_start)
+            
+            self.attributed_packets += weight
+            self.attributed_bytes += accounted_bytes
                     
-                    for proto in protocols:
-                        stats['protocols'].add(proto)
-                        
+        except Exception:
+            # Malformed or unexpected packets are counted, not dropped silently
+            if not packet_size:
+                try:
+                    packet_size = len(packet)
+                except Exception:
+                    pass
+            self._count_unattributed(UNATTRIBUTED_PARSE_ERROR, packet_size, weight)
+            if profiler.enabled:
+                profiler.count('parse_errors')
+    
+    def _hand_off_pending(self):
+        """
+        Pass the capture thread's accumulated deltas to the merge side.
+        Called from the capture thread only; deque.append is thread-safe.
+        """
+        pending = self._pending
+        if pending and self._pending_generation == self._generation:
+            self._handoff.append((self._pending_generation, pending))
+        
+        # Deltas gathered before a reset_stats() are dropped
+        self._pending = {}
+        self._pending_generation = self._generation
+        self._next_handoff = self.clock.now() + HANDOFF_INTERVAL
+    
+    def _park_packet(self, packet, link_type, wire_length, weight):
+        """Hold a sampled packet that arrived before the first socket mapping"""
+        if len(self._parked) >= WARMUP_PARK_LIMIT:
+            # Out of room: the traffic is still counted, just unattributed
+            size = wire_length or len(packet)
+            self._count_unattributed(UNATTRIBUTED_NO_MATCH, size, weight)
+            return
+        
+        # Raw frames live in the reused receive buffer and must be copied
+        if link_type is not None:
+            packet = bytes(packet)
+        self._parked.append((packet, link_type, wire_length, weight))
+    
+    def _replay_parked(self):
+        """Account the packets parked during mapping warm-up (capture thread only)"""
+        self._parking = False
+        parked = self._parked
+        while parked:
+            self._handle_packet(*parked.popleft())
+    
+    def _warm_up_mappings(self):
+        """Build the first socket mapping off the capture and UI threads"""
+        try:
+            self.process_mapper.update_socket_mappings()
         except Exception as e:
-            pass  # Silently ignore packet processing errors
+            print(f"Mapping warm-up error: {e}")
+        finally:
+            self.mapping_ready.set()
     
     def _capture_packets(self):
         """Main packet capture loop"""
         try:
-            # Update process mappings periodically
-            self.process_mapper.update_socket_mappings()
+            # Update process mappings periodically (the warm-up thread
+            # builds the first one while capture is already running)
+            if self.mapping_ready.is_set():
+                self.process_mapper.update_socket_mappings()
             
-            # Start sniffing
-            sniff(
-                iface=self.interface,
-                prn=self._process_packet,
-                store=False,
-                stop_filter=lambda x: not self.running,
-                timeout=PACKET_TIMEOUT
-            )
+            # Keep one capture socket open across capture rounds so kernel
+            # drop statistics can be read from it
+            if self.capture_socket is None:
+                self.capture_socket = self._open_capture_socket()
+                self.kernel_sampling = self._attach_sampling_filter()
+            
+            if self.snaplen:
+                self._capture_frames()
+            else:
+                # Start sniffing
+                self.scapy_backend.capture(
+                    self.capture_socket,
+                    self._process_packet,
+                    lambda x: not self.running,
+                    PACKET_TIMEOUT
+                )
         except Exception as e:
             print(f"Capture error: {e}")
+            self._close_capture_socket()
+        finally:
+            if self._parking and self.mapping_ready.is_set():
+                self._replay_parked()
+            self._hand_off_pending()
+    
+    def _open_capture_socket(self):
+        """Open the capture socket for the configured capture mode"""
+        if not self.snaplen:
+            import scapy_backend
+            self.scapy_backend = scapy_backend
+            return scapy_backend.open_socket(self.interface)
+        
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if self.interface:
+            sock.bind((self.interface, 0))
+        sock.settimeout(PACKET_TIMEOUT)
+        return sock
+    
+    def _raw_socket(self):
+        """Get the kernel socket behind the capture socket"""
+        return getattr(self.capture_socket, 'ins', self.capture_socket)
+    
+    def _capture_frames(self):
+        """
+        Header-only capture round. Only the first `snaplen` bytes of each
+        frame are copied to user space; MSG_TRUNC makes the kernel report
+        the full on-the-wire length, which is what gets accounted.
+        """
+        sock = self.capture_socket
+        snaplen = self.snaplen
+        buffer = bytearray(snaplen)
+        view = memoryview(buffer)
+        clock = self.clock
+        deadline = clock.tick() + PACKET_TIMEOUT
+        
+        while self.running:
+            try:
+                wire_length, address = sock.recvfrom_into(buffer, snaplen, socket.MSG_TRUNC)
+            except socket.timeout:
+                return
+            
+            # address = (ifname, proto, pkttype, hatype, hwaddr)
+            self._process_packet(view[:min(wire_length, snaplen)], address[3], wire_length)
+            
+            # Return periodically so the caller can refresh process mappings
+            if clock.now() >= deadline:
+                return
+    
+    def _attach_sampling_filter(self):
+        """
+        Push random 1-in-N sampling into the kernel with a BPF socket filter
+        so unsampled packets are never copied to user space. Deterministic
+        1-in-N sampling needs per-packet state and stays in user space.
+        """
+        if (self.sampling_rate <= 1 or not SAMPLING_IN_KERNEL or
+                self.sampling_mode != SAMPLING_RANDOM):
+            return False
+        
+        try:
+            program = build_sampling_filter(self.sampling_rate)
+            instructions = ctypes.create_string_buffer(
+                b''.join(struct.pack('HBBI', *insn) for insn in program)
+            )
+            fprog = struct.pack('HL', len(program), ctypes.addressof(instructions))
+            self._raw_socket().setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+            return True
+        except (AttributeError, OSError) as e:
+            print(f"Kernel sampling unavailable, sampling in user space: {e}")
+            return False
+    
+    def _expire_flow_cache(self):
+        """Drop cached flow attributions older than FLOW_CACHE_TIMEOUT"""
+        cutoff = self.clock.now() - FLOW_CACHE_TIMEOUT
+        expired = [flow for flow, (_, cached_at) in list(self.flow_cache.items())
+                   if cached_at < cutoff]
+        for flow in expired:
+            self.flow_cache.pop(flow, None)
+    
+    def _close_capture_socket(self):
+        """Close the capture socket if it is open"""
+        if self.capture_socket is not None:
+            try:
+                self.capture_socket.close()
+            except Exception:
+                pass
+            self.capture_socket = None
+    
+    def get_kernel_stats(self):
+        """
+        Get cumulative kernel packet/drop counts for the capture socket.
+        Returns None when the capture backend does not expose them.
+        """
+        capture_socket = self.capture_socket
+        if capture_socket is not None:
+            try:
+                raw_socket = getattr(capture_socket, 'ins', capture_socket)
+                raw = raw_socket.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8)
+                # The kernel resets these counters on every read
+                packets, drops = struct.unpack('II', raw)
+                self.kernel_packets += packets
+                self.kernel_drops += drops
+            except (AttributeError, OSError):
+                return None
+        
+        return {'packets': self.kernel_packets, 'drops': self.kernel_drops}
+    
+    def _merge_pending(self):
+        """Merge deltas handed off by the capture thread into the totals"""
+        while True:
+            try:
+                generation, deltas = self._handoff.popleft()
+            except IndexError:
+                break
+            if generation != self._generation:
+                continue
+            
+            for pid, delta in deltas.items():
+                stats = self.process_stats.get(pid)
+                if stats is None:
+                    stats = self.process_stats[pid] = self._new_process_record(delta['name'])
+                
+                stats['name'] = delta['name']
+                stats['last_seen'] = delta['last_seen']
+                stats['upload_bytes'] += delta['upload_bytes']
+                stats['download_bytes'] += delta['download_bytes']
+                stats['upload_packets'] += delta['upload_packets']
+                stats['download_packets'] += delta['download_packets']
+                stats['sampled_packets'] += delta['sampled_packets']
+                stats['sampled_sq_bytes'] += delta['sampled_sq_bytes']
+                stats['protocols'] |= delta['protocols']
+                
+                protocol_bytes = stats['protocol_bytes']
+                for mask, byte_count in delta['protocol_bytes'].items():
+                    protocol_bytes[mask] = protocol_bytes.get(mask, 0) + byte_count
+    
+    def _publish_snapshot(self):
+        """Publish an immutable copy of the totals for readers"""
+        to_wall = self.clock.to_wall
+        snapshot = {}
+        for pid, stats in self.process_stats.items():
+            record = dict(stats)
+            record['protocol_bytes'] = MappingProxyType(dict(stats['protocol_bytes']))
+            record['last_seen'] = to_wall(stats['last_seen'])
+            snapshot[pid] = MappingProxyType(record)
+        
+        # A single reference swap; readers never see a partial update
+        self._snapshot = MappingProxyType(snapshot)
     
     def calculate_bandwidth(self):
-        """Calculate bandwidth rates for all processes"""
-        current_time = time.time()
+        """
+        Merge the capture thread's deltas, calculate bandwidth rates for
+        all processes and publish a new statistics snapshot
+        """
+        calc_start = time.perf_counter_ns()
+        current_time = self.clock.tick()
         
-        with self.lock:
+        self.lock.acquire()
+        if self.profiler.enabled:
+            self.profiler.record(STAGE_LOCK_WAIT, time.perf_counter_ns() - calc_start)
+        try:
+            self._merge_pending()
+            
             for pid, stats in self.process_stats.items():
                 time_diff = current_time - stats['last_calc_time']
                 
@@ -205,6 +593,21 @@ class PacketCapture:
                     stats['last_upload_bytes'] = stats['upload_bytes']
                     stats['last_download_bytes'] = stats['download_bytes']
                     stats['last_calc_time'] = current_time
+                
+                # 95% bound on the byte estimate for Bernoulli-style sampling:
+                # Var = sum(size^2) * (1 - p) / p^2 with p = 1 / sampling_rate
+                if stats['sampled_packets']:
+                    rate = self.sampling_rate
+                    stats['bytes_error'] = Z_95 * math.sqrt(
+                        stats['sampled_sq_bytes'] * (rate - 1) * rate
+                    )
+            
+            self._publish_snapshot()
+        finally:
+            self.lock.release()
+        
+        if self.profiler.enabled:
+            self.profiler.record(STAGE_CALCULATE_BANDWIDTH, time.perf_counter_ns() - calc_start)
     
     def start(self):
         """Start packet capture"""
@@ -212,18 +615,26 @@ class PacketCapture:
             return
         
         self.running = True
+        
+        # Capture starts right away; the first mapping is built in the
+        # background and early packets are parked until it is ready
+        self.mapping_ready.clear()
+        self._parking = True
+        threading.Thread(target=self._warm_up_mappings, daemon=True).start()
+        
         self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
         self.capture_thread.start()
     
     def _capture_loop(self):
         """Continuous capture with periodic process mapping updates"""
-        last_update = time.time()
+        last_update = self.clock.tick()
         
         while self.running:
             # Update process mappings every 2 seconds for better accuracy
-            if time.time() - last_update > 2:
+            if self.clock.tick() - last_update > 2 and self.mapping_ready.is_set():
                 self.process_mapper.update_socket_mappings()
-                last_update = time.time()
+                self._expire_flow_cache()
+                last_update = self.clock.now()
             
             self._capture_packets()
     
@@ -232,13 +643,85 @@ class PacketCapture:
         self.running = False
         if self.capture_thread:
             self.capture_thread.join(timeout=5)
+        self._close_capture_socket()
+        
+        # Fold in the last deltas handed off by the capture thread
+        self.calculate_bandwidth()
     
     def get_process_stats(self):
-        """Get current statistics for all processes"""
-        with self.lock:
-            return dict(self.process_stats)
+        """
+        Get the statistics snapshot published by the last
+        calculate_bandwidth() tick. It is read-only and never mutated
+        afterwards; last_seen is wall-clock time.
+        """
+        return self._snapshot
+    
+    def get_attribution_stats(self):
+        """
+        Get attribution hit rate, lookup latency and the unattributed
+        traffic bucket split by reason
+        """
+        unattributed = {
+            reason: dict(bucket) for reason, bucket in self.unattributed.items()
+        }
+        attributed_packets = self.attributed_packets
+        attributed_bytes = self.attributed_bytes
+        lookup_count = self.lookup_count
+        
+        # Hit rate covers local traffic (non-local packets are not ours to attribute)
+        missed = (unattributed[UNATTRIBUTED_NO_MATCH], unattributed[UNATTRIBUTED_PARSE_ERROR])
+        total_packets = attributed_packets + sum(b['packets'] for b in missed)
+        total_bytes = attributed_bytes + sum(b['bytes'] for b in missed)
+        
+        return {
+            'attributed_packets': attributed_packets,
+            'attributed_bytes': attributed_bytes,
+            'unattributed': unattributed,
+            'hit_rate': attributed_packets / total_packets * 100 if total_packets else 0.0,
+            'byte_hit_rate': attributed_bytes / total_bytes * 100 if total_bytes else 0.0,
+            'lookups': lookup_count,
+            'avg_lookup_us': self.lookup_time_ns / lookup_count / 1000 if lookup_count else 0.0,
+            'max_lookup_us': self.lookup_time_max_ns / 1000
+        }
+    
+    def get_sampling_info(self):
+        """Get the sampling configuration and overall 95% accuracy bounds"""
+        rate = self.sampling_rate
+        sampled = sum(stats['sampled_packets'] for stats in self._snapshot.values())
+        
+        # Relative error of a scaled count: z * sqrt((1 - p) / k)
+        if rate > 1 and sampled:
+            packets_error = Z_95 * math.sqrt((1 - 1 / rate) / sampled) * 100
+        else:
+            packets_error = 0.0
+        
+        return {
+            'rate': rate,
+            'mode': self.sampling_mode,
+            'in_kernel': self.kernel_sampling,
+            'sampled_packets': sampled,
+            'packets_error_percent': packets_error
+        }
+    
+    def set_profiling(self, enabled):
+        """Switch hot-path profiling on or off at runtime"""
+        self.profiler.set_enabled(enabled)
+    
+    def get_profile(self):
+        """Get per-stage counters and latency histogram summaries"""
+        return self.profiler.snapshot()
+    
+    def format_profile(self):
+        """Format the per-stage profile as a plain-text table"""
+        return self.profiler.format_report()
     
     def reset_stats(self):
         """Reset all statistics"""
         with self.lock:
+            # The capture thread drops its pending deltas on the next hand-off
+            self._generation += 1
+            self._handoff.clear()
             self.process_stats.clear()
+            self._snapshot = MappingProxyType({})
+            self._init_attribution_counters()
+            self.flow_cache.clear()
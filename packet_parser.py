@@ -0,0 +1,128 @@
+"""
+Header Parser Module
+Decodes link, IP and TCP/UDP headers from raw, possibly truncated, frames
+"""
+
+import struct
+
+
+# Transport protocol numbers
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+# Ethertypes
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+
+# Link types (sll_hatype) that carry an Ethernet header
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+ETHERNET_LINK_TYPES = (ARPHRD_ETHER, ARPHRD_LOOPBACK)
+
+# IPv6 extension headers
+IPV6_HOP_BY_HOP = 0
+IPV6_ROUTING = 43
+IPV6_FRAGMENT = 44
+IPV6_AUTH = 51
+IPV6_DEST_OPTS = 60
+IPV6_EXT_HEADERS = (IPV6_HOP_BY_HOP, IPV6_ROUTING, IPV6_FRAGMENT,
+                    IPV6_AUTH, IPV6_DEST_OPTS)
+
+_ports = struct.Struct('!HH')
+
+
+def parse_frame(frame, link_type):
+    """
+    Parse a raw frame as read from an AF_PACKET socket.
+
+    Only the headers need to be present: lengths come from the IP header,
+    so frames truncated to a small snaplen parse the same as full ones.
+    Returns (src_ip, dst_ip, l4_proto, src_port, dst_port, payload_len)
+    with packed addresses, or None for non-IP frames. Malformed or
+    over-truncated headers raise IndexError/struct.error.
+    """
+    if link_type in ETHERNET_LINK_TYPES:
+        ethertype = (frame[12] << 8) | frame[13]
+        offset = 14
+
+        # Skip 802.1Q / 802.1ad VLAN tags
+        while ethertype == ETH_P_8021Q or ethertype == ETH_P_8021AD:
+            ethertype = (frame[offset + 2] << 8) | frame[offset + 3]
+            offset += 4
+
+        if ethertype != ETH_P_IP and ethertype != ETH_P_IPV6:
+            return None
+        return parse_ip(frame, offset)
+
+    # Raw IP devices (tun, wireguard, ...) have no link header
+    return parse_ip(frame, 0)
+
+
+def parse_ip(data, offset):
+    """Parse an IPv4/IPv6 header and its transport header at offset"""
+    version = data[offset] >> 4
+
+    if version == 4:
+        # Address slices would not raise on a truncated header
+        if len(data) < offset + 20:
+            raise IndexError("truncated IPv4 header")
+        header_length = (data[offset] & 0x0F) * 4
+        total_length = (data[offset + 2] << 8) | data[offset + 3]
+        fragment_offset = ((data[offset + 6] & 0x1F) << 8) | data[offset + 7]
+        proto = data[offset + 9]
+        src_ip = bytes(data[offset + 12:offset + 16])
+        dst_ip = bytes(data[offset + 16:offset + 20])
+        remaining = total_length - header_length
+
+        # Non-first fragments carry no transport header
+        if fragment_offset:
+            return (src_ip, dst_ip, proto, 0, 0, remaining)
+        return _parse_transport(data, offset + header_length, proto,
+                                remaining, src_ip, dst_ip)
+
+    if version == 6:
+        if len(data) < offset + 40:
+            raise IndexError("truncated IPv6 header")
+        remaining = (data[offset + 4] << 8) | data[offset + 5]
+        next_header = data[offset + 6]
+        src_ip = bytes(data[offset + 8:offset + 24])
+        dst_ip = bytes(data[offset + 24:offset + 40])
+        position = offset + 40
+
+        # Walk the extension header chain to the transport header
+        while next_header in IPV6_EXT_HEADERS:
+            if next_header == IPV6_FRAGMENT:
+                length = 8
+                fragment_offset = ((data[position + 2] << 8) | data[position + 3]) >> 3
+                if fragment_offset:
+                    return (src_ip, dst_ip, data[position], 0, 0, remaining - length)
+            elif next_header == IPV6_AUTH:
+                length = (data[position + 1] + 2) * 4
+            else:
+                length = (data[position + 1] + 1) * 8
+
+            next_header = data[position]
+            position += length
+            remaining -= length
+
+        return _parse_transport(data, position, next_header,
+                                remaining, src_ip, dst_ip)
+
+    return None
+
+
+def _parse_transport(data, offset, proto, remaining, src_ip, dst_ip):
+    """Parse TCP/UDP ports and compute the application payload length"""
+    if proto == PROTO_TCP:
+        src_port, dst_port = _ports.unpack_from(data, offset)
+        data_offset = (data[offset + 12] >> 4) * 4
+        return (src_ip, dst_ip, proto, src_port, dst_port, remaining - data_offset)
+
+    if proto == PROTO_UDP:
+        src_port, dst_port = _ports.unpack_from(data, offset)
+        return (src_ip, dst_ip, proto, src_port, dst_port, remaining - 8)
+
+    return (src_ip, dst_ip, proto, 0, 0, remaining)
@@ -6,19 +6,49 @@ Maps network connections to processes using /proc and socket inodes
 import os
 import psutil
 import re
+import socket
+import time
 from collections import defaultdict
 
+from profiler import STAGE_UPDATE_MAPPINGS
+
+
+# IPv4-mapped IPv6 prefix (::ffff:0:0/96) used by dual-stack sockets
+_V4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+
+def pack_ip(address):
+    """
+    Convert an IP address string to its compact packed form
+    (4 bytes for IPv4, 16 bytes for IPv6). IPv4-mapped IPv6 addresses
+    are folded to their IPv4 form so both families index the same way.
+    """
+    if ':' in address:
+        packed = socket.inet_pton(socket.AF_INET6, address.split('%', 1)[0])
+        if packed[:12] == _V4_MAPPED_PREFIX:
+            return packed[12:]
+        return packed
+    return socket.inet_pton(socket.AF_INET, address)
+
 
 class ProcessMapper:
-    def __init__(self):
+    def __init__(self, profiler=None):
         self.socket_inode_map = {}
         self.process_cache = {}
+        self.profiler = profiler
+        
+        # Connection index keyed by packed addresses:
+        # (local_ip, local_port, remote_ip, remote_port) -> pid
+        self.connection_index = {}
+        # Local port -> pid (unconnected sockets win over connected ones)
+        self.port_index = {}
         
     def update_socket_mappings(self):
         """
         Build a mapping of socket inodes to process information
         by scanning /proc filesystem
         """
+        update_start = time.perf_counter_ns()
         self.socket_inode_map = {}
         
         for proc in psutil.process_iter(['pid', 'name']):
@@ -46,49 +76,87 @@ class ProcessMapper:
                         
             except (psutil.NoSuchProcess, psutil.AccessDenied, PermissionError):
                 continue
+        
+        self.update_connection_index()
+        
+        if self.profiler and self.profiler.enabled:
+            self.profiler.record(STAGE_UPDATE_MAPPINGS, time.perf_counter_ns() - update_start)
+            self.profiler.count('mapping_updates')
+            self.profiler.gauge('indexed_connections', len(self.connection_index))
     
-    def get_process_by_connection(self, src_ip, src_port, dst_ip, dst_port, protocol):
+    def update_connection_index(self):
         """
-        Find process that owns a specific network connection
+        Rebuild the connection and port indexes from the kernel socket
+        tables. Addresses are stored packed so IPv4 and IPv6 lookups
+        cost the same.
         """
-        # Try to find matching connection using psutil
+        connection_index = {}
+        port_index = {}
+        
         try:
-            connections = psutil.net_connections(kind='inet')
-            
-            for conn in connections:
-                if conn.laddr and conn.raddr:
-                    # Match outgoing connection (exact match)
-                    if (conn.laddr.ip == src_ip and conn.laddr.port == src_port and
-                        conn.raddr.ip == dst_ip and conn.raddr.port == dst_port):
-                        if conn.pid:
-                            return self._get_process_info(conn.pid)
-                    
-                    # Match incoming connection (exact match)
-                    if (conn.raddr.ip == src_ip and conn.raddr.port == src_port and
-                        conn.laddr.ip == dst_ip and conn.laddr.port == dst_port):
-                        if conn.pid:
-                            return self._get_process_info(conn.pid)
-                    
-                    # Partial match on local address and port (for NAT/routing scenarios)
-                    if conn.laddr.port == src_port or conn.laddr.port == dst_port:
-                        if conn.pid:
-                            # Cache this as a potential match
-                            potential_match = self._get_process_info(conn.pid)
+            for conn in psutil.net_connections(kind='inet'):
+                if not conn.pid or not conn.laddr:
+                    continue
                 
-                elif conn.laddr:
+                try:
+                    local_ip = pack_ip(conn.laddr.ip)
+                    if conn.raddr:
+                        remote_ip = pack_ip(conn.raddr.ip)
+                except (OSError, ValueError):
+                    continue
+                
+                if conn.raddr:
+                    connection_index[(local_ip, conn.laddr.port,
+                                      remote_ip, conn.raddr.port)] = conn.pid
+                    # Partial match on local port (for NAT/routing scenarios)
+                    port_index.setdefault(conn.laddr.port, conn.pid)
+                else:
                     # UDP or listening sockets - match on port
-                    if conn.laddr.port == src_port or conn.laddr.port == dst_port:
-                        if conn.pid:
-                            return self._get_process_info(conn.pid)
-            
-            # Return potential match if no exact match found
-            if 'potential_match' in locals():
-                return potential_match
-                            
+                    port_index[conn.laddr.port] = conn.pid
+                    
         except (psutil.AccessDenied, PermissionError):
-            pass
-            
-        return None
+            return
+        
+        # Swap in the new indexes atomically for the capture thread
+        self.connection_index = connection_index
+        self.port_index = port_index
+    
+    def lookup(self, local_ip, local_port, remote_ip, remote_port):
+        """
+        Find the process for a flow given packed local/remote addresses.
+        Falls back to the local port when there is no exact match.
+        """
+        pid = self.connection_index.get((local_ip, local_port, remote_ip, remote_port))
+        if pid is None:
+            pid = self.port_index.get(local_port)
+            if pid is None:
+                return None
+        return self._get_process_info(pid)
+    
+    def get_process_by_connection(self, src_ip, src_port, dst_ip, dst_port, protocol):
+        """
+        Find process that owns a specific network connection
+        """
+        try:
+            src = pack_ip(src_ip)
+            dst = pack_ip(dst_ip)
+        except (OSError, ValueError):
+            return None
+        
+        # Match outgoing connection, then incoming connection (exact match)
+        pid = self.connection_index.get((src, src_port, dst, dst_port))
+        if pid is None:
+            pid = self.connection_index.get((dst, dst_port, src, src_port))
+        
+        # UDP, listening or partially matching sockets - match on port
+        if pid is None:
+            pid = self.port_index.get(src_port)
+        if pid is None:
+            pid = self.port_index.get(dst_port)
+        
+        if pid is None:
+            return None
+        return self._get_process_info(pid)
     
     def _get_process_info(self, pid):
         """
@@ -117,18 +185,16 @@ class ProcessMapper:
         """
         Find process by listening/bound port (fallback method)
         """
-        try:
-            connections = psutil.net_connections(kind='inet')
-            
-            for conn in connections:
-                if conn.laddr and conn.laddr.port == port:
-                    if conn.pid:
-                        return self._get_process_info(conn.pid)
-                        
-        except (psutil.AccessDenied, PermissionError):
-            pass
-            
-        return None
+        pid = self.port_index.get(port)
+        if pid is None:
+            return None
+        return self._get_process_info(pid)
+    
+    def indexed_process_count(self):
+        """Number of processes owning a socket in the connection/port indexes"""
+        pids = set(self.connection_index.values())
+        pids.update(self.port_index.values())
+        return len(pids)
     
     def get_all_network_processes(self):
         """
@@ -0,0 +1,65 @@
+"""
+Protocol Classification Module
+Table-driven classification of packets into protocol bitmasks
+"""
+
+from packet_parser import PROTO_TCP, PROTO_UDP
+from config import PROTOCOL_PORTS
+
+
+TRANSPORTS = {'TCP': PROTO_TCP, 'UDP': PROTO_UDP}
+
+# One bit per protocol name: transports first, then the configured table
+PROTOCOL_NAMES = ['TCP', 'UDP', 'OTHER']
+for _name, _ in PROTOCOL_PORTS.values():
+    if _name not in PROTOCOL_NAMES:
+        PROTOCOL_NAMES.append(_name)
+
+PROTOCOL_BITS = {name: 1 << bit for bit, name in enumerate(PROTOCOL_NAMES)}
+
+# Transport protocol number -> base bit
+TRANSPORT_BITS = {PROTO_TCP: PROTOCOL_BITS['TCP'], PROTO_UDP: PROTOCOL_BITS['UDP']}
+OTHER_BIT = PROTOCOL_BITS['OTHER']
+
+# (transport, port) -> (mask without payload, mask with payload)
+PORT_TABLE = {}
+for (_transport, _port), (_name, _requires_payload) in PROTOCOL_PORTS.items():
+    _key = (TRANSPORTS[_transport.upper()], _port)
+    _without, _with = PORT_TABLE.get(_key, (0, 0))
+    _bit = PROTOCOL_BITS[_name]
+    PORT_TABLE[_key] = (_without if _requires_payload else _without | _bit,
+                        _with | _bit)
+
+
+def classify(proto, src_port, dst_port, payload_len):
+    """Classify a packet from its transport header into a protocol bitmask"""
+    mask = TRANSPORT_BITS.get(proto, OTHER_BIT)
+
+    entry = PORT_TABLE.get((proto, dst_port))
+    if entry is not None:
+        mask |= entry[payload_len > 0]
+    entry = PORT_TABLE.get((proto, src_port))
+    if entry is not None:
+        mask |= entry[payload_len > 0]
+
+    return mask
+
+
+def protocol_names(mask):
+    """Convert a protocol bitmask to a sorted list of protocol names"""
+    return sorted(name for name, bit in PROTOCOL_BITS.items() if mask & bit)
+
+
+def protocol_byte_totals(protocol_bytes):
+    """Convert per-mask byte counters to bytes per protocol name"""
+    totals = {}
+    for mask, byte_count in protocol_bytes.items():
+        for name in protocol_names(mask):
+            totals[name] = totals.get(name, 0) + byte_count
+    return totals
+
+
+def protocols_by_bytes(protocol_bytes):
+    """(protocol name, bytes) pairs from per-mask byte counters, busiest first"""
+    return sorted(protocol_byte_totals(protocol_bytes).items(),
+                  key=lambda item: (-item[1], item[0]))
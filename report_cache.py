@@ -0,0 +1,82 @@
+"""
+Report Cache Module
+Keeps report query results for past time ranges until a write lands in them
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+from config import REPORT_CACHE_ENTRIES
+
+# Recent writes remembered for put(); results computed across more
+# writes than this are simply not stored
+WRITE_LOG_SIZE = 1024
+
+
+def _overlaps(lo, hi, write_lo, write_hi):
+    """Whether [lo, hi] and [write_lo, write_hi] overlap (None is unbounded)"""
+    return ((lo is None or write_hi is None or lo <= write_hi) and
+            (hi is None or write_lo is None or write_lo <= hi))
+
+
+class ReportCache:
+    """
+    LRU cache of report results, each covering a range [lo, hi] of one
+    kind of data ('traffic', 'alerts' or 'sessions'). Writers call
+    invalidate() after committing, which drops the entries their rows
+    fall in. Callers read generation before running a query and pass it
+    to put(), so a result that raced with such a write is not stored.
+    """
+
+    def __init__(self, max_entries=REPORT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (kind, key) -> (lo, hi, value)
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.writes = deque(maxlen=WRITE_LOG_SIZE)  # (generation, kind, lo, hi)
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0}
+
+    def get(self, kind, key):
+        """Cached value, or None"""
+        with self.lock:
+            entry = self.entries.get((kind, key))
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end((kind, key))
+            self.stats['hits'] += 1
+            return entry[2]
+
+    def put(self, kind, key, lo, hi, value, generation):
+        """Store a value computed from data in [lo, hi] as of generation"""
+        if not self.max_entries:
+            return
+        with self.lock:
+            if generation != self.generation:
+                if not self.writes or self.writes[0][0] > generation + 1:
+                    return
+                for write_generation, write_kind, write_lo, write_hi in self.writes:
+                    if (write_generation > generation and write_kind in (None, kind) and
+                            _overlaps(lo, hi, write_lo, write_hi)):
+                        return
+            self.entries[(kind, key)] = (lo, hi, value)
+            self.entries.move_to_end((kind, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, kind=None, lo=None, hi=None):
+        """Drop entries of a kind (None = every kind) overlapping [lo, hi]"""
+        with self.lock:
+            self.generation += 1
+            self.writes.append((self.generation, kind, lo, hi))
+            for cache_key, (entry_lo, entry_hi, _) in list(self.entries.items()):
+                if kind in (None, cache_key[0]) and _overlaps(entry_lo, entry_hi, lo, hi):
+                    del self.entries[cache_key]
+                    self.stats['invalidated'] += 1
+
+    def get_stats(self):
+        """Hit, miss and invalidation counters and the number of entries"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+        return stats
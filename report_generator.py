@@ -4,107 +4,117 @@ Generates network traffic reports in Markdown and Word formats
 """
 
 from datetime import datetime
+from itertools import islice
 import os
 
 
+# Rows listed in the sessions and top consumers sections
+MAX_SESSIONS = 10
+TOP_CONSUMERS = 5
+
+
 class ReportGenerator:
     def __init__(self, database_logger):
         self.db = database_logger
     
     def generate_markdown_report(self, start_date, end_date, output_file):
-        """Generate a detailed markdown report"""
+        """
+        Generate a detailed markdown report. Rows are streamed from the
+        database straight into the file, so memory use stays flat however
+        long the period is.
+        """
         try:
             # Get data from database
-            overall_stats, process_stats = self.db.get_detailed_report_data(start_date, end_date)
-            alerts = self.db.get_alerts_by_date_range(start_date, end_date)
-            sessions = self.db.get_sessions_in_range(start_date, end_date)
+            overall_stats = self.db.get_overall_stats(start_date, end_date)
+            session_count = self.db.count_sessions_in_range(start_date, end_date)
+            alert_count = self.db.count_alerts_by_date_range(start_date, end_date)
             
-            # Generate report content
-            report = []
-            report.append("# Network Traffic Report\n")
-            report.append(f"**Report Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            report.append(f"**Period:** {start_date.strftime('%Y-%m-%d %H:%M')} to {end_date.strftime('%Y-%m-%d %H:%M')}\n")
-            report.append("\n---\n\n")
-            
-            # Overall Statistics
-            report.append("## Overall Statistics\n\n")
-            if overall_stats:
-                unique_procs, total_up, total_down, avg_up, avg_down, max_up, max_down = overall_stats
+            with open(output_file, 'w') as report:
+                report.write("# Network Traffic Report\n")
+                report.write(f"**Report Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                report.write(f"**Period:** {start_date.strftime('%Y-%m-%d %H:%M')} to {end_date.strftime('%Y-%m-%d %H:%M')}\n")
+                report.write("\n---\n\n")
                 
-                report.append(f"- **Unique Processes:** {unique_procs or 0}\n")
-                report.append(f"- **Total Upload:** {(total_up or 0) / (1024*1024):.2f} MB\n")
-                report.append(f"- **Total Download:** {(total_down or 0) / (1024*1024):.2f} MB\n")
-                report.append(f"- **Total Data:** {((total_up or 0) + (total_down or 0)) / (1024*1024):.2f} MB\n")
-                report.append(f"- **Average Upload Rate:** {(avg_up or 0) / 1024:.2f} KB/s\n")
-                report.append(f"- **Average Download Rate:** {(avg_down or 0) / 1024:.2f} KB/s\n")
-                report.append(f"- **Peak Upload Rate:** {(max_up or 0) / 1024:.2f} KB/s\n")
-                report.append(f"- **Peak Download Rate:** {(max_down or 0) / 1024:.2f} KB/s\n")
-            else:
-                report.append("*No data available for this period*\n")
-            
-            report.append("\n")
-            
-            # Monitoring Sessions
-            if sessions:
-                report.append("## Monitoring Sessions\n\n")
-                report.append(f"Total sessions: {len(sessions)}\n\n")
-                report.append("| Session ID | Start Time | End Time | Upload | Download |\n")
-                report.append("|------------|------------|----------|---------|----------|\n")
-                for session in sessions[:10]:  # Show latest 10
-                    sid, start, end, up, down = session
-                    start_time = datetime.fromisoformat(start).strftime('%Y-%m-%d %H:%M')
-                    end_time = datetime.fromisoformat(end).strftime('%H:%M') if end else 'Running'
-                    report.append(f"| {sid} | {start_time} | {end_time} | {(up or 0)/(1024*1024):.2f} MB | {(down or 0)/(1024*1024):.2f} MB |\n")
-                report.append("\n")
-            
-            # Per-Process Statistics
-            report.append("## Per-Process Traffic\n\n")
-            if process_stats:
-                report.append("| PID | Process Name | Upload | Download | Total | Avg Up Rate | Avg Down Rate | Max Up Rate | Max Down Rate | Protocols |\n")
-                report.append("|-----|--------------|--------|----------|-------|-------------|---------------|-------------|---------------|----------|\n")
+                # Overall Statistics
+                report.write("## Overall Statistics\n\n")
+                if overall_stats:
+                    unique_procs, total_up, total_down, avg_up, avg_down, max_up, max_down = overall_stats
+                    
+                    report.write(f"- **Unique Processes:** {unique_procs or 0}\n")
+                    report.write(f"- **Total Upload:** {(total_up or 0) / (1024*1024):.2f} MB\n")
+                    report.write(f"- **Total Download:** {(total_down or 0) / (1024*1024):.2f} MB\n")
+                    report.write(f"- **Total Data:** {((total_up or 0) + (total_down or 0)) / (1024*1024):.2f} MB\n")
+                    report.write(f"- **Average Upload Rate:** {(avg_up or 0) / 1024:.2f} KB/s\n")
+                    report.write(f"- **Average Download Rate:** {(avg_down or 0) / 1024:.2f} KB/s\n")
+                    report.write(f"- **Peak Upload Rate:** {(max_up or 0) / 1024:.2f} KB/s\n")
+                    report.write(f"- **Peak Download Rate:** {(max_down or 0) / 1024:.2f} KB/s\n")
+                else:
+                    report.write("*No data available for this period*\n")
+                
+                report.write("\n")
                 
-                for proc in process_stats:
+                # Monitoring Sessions
+                if session_count:
+                    report.write("## Monitoring Sessions\n\n")
+                    report.write(f"Total sessions: {session_count}\n\n")
+                    report.write("| Session ID | Start Time | End Time | Upload | Download |\n")
+                    report.write("|------------|------------|----------|---------|----------|\n")
+                    sessions = self.db.iter_sessions_in_range(start_date, end_date)
+                    for session in islice(sessions, MAX_SESSIONS):  # Show latest 10
+                        sid, start, end, up, down = session
+                        start_time = datetime.fromisoformat(start).strftime('%Y-%m-%d %H:%M')
+                        end_time = datetime.fromisoformat(end).strftime('%H:%M') if end else 'Running'
+                        report.write(f"| {sid} | {start_time} | {end_time} | {(up or 0)/(1024*1024):.2f} MB | {(down or 0)/(1024*1024):.2f} MB |\n")
+                    sessions.close()
+                    report.write("\n")
+                
+                # Per-Process Statistics (largest first, so the first rows
+                # are also the top consumers)
+                report.write("## Per-Process Traffic\n\n")
+                top_consumers = []
+                for proc in self.db.iter_process_stats(start_date, end_date):
+                    if not top_consumers:
+                        report.write("| PID | Process Name | Upload | Download | Total | Avg Up Rate | Avg Down Rate | Max Up Rate | Max Down Rate | Protocols |\n")
+                        report.write("|-----|--------------|--------|----------|-------|-------------|---------------|-------------|---------------|----------|\n")
+                    if len(top_consumers) < TOP_CONSUMERS:
+                        top_consumers.append(proc)
+                    
                     pid, name, up, down, avg_up, avg_down, max_up, max_down, records, protocols = proc
                     total = up + down
-                    report.append(f"| {pid} | {name} | {up/(1024*1024):.2f} MB | {down/(1024*1024):.2f} MB | {total/(1024*1024):.2f} MB | ")
-                    report.append(f"{avg_up/1024:.1f} KB/s | {avg_down/1024:.1f} KB/s | {max_up/1024:.1f} KB/s | {max_down/1024:.1f} KB/s | {protocols or 'N/A'} |\n")
-            else:
-                report.append("*No process data available*\n")
-            
-            report.append("\n")
-            
-            # Bandwidth Spikes / Alerts
-            report.append("## Bandwidth Alerts & Spikes\n\n")
-            if alerts:
-                report.append(f"Total alerts: {len(alerts)}\n\n")
-                report.append("| Timestamp | PID | Process | Alert Type | Bandwidth | Threshold |\n")
-                report.append("|-----------|-----|---------|------------|-----------|----------|\n")
+                    report.write(f"| {pid} | {name} | {up/(1024*1024):.2f} MB | {down/(1024*1024):.2f} MB | {total/(1024*1024):.2f} MB | ")
+                    report.write(f"{avg_up/1024:.1f} KB/s | {avg_down/1024:.1f} KB/s | {max_up/1024:.1f} KB/s | {max_down/1024:.1f} KB/s | {protocols or 'N/A'} |\n")
+                if not top_consumers:
+                    report.write("*No process data available*\n")
                 
-                for alert in alerts:
-                    timestamp, pid, name, alert_type, bandwidth, threshold = alert
-                    time_str = datetime.fromisoformat(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-                    report.append(f"| {time_str} | {pid} | {name} | {alert_type} | {bandwidth:.1f} KB/s | {threshold:.1f} KB/s |\n")
-            else:
-                report.append("*No bandwidth alerts during this period*\n")
-            
-            report.append("\n")
-            
-            # Top Consumers
-            if process_stats:
-                report.append("## Top 5 Bandwidth Consumers\n\n")
-                top_5 = sorted(process_stats, key=lambda x: x[2] + x[3], reverse=True)[:5]
+                report.write("\n")
                 
-                for i, proc in enumerate(top_5, 1):
-                    pid, name, up, down, _, _, _, _, _, _ = proc
-                    total = (up + down) / (1024 * 1024)
-                    report.append(f"{i}. **{name}** (PID {pid}): {total:.2f} MB total\n")
-                    report.append(f"   - Upload: {up/(1024*1024):.2f} MB\n")
-                    report.append(f"   - Download: {down/(1024*1024):.2f} MB\n")
-                    report.append("\n")
-            
-            # Write to file
-            with open(output_file, 'w') as f:
-                f.writelines(report)
+                # Bandwidth Spikes / Alerts
+                report.write("## Bandwidth Alerts & Spikes\n\n")
+                if alert_count:
+                    report.write(f"Total alerts: {alert_count}\n\n")
+                    report.write("| Timestamp | PID | Process | Alert Type | Bandwidth | Threshold |\n")
+                    report.write("|-----------|-----|---------|------------|-----------|----------|\n")
+                    
+                    for alert in self.db.iter_alerts_by_date_range(start_date, end_date):
+                        timestamp, pid, name, alert_type, bandwidth, threshold = alert
+                        time_str = datetime.fromisoformat(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+                        report.write(f"| {time_str} | {pid} | {name} | {alert_type} | {bandwidth:.1f} KB/s | {threshold:.1f} KB/s |\n")
+                else:
+                    report.write("*No bandwidth alerts during this period*\n")
+                
+                report.write("\n")
+                
+                # Top Consumers
+                if top_consumers:
+                    report.write("## Top 5 Bandwidth Consumers\n\n")
+                    
+                    for i, proc in enumerate(top_consumers, 1):
+                        pid, name, up, down, _, _, _, _, _, _ = proc
+                        total = (up + down) / (1024 * 1024)
+                        report.write(f"{i}. **{name}** (PID {pid}): {total:.2f} MB total\n")
+                        report.write(f"   - Upload: {up/(1024*1024):.2f} MB\n")
+                        report.write(f"   - Download: {down/(1024*1024):.2f} MB\n")
+                        report.write("\n")
             
             return True, output_file
             
@@ -118,10 +128,10 @@ class ReportGenerator:
             from docx.shared import Inches, Pt, RGBColor
             from docx.enum.text import WD_ALIGN_PARAGRAPH
             
-            # Get data
-            overall_stats, process_stats = self.db.get_detailed_report_data(start_date, end_date)
-            alerts = self.db.get_alerts_by_date_range(start_date, end_date)
-            sessions = self.db.get_sessions_in_range(start_date, end_date)
+            # Get data (rows are streamed below rather than loaded up front)
+            overall_stats = self.db.get_overall_stats(start_date, end_date)
+            session_count = self.db.count_sessions_in_range(start_date, end_date)
+            alert_count = self.db.count_alerts_by_date_range(start_date, end_date)
             
             # Create document
             doc = Document()
@@ -164,9 +174,9 @@ class ReportGenerator:
                     row.cells[1].text = value
             
             # Monitoring Sessions
-            if sessions:
+            if session_count:
                 doc.add_heading('Monitoring Sessions', 1)
-                doc.add_paragraph(f'Total sessions: {len(sessions)}')
+                doc.add_paragraph(f'Total sessions: {session_count}')
                 
                 sess_table = doc.add_table(rows=1, cols=5)
                 sess_table.style = 'Light Grid Accent 1'
@@ -177,7 +187,8 @@ class ReportGenerator:
                 hdr_cells[3].text = 'Upload'
                 hdr_cells[4].text = 'Download'
                 
-                for session in sessions[:10]:
+                sessions = self.db.iter_sessions_in_range(start_date, end_date)
+                for session in islice(sessions, MAX_SESSIONS):
                     sid, start, end, up, down = session
                     row = sess_table.add_row().cells
                     row[0].text = str(sid)
@@ -185,34 +196,39 @@ class ReportGenerator:
                     row[2].text = datetime.fromisoformat(end).strftime('%H:%M') if end else 'Running'
                     row[3].text = f"{(up or 0)/(1024*1024):.2f} MB"
                     row[4].text = f"{(down or 0)/(1024*1024):.2f} MB"
+                sessions.close()
             
-            # Per-Process Statistics
+            # Per-Process Statistics (largest first, so the first rows are
+            # also the top consumers)
             doc.add_heading('Per-Process Traffic', 1)
-            if process_stats:
-                proc_table = doc.add_table(rows=1, cols=6)
-                proc_table.style = 'Light Grid Accent 1'
-                hdr_cells = proc_table.rows[0].cells
-                hdr_cells[0].text = 'PID'
-                hdr_cells[1].text = 'Process'
-                hdr_cells[2].text = 'Upload'
-                hdr_cells[3].text = 'Download'
-                hdr_cells[4].text = 'Total'
-                hdr_cells[5].text = 'Protocols'
+            top_consumers = []
+            for proc in self.db.iter_process_stats(start_date, end_date):
+                if not top_consumers:
+                    proc_table = doc.add_table(rows=1, cols=6)
+                    proc_table.style = 'Light Grid Accent 1'
+                    hdr_cells = proc_table.rows[0].cells
+                    hdr_cells[0].text = 'PID'
+                    hdr_cells[1].text = 'Process'
+                    hdr_cells[2].text = 'Upload'
+                    hdr_cells[3].text = 'Download'
+                    hdr_cells[4].text = 'Total'
+                    hdr_cells[5].text = 'Protocols'
+                if len(top_consumers) < TOP_CONSUMERS:
+                    top_consumers.append(proc)
                 
-                for proc in process_stats:
-                    pid, name, up, down, _, _, _, _, _, protocols = proc
-                    row = proc_table.add_row().cells
-                    row[0].text = str(pid)
-                    row[1].text = name
-                    row[2].text = f"{up/(1024*1024):.2f} MB"
-                    row[3].text = f"{down/(1024*1024):.2f} MB"
-                    row[4].text = f"{(up+down)/(1024*1024):.2f} MB"
-                    row[5].text = protocols or 'N/A'
+                pid, name, up, down, _, _, _, _, _, protocols = proc
+                row = proc_table.add_row().cells
+                row[0].text = str(pid)
+                row[1].text = name
+                row[2].text = f"{up/(1024*1024):.2f} MB"
+                row[3].text = f"{down/(1024*1024):.2f} MB"
+                row[4].text = f"{(up+down)/(1024*1024):.2f} MB"
+                row[5].text = protocols or 'N/A'
             
             # Bandwidth Alerts
             doc.add_heading('Bandwidth Alerts & Spikes', 1)
-            if alerts:
-                doc.add_paragraph(f'Total alerts: {len(alerts)}')
+            if alert_count:
+                doc.add_paragraph(f'Total alerts: {alert_count}')
                 
                 alert_table = doc.add_table(rows=1, cols=6)
                 alert_table.style = 'Light Grid Accent 1'
@@ -224,7 +240,7 @@ class ReportGenerator:
                 hdr_cells[4].text = 'Bandwidth'
                 hdr_cells[5].text = 'Threshold'
                 
-                for alert in alerts:
+                for alert in self.db.iter_alerts_by_date_range(start_date, end_date):
                     timestamp, pid, name, alert_type, bandwidth, threshold = alert
                     row = alert_table.add_row().cells
                     row[0].text = datetime.fromisoformat(timestamp).strftime('%Y-%m-%d %H:%M:%S')
@@ -237,11 +253,10 @@ class ReportGenerator:
                 doc.add_paragraph('No bandwidth alerts during this period')
             
             # Top Consumers
-            if process_stats:
+            if top_consumers:
                 doc.add_heading('Top 5 Bandwidth Consumers', 1)
-                top_5 = sorted(process_stats, key=lambda x: x[2] + x[3], reverse=True)[:5]
                 
-                for i, proc in enumerate(top_5, 1):
+                for i, proc in enumerate(top_consumers, 1):
                     pid, name, up, down, _, _, _, _, _, _ = proc
                     p = doc.add_paragraph(style='List Number')
                     p.add_run(f"{name} ").bold = True
@@ -0,0 +1,64 @@
+"""
+Sample Traffic Module
+Synthetic traffic history and result comparison shared by the storage tests
+"""
+
+import random
+from datetime import datetime
+
+from database_logger import DAY_MS
+
+BATCH_ROWS = 5000  # Rows imported per transaction, like a busy writer batch
+
+
+def sample_rows(end, days, rows, processes, seed=1):
+    """
+    Traffic rows for import_traffic(), evenly spread over the days before
+    end (epoch ms) with some jitter, for pids 1000 .. 1000 + processes
+    """
+    rng = random.Random(seed)
+    start = end - days * DAY_MS
+    step = (end - start) // rows
+    for i in range(rows):
+        pid = 1000 + rng.randrange(processes)
+        yield (
+            start + i * step + rng.randrange(step), pid, f"proc-{pid}",
+            rng.randrange(1, 100000), rng.randrange(1, 100000),
+            rng.random() * 1000, rng.random() * 1000,
+            rng.choice(['HTTPS', 'DNS', 'HTTPS,QUIC'])
+        )
+
+
+def fill(logger, end, days, rows, processes, seed=1):
+    """Import sample_rows() into a logger, BATCH_ROWS at a time"""
+    batch = []
+    for row in sample_rows(end, days, rows, processes, seed):
+        batch.append(row)
+        if len(batch) == BATCH_ROWS:
+            logger.import_traffic(batch)
+            batch = []
+    if batch:
+        logger.import_traffic(batch)
+
+
+def random_ranges(end, days, count, seed=2, overshoot=0):
+    """
+    Unaligned (start, end) datetime report ranges in the days before end
+    (epoch ms), ending up to overshoot seconds after it
+    """
+    rng = random.Random(seed)
+    now = end / 1000
+    for _ in range(count):
+        start = now - rng.random() * days * 86400
+        stop = start + rng.random() * (now + overshoot - start)
+        yield datetime.fromtimestamp(start), datetime.fromtimestamp(stop)
+
+
+def same(a, b):
+    """Compare result rows, allowing for float summation order"""
+    if isinstance(a, (list, tuple)):
+        return (isinstance(b, (list, tuple)) and len(a) == len(b) and
+                all(same(x, y) for x, y in zip(a, b)))
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and abs(a - b) <= 1e-6 * max(1.0, abs(a))
+    return a == b
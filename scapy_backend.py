@@ -0,0 +1,83 @@
+"""
+Scapy Capture Backend
+Full-frame capture and dissection with Scapy (used when CAPTURE_SNAPLEN = 0).
+
+Importing Scapy loads hundreds of modules, so this module is only imported
+when the Scapy backend is actually selected.
+"""
+
+import socket
+
+from scapy.all import conf, sniff, IP, TCP, UDP
+from scapy.layers.inet6 import (IPv6, IPv6ExtHdrHopByHop, IPv6ExtHdrRouting,
+                                IPv6ExtHdrDestOpt, IPv6ExtHdrFragment)
+
+from packet_parser import PROTO_TCP, PROTO_UDP
+
+
+# IPv6 extension headers that may sit between the IPv6 header and TCP/UDP
+IPV6_EXT_HEADERS = (IPv6ExtHdrHopByHop, IPv6ExtHdrRouting,
+                    IPv6ExtHdrDestOpt, IPv6ExtHdrFragment)
+
+
+def open_socket(interface):
+    """Open a Scapy layer-2 listening socket"""
+    return conf.L2listen(iface=interface)
+
+
+def capture(capture_socket, callback, stop_filter, timeout):
+    """Run one Scapy sniff round on an already opened socket"""
+    sniff(
+        opened_socket=capture_socket,
+        prn=callback,
+        store=False,
+        stop_filter=stop_filter,
+        timeout=timeout
+    )
+
+
+def get_transport_layer(ip_layer):
+    """
+    Return the TCP/UDP layer carried by an IP/IPv6 layer, walking
+    IPv6 extension headers. Non-first fragments carry no ports.
+    """
+    layer = ip_layer.payload
+
+    if isinstance(ip_layer, IPv6):
+        while isinstance(layer, IPV6_EXT_HEADERS):
+            if isinstance(layer, IPv6ExtHdrFragment) and layer.offset:
+                return None
+            layer = layer.payload
+    elif ip_layer.frag:
+        return None
+
+    if isinstance(layer, (TCP, UDP)):
+        return layer
+    return None
+
+
+def parse_packet(packet):
+    """
+    Extract (src_ip, dst_ip, l4_proto, src_port, dst_port, payload_len)
+    from a Scapy packet, or None if it is not IP
+    """
+    ip_layer = packet.getlayer(IP)
+    if ip_layer is None:
+        ip_layer = packet.getlayer(IPv6)
+        if ip_layer is None:
+            return None
+        family = socket.AF_INET6
+    else:
+        family = socket.AF_INET
+
+    # Compact packed addresses make IPv6 lookups as cheap as IPv4
+    src_ip = socket.inet_pton(family, ip_layer.src)
+    dst_ip = socket.inet_pton(family, ip_layer.dst)
+
+    transport = get_transport_layer(ip_layer)
+    if transport is None:
+        return (src_ip, dst_ip, 0, 0, 0, 0)
+
+    proto = PROTO_TCP if isinstance(transport, TCP) else PROTO_UDP
+    return (src_ip, dst_ip, proto, transport.sport, transport.dport,
+            len(transport.payload))
@@ -0,0 +1,422 @@
+"""
+Segment Store Module
+Append-only binary segment files for the raw per-second traffic stream
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+
+from config import SEGMENT_MAX_RECORDS, SEGMENT_INDEX_BLOCK
+
+# Optional dependency: vectorized range queries and compaction. Imported
+# by have_numpy() on first use, so entry points that never read segments
+# don't load it.
+numpy = None
+RECORD_DTYPE = None  # Structured dtype of RECORD, once NumPy is loaded
+_numpy_checked = False
+
+# One traffic record: timestamp (epoch ms), process_id, upload_bytes,
+# download_bytes, upload_rate, download_rate, protocol_set_id. Little
+# endian and unpadded, so a segment file is a flat array of records.
+RECORD = struct.Struct('<qIqqddI')
+
+# Time index entry: lowest and highest timestamp of a block of records
+INDEX_ENTRY = struct.Struct('<qq')
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+LOCK_FILE = 'LOCK'
+
+
+def have_numpy():
+    """Whether NumPy is installed, importing it on the first call"""
+    global numpy, RECORD_DTYPE, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        if module is not None:
+            RECORD_DTYPE = module.dtype([
+                ('timestamp', '<i8'), ('process_id', '<u4'),
+                ('upload_bytes', '<i8'), ('download_bytes', '<i8'),
+                ('upload_rate', '<f8'), ('download_rate', '<f8'),
+                ('protocol_set_id', '<u4'),
+            ])
+        numpy = module
+        _numpy_checked = True
+    return numpy is not None
+
+
+class Segment:
+    """
+    One segment file and its time index. The index holds the timestamp
+    range of every full block of index_block records; the last,
+    partial block is tracked in memory.
+    """
+
+    def __init__(self, path, index_block=SEGMENT_INDEX_BLOCK):
+        self.path = path
+        self.index_path = path.with_suffix(INDEX_SUFFIX)
+        self.name = path.stem
+        self.index_block = index_block
+        self.records = 0
+        self.blocks = []
+        self.tail = None  # (lowest, highest) timestamp of the partial block
+        self.file = None
+        self.index_file = None
+
+    def open_existing(self, repair=True):
+        """
+        Load a segment written earlier, dropping a torn last record. With
+        repair=False (another process may still be appending to it) the
+        files are left alone: a partly written record is skipped and
+        missing index entries are only rebuilt in memory.
+        """
+        size = self.path.stat().st_size
+        self.records = size // RECORD.size
+        if repair and size % RECORD.size:
+            os.truncate(self.path, self.records * RECORD.size)
+
+        full_blocks = self.records // self.index_block
+        entries = []
+        if self.index_path.exists():
+            data = self.index_path.read_bytes()
+            entries = list(INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % INDEX_ENTRY.size]))
+        if not repair:
+            # The writer appends index entries after the records they cover
+            entries = entries[:full_blocks] + [
+                self._scan(block * self.index_block, (block + 1) * self.index_block)
+                for block in range(len(entries), full_blocks)]
+        elif len(entries) != full_blocks:
+            # Index and data disagree after a crash: rebuild it
+            entries = [self._scan(block * self.index_block, (block + 1) * self.index_block)
+                       for block in range(full_blocks)]
+            self.index_path.write_bytes(b''.join(INDEX_ENTRY.pack(*entry) for entry in entries))
+        self.blocks = entries
+
+        self.tail = None
+        if self.records > full_blocks * self.index_block:
+            self.tail = self._scan(full_blocks * self.index_block, self.records)
+
+    def _scan(self, first, last):
+        """Timestamp range of records [first, last), read from the file"""
+        with open(self.path, 'rb') as f:
+            f.seek(first * RECORD.size)
+            data = f.read((last - first) * RECORD.size)
+        stamps = [record[0] for record in RECORD.iter_unpack(data)]
+        return min(stamps), max(stamps)
+
+    def open_for_append(self):
+        """Create the segment file and start appending to it"""
+        self.file = open(self.path, 'ab')
+        self.index_file = open(self.index_path, 'ab')
+
+    def append(self, rows):
+        """Append record tuples and extend the time index"""
+        self.file.write(b''.join([RECORD.pack(*row) for row in rows]))
+        self.file.flush()
+
+        position = 0
+        while position < len(rows):
+            take = self.index_block - self.records % self.index_block
+            stamps = [row[0] for row in rows[position:position + take]]
+            low, high = min(stamps), max(stamps)
+            if self.tail is not None:
+                low, high = min(low, self.tail[0]), max(high, self.tail[1])
+            self.records += len(stamps)
+            position += len(stamps)
+
+            if self.records % self.index_block:
+                self.tail = (low, high)
+            else:
+                self.blocks.append((low, high))
+                self.tail = None
+                self.index_file.write(INDEX_ENTRY.pack(low, high))
+        self.index_file.flush()
+
+    def seal(self):
+        """Stop appending and make the segment durable"""
+        for f in (self.file, self.index_file):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+        self.file = None
+        self.index_file = None
+
+    def bounds(self):
+        """Lowest and highest timestamp in the segment, or None if empty"""
+        ranges = self.blocks + ([self.tail] if self.tail else [])
+        if not ranges:
+            return None
+        return min(low for low, _ in ranges), max(high for _, high in ranges)
+
+
+class SegmentStore:
+    """
+    Append-only store of fixed-width traffic records. Records go to the
+    active segment file until it holds max_records, then a new one is
+    started. Reads map segment files with mmap and only touch the index
+    blocks that overlap the requested time range.
+
+    One process at a time owns the directory (an exclusive lock on its
+    LOCK file). Only the owner repairs, appends to and deletes segment
+    files; other stores, and readonly ones, just follow what it writes.
+    """
+
+    def __init__(self, directory, max_records=SEGMENT_MAX_RECORDS,
+                 index_block=SEGMENT_INDEX_BLOCK, readonly=False):
+        self.directory = Path(directory)
+        self.max_records = max_records
+        self.index_block = index_block
+        self.lock = threading.Lock()
+
+        self.lock_file = None
+        if not readonly:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.lock_file = open(self.directory / LOCK_FILE, 'a')
+            try:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self.lock_file.close()
+                self.lock_file = None
+        self.owner = self.lock_file is not None
+
+        # Segments oldest first; earlier runs' segments are read-only
+        self.segments = []
+        if self.owner:
+            for path in sorted(self.directory.glob('*' + SEGMENT_SUFFIX)):
+                segment = Segment(path, index_block)
+                segment.open_existing()
+                self.segments.append(segment)
+        else:
+            self._refresh()
+        self.sequence = int(self.segments[-1].name) if self.segments else 0
+        self.active = None
+
+    def close(self):
+        """Seal the active segment and give up ownership"""
+        with self.lock:
+            if self.active is not None:
+                self.active.seal()
+                self.active = None
+            if self.lock_file is not None:
+                self.lock_file.close()
+                self.lock_file = None
+
+    def _refresh(self):
+        """
+        Follow the segments the owner created, extended or deleted since
+        the last call (non-owners only; caller holds the lock)
+        """
+        if self.owner:
+            return
+        known = {segment.path: segment for segment in self.segments}
+        self.segments = []
+        for path in sorted(self.directory.glob('*' + SEGMENT_SUFFIX)):
+            segment = known.get(path)
+            try:
+                if segment is None:
+                    segment = Segment(path, self.index_block)
+                    segment.open_existing(repair=False)
+                elif path.stat().st_size // RECORD.size != segment.records:
+                    segment.open_existing(repair=False)
+            except FileNotFoundError:
+                continue  # Deleted by the owner meanwhile
+            self.segments.append(segment)
+
+    def append(self, rows):
+        """
+        Append (timestamp, process_id, upload_bytes, download_bytes,
+        upload_rate, download_rate, protocol_set_id) record tuples
+        """
+        if not self.owner:
+            raise RuntimeError(f"Segments in {self.directory} are owned by another process")
+        with self.lock:
+            position = 0
+            while position < len(rows):
+                if self.active is None or self.active.records >= self.max_records:
+                    self._rotate()
+                take = self.max_records - self.active.records
+                self.active.append(rows[position:position + take])
+                position += take
+
+    def _rotate(self):
+        """Seal the active segment and start the next one (caller holds the lock)"""
+        if self.active is not None:
+            self.active.seal()
+        self.sequence += 1
+        segment = Segment(self.directory / f"{self.sequence:08d}{SEGMENT_SUFFIX}",
+                          self.index_block)
+        segment.open_for_append()
+        self.segments.append(segment)
+        self.active = segment
+
+    def list_segments(self):
+        """Snapshot of the segments and their record counts, oldest first"""
+        with self.lock:
+            self._refresh()
+            return [(segment, segment.records) for segment in self.segments]
+
+    def overlapping(self, start, end):
+        """Snapshot of the segments holding records in [start, end)"""
+        found = []
+        with self.lock:
+            self._refresh()
+            for segment in self.segments:
+                bounds = segment.bounds()
+                if bounds is not None and bounds[1] >= start and bounds[0] < end:
+                    found.append((segment, segment.records))
+        return found
+
+    def drop_before(self, cutoff_ms):
+        """Delete sealed segments holding only records older than cutoff_ms;
+        returns their names (owner only)"""
+        if not self.owner:
+            return []
+        with self.lock:
+            expired = [segment for segment in self.segments
+                       if segment is not self.active and
+                       (segment.bounds() is None or segment.bounds()[1] < cutoff_ms)]
+            for segment in expired:
+                self.segments.remove(segment)
+                for path in (segment.path, segment.index_path):
+                    path.unlink(missing_ok=True)
+        return [segment.name for segment in expired]
+
+    def read(self, segment, start, end, first=0, last=None):
+        """
+        Records of a segment with start <= timestamp < end, among record
+        numbers [first, last), in the order they were written. Returns a
+        NumPy structured array, or a list of tuples without NumPy.
+        """
+        with self.lock:
+            count = segment.records if last is None else min(last, segment.records)
+            blocks = segment.blocks + ([segment.tail] if segment.tail else [])
+
+        # Record ranges of the index blocks overlapping [start, end)
+        ranges = []
+        for number, (low, high) in enumerate(blocks):
+            if high < start or low >= end:
+                continue
+            block_first = max(first, number * self.index_block)
+            block_last = min(count, (number + 1) * self.index_block)
+            if block_first >= block_last:
+                continue
+            if ranges and ranges[-1][1] == block_first:
+                ranges[-1] = (ranges[-1][0], block_last)
+            else:
+                ranges.append((block_first, block_last))
+
+        if not ranges:
+            return numpy.empty(0, RECORD_DTYPE) if have_numpy() else []
+        with open(segment.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), ranges[-1][1] * RECORD.size,
+                           access=mmap.ACCESS_READ) as view:
+                return _select(view, ranges, start, end)
+
+    def iter_rows(self, start, end, chunk_rows):
+        """
+        Stream record tuples with start <= timestamp < end in lists of up
+        to chunk_rows, in time order within each segment
+        """
+        for segment, count in self.overlapping(start, end):
+            records = self.read(segment, start, end, last=count)
+            if have_numpy():
+                records = records[numpy.argsort(records['timestamp'], kind='stable')]
+            else:
+                records.sort(key=lambda record: record[0])
+            for offset in range(0, len(records), chunk_rows):
+                chunk = records[offset:offset + chunk_rows]
+                yield chunk.tolist() if have_numpy() else chunk
+
+    def count(self, start, end):
+        """Number of records with start <= timestamp < end"""
+        return sum(len(self.read(segment, start, end, last=count))
+                   for segment, count in self.overlapping(start, end))
+
+
+def _select(view, ranges, start, end):
+    """Copy the records in [start, end) out of record ranges of a mapped segment"""
+    if not have_numpy():
+        return [record for first, last in ranges
+                for record in RECORD.iter_unpack(view[first * RECORD.size:last * RECORD.size])
+                if start <= record[0] < end]
+
+    parts = []
+    for first, last in ranges:
+        block = numpy.frombuffer(view, RECORD_DTYPE, last - first, first * RECORD.size)
+        stamps = block['timestamp']
+        # Boolean indexing copies, so nothing refers to the mapping afterwards
+        parts.append(block[(stamps >= start) & (stamps < end)])
+    return numpy.concatenate(parts)
+
+
+def bucket_totals(records, size, max_protocol=False):
+    """
+    Per (bucket, process) totals of a record array in the rollup row
+    layout: (bucket, process_id, upload_bytes, download_bytes,
+    upload_rate_sum, upload_rate_max, download_rate_sum,
+    download_rate_max, samples, protocol_set_id), where bucket is the
+    timestamp rounded down to size and protocol_set_id is the last seen
+    (or the highest with max_protocol)
+    """
+    if not len(records):
+        return []
+
+    buckets = records['timestamp'] - records['timestamp'] % size
+    # lexsort is stable, so each group keeps the order records were written
+    order = numpy.lexsort((records['process_id'], buckets))
+    buckets = buckets[order]
+    records = records[order]
+    process_ids = records['process_id']
+
+    changed = (buckets[1:] != buckets[:-1]) | (process_ids[1:] != process_ids[:-1])
+    starts = numpy.concatenate(([0], numpy.flatnonzero(changed) + 1))
+    ends = numpy.concatenate((starts[1:], [len(records)]))
+    if max_protocol:
+        protocol_set_ids = numpy.maximum.reduceat(records['protocol_set_id'], starts)
+    else:
+        protocol_set_ids = records['protocol_set_id'][ends - 1]
+
+    columns = (
+        buckets[starts],
+        process_ids[starts],
+        numpy.add.reduceat(records['upload_bytes'], starts),
+        numpy.add.reduceat(records['download_bytes'], starts),
+        numpy.add.reduceat(records['upload_rate'], starts),
+        numpy.maximum.reduceat(records['upload_rate'], starts),
+        numpy.add.reduceat(records['download_rate'], starts),
+        numpy.maximum.reduceat(records['download_rate'], starts),
+        ends - starts,
+        protocol_set_ids,
+    )
+    # tolist() gives Python ints and floats, which sqlite3 can bind
+    return list(zip(*[column.tolist() for column in columns]))
+
+
+def split_by_process(records):
+    """
+    Split records read from a segment into (process_id, record tuples)
+    groups, each in the order its records were written
+    """
+    if not have_numpy():
+        records = sorted(records, key=itemgetter(1))
+        for process_id, group in groupby(records, key=itemgetter(1)):
+            yield process_id, list(group)
+        return
+
+    if not len(records):
+        return
+    records = records[numpy.argsort(records['process_id'], kind='stable')]
+    process_ids = records['process_id']
+    starts = numpy.flatnonzero(process_ids[1:] != process_ids[:-1]) + 1
+    for group in numpy.split(records, starts):
+        yield int(group['process_id'][0]), group.tolist()
@@ -0,0 +1,82 @@
+"""
+Self-Metrics Module
+Samples the monitor's own resource usage (CPU, RSS, threads, capture rate, drops)
+"""
+
+import time
+import psutil
+
+from config import SELF_METRICS_INTERVAL
+
+
+class SelfMetrics:
+    def __init__(self, packet_capture, interval=SELF_METRICS_INTERVAL):
+        self.packet_capture = packet_capture
+        self.interval = interval
+        self.process = psutil.Process()
+        self.latest = None
+
+        self._last_time = time.monotonic()
+        self._last_cpu = self._cpu_seconds()
+        self._last_packets = packet_capture.packets_seen
+
+    def _cpu_seconds(self):
+        """Total user + system CPU time consumed by this process"""
+        cpu = self.process.cpu_times()
+        return cpu.user + cpu.system
+
+    def maybe_sample(self):
+        """
+        Take a new sample if the interval has elapsed since the last one.
+        Returns the new sample, or None if it is not yet time.
+        """
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if self.latest is not None and elapsed < self.interval:
+            return None
+        return self.sample(now, elapsed)
+
+    def sample(self, now=None, elapsed=None):
+        """Sample CPU, memory, threads, packet rate and kernel drops"""
+        if now is None:
+            now = time.monotonic()
+            elapsed = now - self._last_time
+
+        cpu_seconds = self._cpu_seconds()
+        packets = self.packet_capture.packets_seen
+        kernel = self.packet_capture.get_kernel_stats()
+
+        if elapsed > 0:
+            cpu_percent = (cpu_seconds - self._last_cpu) / elapsed * 100
+            packets_per_sec = (packets - self._last_packets) / elapsed
+        else:
+            cpu_percent = 0.0
+            packets_per_sec = 0.0
+
+        self.latest = {
+            'cpu_percent': cpu_percent,
+            'cpu_seconds': cpu_seconds,
+            'rss_bytes': self.process.memory_info().rss,
+            'threads': self.process.num_threads(),
+            'packets_per_sec': packets_per_sec,
+            'packets_seen': packets,
+            'kernel_drops': kernel['drops'] if kernel else None
+        }
+
+        self._last_time = now
+        self._last_cpu = cpu_seconds
+        self._last_packets = packets
+        return self.latest
+
+    def format_status(self):
+        """Format the latest sample as a one-line status string"""
+        m = self.latest
+        if m is None:
+            return "Monitor: N/A"
+
+        drops = m['kernel_drops'] if m['kernel_drops'] is not None else 'N/A'
+        return (f"Monitor: CPU {m['cpu_percent']:.1f}% | "
+                f"RSS {m['rss_bytes'] / (1024*1024):.1f} MB | "
+                f"Threads {m['threads']} | "
+                f"{m['packets_per_sec']:.0f} pkt/s | "
+                f"Drops {drops}")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Stress test: long reports running concurrently with full-rate ingest.
+
+Traffic is logged at a fixed rate while several threads run 30-day
+detailed reports back to back. With the read connection pool, reports
+must not hold up the background writer: no rows may be dropped and
+queued rows must keep committing promptly. The same load is also run
+with reads sharing the writer connection, for comparison. Also checks
+that the bytes of a row dropped on a full queue are not lost.
+
+Usage:
+    python3 test_db_concurrency.py [seconds]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database_logger import DatabaseLogger, DAY_MS
+
+PROCESSES = 200
+PREFILL_ROWS = 300000
+INGEST_RATE = 10000  # Rows per second
+REPORT_THREADS = 4
+MAX_COMMIT_LATENCY = 2.0  # Seconds for a flush() to come back
+
+
+def prefill(logger):
+    """History for the reports to chew on: 30 days of rows"""
+    end = int(time.time() * 1000)
+    step = 30 * DAY_MS // PREFILL_ROWS
+    batch = []
+    for i in range(PREFILL_ROWS):
+        pid = 1000 + i % PROCESSES
+        batch.append((
+            end - (PREFILL_ROWS - i) * step, pid, f"proc-{pid}",
+            1500, 3000, 300.0, 600.0, 'HTTPS'
+        ))
+    logger.import_traffic(batch)
+
+
+def ingest(logger, stop, totals):
+    """Log every process once per tick, paced to INGEST_RATE rows/s"""
+    tick = PROCESSES / INGEST_RATE
+    deadline = time.perf_counter()
+    while not stop.is_set():
+        for pid in range(1000, 1000 + PROCESSES):
+            totals[pid] = totals.get(pid, 0) + 1500
+            logger.log_traffic(pid, f"proc-{pid}", totals[pid], totals[pid] * 2,
+                               300.0, 600.0, ['HTTPS'])
+        deadline += tick
+        time.sleep(max(0, deadline - time.perf_counter()))
+
+
+def report(logger, stop, counts):
+    """Run long detailed reports back to back"""
+    while not stop.is_set():
+        end = datetime.now()
+        start = end - timedelta(days=29, hours=23, minutes=59, seconds=31)
+        overall, processes = logger.get_detailed_report_data(start, end)
+        if overall is not None and processes:
+            counts['reports'] += 1
+
+
+def probe(logger, stop, latencies):
+    """Time how long queued rows take to be committed"""
+    while not stop.wait(0.25):
+        start = time.perf_counter()
+        logger.flush()
+        latencies.append(time.perf_counter() - start)
+
+
+def run_stress(read_pool_size, seconds):
+    """Ingest and report concurrently; returns the measurements"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'stress.db'), read_pool_size=read_pool_size)
+        prefill(logger)
+        written_before = logger.get_write_stats()['written']
+
+        stop = threading.Event()
+        counts = {'reports': 0}
+        latencies = []
+        threads = [threading.Thread(target=ingest, args=(logger, stop, {})),
+                   threading.Thread(target=probe, args=(logger, stop, latencies))]
+        threads += [threading.Thread(target=report, args=(logger, stop, counts))
+                    for _ in range(REPORT_THREADS)]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        logger.flush()
+        elapsed = time.perf_counter() - start
+
+        stats = logger.get_write_stats()
+        logger.close()
+
+    return {
+        'rows_per_sec': (stats['written'] - written_before) / elapsed,
+        'dropped': stats['dropped'],
+        'failed': stats['failed'],
+        'reports': counts['reports'],
+        'max_commit_latency': max(latencies) if latencies else 0.0,
+    }
+
+
+def print_result(label, result):
+    """Print one stress run"""
+    print(f"{label:<26} {result['rows_per_sec']:>9,.0f} rows/s  "
+          f"dropped {result['dropped']:>6}  reports {result['reports']:>5}  "
+          f"max commit wait {result['max_commit_latency'] * 1000:7.1f} ms")
+
+
+def test_reports_do_not_block_ingest(seconds=5):
+    """Reports on pooled read connections must not stall the writer"""
+    print("=" * 70)
+    print(f"Concurrent report/ingest stress test ({seconds} s, "
+          f"{INGEST_RATE} rows/s, {REPORT_THREADS} report threads)")
+    print("=" * 70)
+
+    shared = run_stress(0, seconds)
+    print_result("shared writer connection", shared)
+    pooled = run_stress(REPORT_THREADS, seconds)
+    print_result("read connection pool", pooled)
+
+    print("=" * 70)
+    assert pooled['dropped'] == 0 and pooled['failed'] == 0, "rows lost during reports"
+    assert pooled['reports'] > 0, "no report finished"
+    assert pooled['max_commit_latency'] <= MAX_COMMIT_LATENCY, "reports stalled ingest"
+
+
+def test_dropped_rows_carry_over():
+    """Bytes of a row dropped on a full queue are counted by the next row"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'dropped.db'))
+        # The writer is stuck behind the lock, so the queue fills up
+        with logger.lock:
+            pid = 1000
+            while not logger.get_write_stats()['dropped']:
+                pid += 1
+                logger.log_traffic(pid, f"proc-{pid}", 1500, 3000, 300.0, 600.0, ['HTTPS'])
+            logger.log_traffic(1, "proc-1", 1500, 3000, 300.0, 600.0, ['HTTPS'])
+            dropped = logger.get_write_stats()['dropped']
+        logger.flush()
+        logger.log_traffic(1, "proc-1", 2500, 5000, 300.0, 600.0, ['HTTPS'])
+        report = logger.get_traffic_report(pid=1)
+        logger.close()
+
+    assert dropped == 2, f"{dropped} rows dropped, expected 2"
+    assert [row[2:4] for row in report] == [(2500, 5000)], f"report {report}"
+
+
+def main():
+    """Run the stress test and the dropped row test"""
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    failed = 0
+    for test, args in ((test_reports_do_not_block_ingest, (seconds,)),
+                       (test_dropped_rows_carry_over, ())):
+        try:
+            test(*args)
+            print(f"[OK] {test.__doc__}")
+        except AssertionError as e:
+            print(f"[FAIL] {test.__doc__}: {e}")
+            failed += 1
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Header parser test.
+
+Parses hand-built, header-only frames (as captured with a small snaplen)
+and checks the addresses, protocol, ports and payload length taken from
+them: IPv4 and IPv6 over Ethernet, VLAN tags, IPv6 extension headers,
+first and non-first fragments, non-IP frames and truncated headers.
+
+Usage:
+    python3 test_packet_parser.py
+"""
+
+import socket
+import struct
+import sys
+
+from packet_parser import (parse_frame, ARPHRD_ETHER, ETH_P_IP, ETH_P_IPV6,
+                           ETH_P_8021Q, ETH_P_8021AD, PROTO_TCP, PROTO_UDP,
+                           IPV6_HOP_BY_HOP, IPV6_FRAGMENT)
+
+ARPHRD_NONE = 0xFFFE  # tun devices: raw IP, no link header
+ETH_P_ARP = 0x0806
+PROTO_ICMP = 1
+PROTO_ICMPV6 = 58
+
+SRC4 = socket.inet_pton(socket.AF_INET, '10.0.0.1')
+DST4 = socket.inet_pton(socket.AF_INET, '93.184.216.34')
+SRC6 = socket.inet_pton(socket.AF_INET6, 'fd00::1')
+DST6 = socket.inet_pton(socket.AF_INET6, '2606:2800:220:1::1')
+
+
+def ethernet(ethertype, *tags):
+    """Ethernet header, with (tpid) VLAN tags before the ethertype"""
+    header = b'\x02' * 6 + b'\x04' * 6
+    for tpid in tags:
+        header += struct.pack('!HH', tpid, 100)
+    return header + struct.pack('!H', ethertype)
+
+
+def ipv4(proto, payload_length, fragment=0):
+    """20-byte IPv4 header; fragment is the 13-bit offset in 8-byte units"""
+    return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + payload_length, 1,
+                       fragment, 64, proto, 0, SRC4, DST4)
+
+
+def ipv6(next_header, payload_length):
+    """40-byte IPv6 header"""
+    return struct.pack('!IHBB16s16s', 6 << 28, payload_length, next_header, 64,
+                       SRC6, DST6)
+
+
+def hop_by_hop(next_header):
+    """8-byte IPv6 hop-by-hop options header (padding only)"""
+    return struct.pack('!BB6s', next_header, 0, b'\x01\x04' + b'\x00' * 4)
+
+
+def fragment(next_header, offset, more=True):
+    """IPv6 fragment header; offset in 8-byte units"""
+    return struct.pack('!BBHI', next_header, 0, offset << 3 | more, 1234)
+
+
+def tcp(src_port, dst_port, header_length=20):
+    """TCP header of header_length bytes"""
+    return struct.pack('!HHIIBBHHH', src_port, dst_port, 0, 0,
+                       header_length // 4 << 4, 0x18, 65535, 0, 0) + b'\x01' * (header_length - 20)
+
+
+def udp(src_port, dst_port, payload_length):
+    """8-byte UDP header"""
+    return struct.pack('!HHHH', src_port, dst_port, 8 + payload_length, 0)
+
+
+# (name, frame, link type, expected result); payloads are never included,
+# lengths come from the IP headers
+CASES = [
+    ("IPv4 TCP",
+     ethernet(ETH_P_IP) + ipv4(PROTO_TCP, 20 + 100) + tcp(50000, 443),
+     ARPHRD_ETHER, (SRC4, DST4, PROTO_TCP, 50000, 443, 100)),
+    ("IPv4 UDP in an 802.1Q VLAN",
+     ethernet(ETH_P_IP, ETH_P_8021Q) + ipv4(PROTO_UDP, 8 + 30) + udp(40000, 53, 30),
+     ARPHRD_ETHER, (SRC4, DST4, PROTO_UDP, 40000, 53, 30)),
+    ("IPv4 TCP in 802.1ad + 802.1Q VLANs",
+     ethernet(ETH_P_IP, ETH_P_8021AD, ETH_P_8021Q) + ipv4(PROTO_TCP, 32) + tcp(22, 60000, 32),
+     ARPHRD_ETHER, (SRC4, DST4, PROTO_TCP, 22, 60000, 0)),
+    ("IPv4 non-first fragment",
+     ethernet(ETH_P_IP) + ipv4(PROTO_UDP, 1480, fragment=185) + b'\x00' * 8,
+     ARPHRD_ETHER, (SRC4, DST4, PROTO_UDP, 0, 0, 1480)),
+    ("IPv4 on a raw IP device",
+     ipv4(PROTO_UDP, 8 + 12) + udp(51820, 51820, 12),
+     ARPHRD_NONE, (SRC4, DST4, PROTO_UDP, 51820, 51820, 12)),
+    ("IPv6 TCP",
+     ethernet(ETH_P_IPV6) + ipv6(PROTO_TCP, 20 + 64) + tcp(443, 50001),
+     ARPHRD_ETHER, (SRC6, DST6, PROTO_TCP, 443, 50001, 64)),
+    ("IPv6 hop-by-hop then TCP",
+     ethernet(ETH_P_IPV6) + ipv6(IPV6_HOP_BY_HOP, 8 + 32 + 50) +
+     hop_by_hop(PROTO_TCP) + tcp(12345, 80, 32),
+     ARPHRD_ETHER, (SRC6, DST6, PROTO_TCP, 12345, 80, 50)),
+    ("IPv6 first fragment",
+     ethernet(ETH_P_IPV6) + ipv6(IPV6_FRAGMENT, 8 + 8 + 100) +
+     fragment(PROTO_UDP, 0) + udp(5353, 5353, 100),
+     ARPHRD_ETHER, (SRC6, DST6, PROTO_UDP, 5353, 5353, 100)),
+    ("IPv6 non-first fragment",
+     ethernet(ETH_P_IPV6) + ipv6(IPV6_FRAGMENT, 8 + 1200) +
+     fragment(PROTO_UDP, 151, more=False) + b'\x00' * 8,
+     ARPHRD_ETHER, (SRC6, DST6, PROTO_UDP, 0, 0, 1200)),
+    ("Non-IP frame (ARP)",
+     ethernet(ETH_P_ARP) + b'\x00' * 28,
+     ARPHRD_ETHER, None),
+]
+
+# (name, frame, link type); each must raise IndexError or struct.error
+TRUNCATED = [
+    ("IPv4 header cut short",
+     (ethernet(ETH_P_IP) + ipv4(PROTO_TCP, 20))[:24], ARPHRD_ETHER),
+    ("IPv4 ICMP header cut in the addresses",
+     (ethernet(ETH_P_IP) + ipv4(PROTO_ICMP, 8))[:30], ARPHRD_ETHER),
+    ("IPv6 header cut in the addresses",
+     (ethernet(ETH_P_IPV6) + ipv6(PROTO_ICMPV6, 8))[:50], ARPHRD_ETHER),
+    ("TCP header cut short",
+     ethernet(ETH_P_IP) + ipv4(PROTO_TCP, 20) + tcp(1, 2)[:2], ARPHRD_ETHER),
+    ("IPv6 extension header missing",
+     ethernet(ETH_P_IPV6) + ipv6(IPV6_HOP_BY_HOP, 28), ARPHRD_ETHER),
+    ("VLAN tag cut short",
+     ethernet(ETH_P_8021Q)[:14] + b'\x00', ARPHRD_ETHER),
+]
+
+
+def test_frames():
+    """Headers parse to the expected addresses, ports and payload lengths"""
+    for name, frame, link_type, expected in CASES:
+        # Frames are parsed from a memoryview over the receive buffer
+        result = parse_frame(memoryview(bytearray(frame)), link_type)
+        assert result == expected, f"{name}: {result} != {expected}"
+
+
+def test_truncated_frames():
+    """Truncated headers raise instead of parsing garbage"""
+    for name, frame, link_type in TRUNCATED:
+        try:
+            result = parse_frame(memoryview(bytearray(frame)), link_type)
+        except (IndexError, struct.error):
+            continue
+        raise AssertionError(f"{name}: parsed as {result}")
+
+
+def main():
+    """Run the header parser tests"""
+    print("=" * 70)
+    print("Header parser tests")
+    print("=" * 70)
+
+    failed = 0
+    for test in (test_frames, test_truncated_frames):
+        try:
+            test()
+            print(f"[OK] {test.__doc__}")
+        except AssertionError as e:
+            print(f"[FAIL] {test.__doc__}: {e}")
+            failed += 1
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
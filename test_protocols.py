@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Protocol classification test.
+
+Checks the port table from config.PROTOCOL_PORTS: packets classify into
+the expected protocol bitmasks (payload-only entries ignore bare ACKs,
+either port may match), and bitmasks convert to protocol names and back,
+including multi-protocol sets such as 'HTTPS,QUIC'.
+
+Usage:
+    python3 test_protocols.py
+"""
+
+import sys
+
+from packet_parser import PROTO_TCP, PROTO_UDP
+from protocols import (classify, protocol_names, protocol_byte_totals,
+                       protocols_by_bytes, PROTOCOL_BITS, PROTOCOL_NAMES)
+
+PROTO_ICMP = 1
+
+# (proto, src_port, dst_port, payload_len, expected protocol names)
+CLASSIFY_CASES = [
+    (PROTO_TCP, 50000, 443, 1200, ['HTTPS', 'TCP']),
+    (PROTO_TCP, 443, 50000, 1200, ['HTTPS', 'TCP']),
+    (PROTO_TCP, 50000, 443, 0, ['TCP']),            # Bare ACK: no payload, no HTTPS
+    (PROTO_TCP, 50000, 80, 300, ['HTTP', 'TCP']),
+    (PROTO_TCP, 50000, 53, 0, ['DNS', 'TCP']),      # DNS needs no payload
+    (PROTO_UDP, 40000, 53, 40, ['DNS', 'UDP']),
+    (PROTO_UDP, 5353, 5353, 40, ['DNS', 'UDP']),
+    (PROTO_UDP, 50000, 443, 1200, ['QUIC', 'UDP']),
+    (PROTO_TCP, 50000, 22, 0, ['SSH', 'TCP']),
+    (PROTO_TCP, 80, 443, 10, ['HTTP', 'HTTPS', 'TCP']),  # Both ports match
+    (PROTO_UDP, 50000, 80, 10, ['UDP']),            # HTTP is TCP only
+    (PROTO_TCP, 50000, 12345, 10, ['TCP']),
+    (PROTO_ICMP, 0, 0, 56, ['OTHER']),
+]
+
+# Stored protocol strings (the protocol_sets table) -> names they hold
+PROTOCOL_SETS = {
+    'HTTPS': ['HTTPS'],
+    'HTTPS,QUIC': ['HTTPS', 'QUIC'],
+    'DNS,TCP,UDP': ['DNS', 'TCP', 'UDP'],
+    'HTTP,HTTPS,QUIC,TCP,UDP': ['HTTP', 'HTTPS', 'QUIC', 'TCP', 'UDP'],
+}
+
+
+def test_classify():
+    """Ports and payload classify into the expected protocol bitmasks"""
+    for proto, src_port, dst_port, payload_len, expected in CLASSIFY_CASES:
+        mask = classify(proto, src_port, dst_port, payload_len)
+        names = protocol_names(mask)
+        assert names == expected, \
+            f"classify({proto}, {src_port}, {dst_port}, {payload_len}): {names} != {expected}"
+
+
+def test_flow_union():
+    """A flow's packets OR together into a multi-protocol set"""
+    mask = (classify(PROTO_TCP, 50000, 443, 1200) |
+            classify(PROTO_UDP, 50000, 443, 1200) |
+            classify(PROTO_TCP, 50000, 443, 0))
+    assert protocol_names(mask) == ['HTTPS', 'QUIC', 'TCP', 'UDP'], protocol_names(mask)
+
+
+def test_round_trip():
+    """Bitmasks convert to names and back, one distinct bit per protocol"""
+    bits = list(PROTOCOL_BITS.values())
+    assert len(set(bits)) == len(PROTOCOL_NAMES), "protocols share a bit"
+    assert all(bit & (bit - 1) == 0 for bit in bits), "a protocol has several bits"
+
+    for mask in range(1 << len(PROTOCOL_NAMES)):
+        names = protocol_names(mask)
+        assert names == sorted(names), f"{mask}: names not sorted"
+        assert sum(PROTOCOL_BITS[name] for name in names) == mask, f"{mask}: {names}"
+
+    for protocols, expected in PROTOCOL_SETS.items():
+        mask = 0
+        for name in protocols.split(','):
+            mask |= PROTOCOL_BITS[name]
+        names = protocol_names(mask)
+        assert names == expected, f"{protocols}: {names} != {expected}"
+        assert ','.join(names) == protocols, f"{protocols} stored as {','.join(names)}"
+
+
+def test_byte_totals():
+    """Per-mask byte counters add up per protocol name, busiest first"""
+    https = PROTOCOL_BITS['TCP'] | PROTOCOL_BITS['HTTPS']
+    quic = PROTOCOL_BITS['UDP'] | PROTOCOL_BITS['QUIC']
+    totals = protocol_byte_totals({https: 1000, quic: 500, PROTOCOL_BITS['TCP']: 40})
+    assert totals == {'TCP': 1040, 'HTTPS': 1000, 'UDP': 500, 'QUIC': 500}, totals
+
+    ranked = protocols_by_bytes({https: 1000, quic: 500, PROTOCOL_BITS['TCP']: 40})
+    assert ranked == [('TCP', 1040), ('HTTPS', 1000), ('QUIC', 500), ('UDP', 500)], ranked
+
+
+def main():
+    """Run the protocol classification tests"""
+    print("=" * 70)
+    print("Protocol classification tests")
+    print("=" * 70)
+
+    failed = 0
+    for test in (test_classify, test_flow_union, test_round_trip, test_byte_totals):
+        try:
+            test()
+            print(f"[OK] {test.__doc__}")
+        except AssertionError as e:
+            print(f"[FAIL] {test.__doc__}: {e}")
+            failed += 1
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
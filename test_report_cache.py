@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Report cache test.
+
+Checks that cached reports, alerts and sessions match uncached queries,
+that repeated reports are served from the cache, that a write landing
+in a cached range (late rows, new alerts, a session ending) is seen by
+the next call, and that rows written into the open tail of a range
+show up without the closed part being queried again.
+
+Usage:
+    python3 test_report_cache.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from database_logger import DatabaseLogger, DAY_MS
+from sample_traffic import fill, random_ranges, same
+
+PROCESSES = 20
+ROWS = 30000
+DAYS = 3
+RANGES = 20
+
+
+def traffic_row(timestamp, pid=1001):
+    """One traffic row for import_traffic()"""
+    return (timestamp, pid, f"proc-{pid}", 1000, 2000, 10.0, 20.0, 'HTTPS')
+
+
+def uncached(logger, method, *args):
+    """Call a logger method with the report cache switched off"""
+    entries = logger.report_cache.max_entries
+    logger.report_cache.max_entries = 0
+    try:
+        return getattr(logger, method)(*args)
+    finally:
+        logger.report_cache.max_entries = entries
+
+
+def test_reports_match():
+    """Cached reports match uncached ones and repeats hit the cache"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'cache.db'))
+        now = int(time.time() * 1000)
+        fill(logger, now, DAYS, ROWS, PROCESSES)
+
+        failures = 0
+        # Some of the ranges reach past now
+        for start, end in random_ranges(now, DAYS, RANGES, overshoot=3600):
+            expected = uncached(logger, 'get_detailed_report_data', start, end)
+            for _ in range(2):
+                if not same(expected, logger.get_detailed_report_data(start, end)):
+                    failures += 1
+        hits = logger.report_cache.get_stats()['hits']
+        logger.close()
+    assert not failures, f"{failures} mismatching reports"
+    assert hits > 0, "no report was served from the cache"
+
+
+def _late_write(storage):
+    """A row written into a cached past range is counted by the next report"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'late.db'), storage=storage)
+        now = int(time.time() * 1000)
+        fill(logger, now, DAYS, ROWS, PROCESSES)
+
+        start = datetime.fromtimestamp((now - 2 * DAY_MS - 1234567) / 1000)
+        end = datetime.fromtimestamp((now - DAY_MS + 7654321) / 1000)
+        before = logger.get_detailed_report_data(start, end)
+        logger.import_traffic([traffic_row(now - DAY_MS - 3600000)])
+        after = logger.get_detailed_report_data(start, end)
+        expected = uncached(logger, 'get_detailed_report_data', start, end)
+        logger.close()
+    assert same(after, expected), "cached report differs from an uncached one"
+    assert after[0][1:3] == (before[0][1] + 1000, before[0][2] + 2000), "late row not counted"
+
+
+def test_late_write_sqlite():
+    """Late rows invalidate cached day partition spans"""
+    _late_write('sqlite')
+
+
+def test_late_write_segments():
+    """Late rows invalidate cached spans once folded from segments"""
+    _late_write('segments')
+
+
+def test_open_tail():
+    """Rows written now show up; the closed part comes from the cache"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'tail.db'))
+        now = int(time.time() * 1000)
+        fill(logger, now - 60000, DAYS, ROWS, PROCESSES)
+
+        start = datetime.now() - timedelta(days=2)
+        end = datetime.now() + timedelta(hours=1)
+        before = logger.get_detailed_report_data(start, end)
+        hits = logger.report_cache.get_stats()['hits']
+        logger.import_traffic([traffic_row(int(time.time() * 1000))])
+        after = logger.get_detailed_report_data(start, end)
+        served = logger.report_cache.get_stats()['hits'] > hits
+        logger.close()
+    assert served, "closed part of the range not served from the cache"
+    assert after[0][1] == before[0][1] + 1000, "row in the open tail not counted"
+
+
+def alert(timestamp, pid):
+    """One alert row for import_alerts(), at a UTC time"""
+    return (timestamp.strftime('%Y-%m-%d %H:%M:%S'), pid, f"proc-{pid}",
+            'WARNING', 2048.0, 1024.0)
+
+
+def test_alerts_and_sessions():
+    """Alert and session lists and counts follow new and late writes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'alerts.db'))
+        utc_now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        logger.import_alerts([alert(utc_now - timedelta(minutes=7 * i), 1000 + i)
+                             for i in range(500)])
+        for _ in range(3):
+            logger.end_session(logger.start_session(), 100, 200)
+
+        start = utc_now - timedelta(days=1)
+        end = utc_now + timedelta(hours=1)
+        session_start = datetime.now() - timedelta(days=1)
+        session_end = datetime.now() + timedelta(hours=1)
+
+        def check():
+            for method, args in (('get_alerts_by_date_range', (start, end)),
+                                 ('count_alerts_by_date_range', (start, end)),
+                                 ('get_alerts_by_date_range', (start, utc_now - timedelta(hours=2))),
+                                 ('get_sessions_in_range', (session_start, session_end)),
+                                 ('count_sessions_in_range', (session_start, session_end))):
+                assert getattr(logger, method)(*args) == uncached(logger, method, *args), \
+                    f"{method} differs from an uncached query"
+
+        check()
+        check()
+        logger.import_alerts([alert(datetime.now(timezone.utc).replace(tzinfo=None), 2000)])
+        check()
+        logger.import_alerts([alert(utc_now - timedelta(hours=3), 2001)])
+        check()
+        logger.end_session(logger.start_session(), 300, 400)
+        check()
+        stats = logger.report_cache.get_stats()
+        logger.close()
+    assert stats['hits'] > 0 and stats['invalidated'] > 0, f"cache unused: {stats}"
+
+
+def main():
+    """Run the report cache tests"""
+    print("=" * 70)
+    print("Report cache tests")
+    print("=" * 70)
+
+    failed = 0
+    for test in (test_reports_match, test_late_write_sqlite, test_late_write_segments,
+                 test_open_tail, test_alerts_and_sessions):
+        try:
+            test()
+            print(f"[OK] {test.__doc__}")
+        except AssertionError as e:
+            print(f"[FAIL] {test.__doc__}: {e}")
+            failed += 1
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
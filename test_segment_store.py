@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Segment storage test.
+
+Logs the same synthetic traffic through the SQLite day partitions and
+through segment files, then checks that reports, raw row reads and
+counts agree, that a reopened store recovers from a torn write and a
+lost time index without counting any record twice, that a second
+logger on the same database neither folds records again nor touches the
+owner's files, that a readonly logger follows the owner's writes, and
+that retention drops expired segment files.
+
+Usage:
+    python3 test_segment_store.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from database_logger import DatabaseLogger, MAX_EPOCH_MS
+from sample_traffic import fill, random_ranges, same
+from segment_store import have_numpy, SEGMENT_SUFFIX, INDEX_SUFFIX
+
+PROCESSES = 50
+ROWS = 60000
+DAYS = 3
+RANGES = 30
+
+
+def test_reports_match():
+    """Segment storage must answer reports like the day partitions"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_logger = DatabaseLogger(os.path.join(tmp, 'sqlite.db'))
+        segment_logger = DatabaseLogger(os.path.join(tmp, 'segments.db'), storage='segments')
+        now = int(time.time() * 1000)
+        fill(sqlite_logger, now, DAYS, ROWS, PROCESSES)
+        fill(segment_logger, now, DAYS, ROWS, PROCESSES)
+
+        failures = 0
+        for start, end in random_ranges(now, DAYS, RANGES):
+            for method in ('get_detailed_report_data', 'get_traffic_report',
+                           'count_traffic_rows'):
+                expected = getattr(sqlite_logger, method)(start, end)
+                actual = getattr(segment_logger, method)(start, end)
+                if not same(expected, actual):
+                    print(f"  mismatch: {method}({start}, {end})")
+                    failures += 1
+
+        expected = sorted(sqlite_logger.iter_traffic_rows())
+        actual = sorted(segment_logger.iter_traffic_rows())
+        if not same(expected, actual):
+            print("  mismatch: iter_traffic_rows()")
+            failures += 1
+
+        sqlite_logger.close()
+        segment_logger.close()
+    assert not failures, f"{failures} mismatching results"
+
+
+def test_recovery():
+    """A torn record and a lost index are repaired; nothing is folded twice"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'recovery.db')
+        logger = DatabaseLogger(db_file, storage='segments')
+        fill(logger, int(time.time() * 1000), DAYS, ROWS, PROCESSES)
+        expected = logger.get_detailed_report_data(None, None)
+        logger.close()
+
+        segment_dir = os.path.join(tmp, 'recovery.segments')
+        segment_file = sorted(name for name in os.listdir(segment_dir)
+                              if name.endswith(SEGMENT_SUFFIX))[-1]
+        with open(os.path.join(segment_dir, segment_file), 'ab') as f:
+            f.write(b'\x00' * 10)
+        os.remove(os.path.join(segment_dir, segment_file.replace(SEGMENT_SUFFIX, INDEX_SUFFIX)))
+
+        logger = DatabaseLogger(db_file, storage='segments')
+        actual = logger.get_detailed_report_data(None, None)
+        rows = logger.count_traffic_rows()
+        logger.close()
+    assert same(expected, actual), "report changed after recovery"
+    assert rows == ROWS, f"{rows} rows after recovery, not {ROWS}"
+
+
+def test_shared_segments():
+    """A second logger on the database neither folds nor repairs the owner's segments"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'shared.db')
+        owner = DatabaseLogger(db_file, storage='segments')
+        owner.log_traffic(1000, 'proc-1000', 10000, 20000, 1.0, 2.0, ['HTTPS'])
+        # Wait for the writer to append the record (it is folded later)
+        while not owner.segments.count(0, MAX_EPOCH_MS):
+            time.sleep(0.01)
+        segment_file = owner.segments.list_segments()[0][0].path
+        # A record the owner is halfway through writing
+        with open(segment_file, 'ab') as f:
+            f.write(b'\x00' * 10)
+        size = segment_file.stat().st_size
+
+        other = DatabaseLogger(db_file, storage='segments')
+        untouched = segment_file.stat().st_size == size
+        with open(segment_file, 'r+b') as f:
+            f.truncate(size - 10)
+
+        other.log_traffic(2000, 'proc-2000', 500, 700, 1.0, 2.0, ['DNS'])
+        for logger in (other, owner, other):
+            logger.flush()
+        owner.log_traffic(1000, 'proc-1000', 20000, 40000, 1.0, 2.0, ['HTTPS'])
+        for logger in (owner, other):
+            logger.flush()
+
+        uploads = {row[0]: row[2] for row in other.get_traffic_report()}
+        rollup = other.conn.execute(
+            'SELECT SUM(upload_bytes) FROM traffic_rollup_1d').fetchone()[0]
+        storage = other.storage
+        other.close()
+        owner.close()
+    assert untouched, "second logger modified the owner's segment"
+    assert storage == 'sqlite', "second logger did not fall back to the day partitions"
+    assert uploads == {1000: 20000, 2000: 500} and rollup == 20500, \
+        f"uploads {uploads}, rollup {rollup}"
+
+
+def test_readonly_logger():
+    """A readonly logger reads the owner's segments and folds nothing"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'readonly.db')
+        owner = DatabaseLogger(db_file, storage='segments')
+        fill(owner, int(time.time() * 1000), DAYS, ROWS, PROCESSES)
+        owner.flush()
+
+        reader = DatabaseLogger(db_file, readonly=True)
+        matches = same(owner.get_detailed_report_data(None, None),
+                       reader.get_detailed_report_data(None, None))
+        # Written after the reader opened; seen without being folded twice
+        owner.log_traffic(1000, 'proc-1000', 10000, 20000, 1.0, 2.0, ['HTTPS'])
+        owner.flush()
+        rows = reader.count_traffic_rows()
+        report = reader.get_detailed_report_data(None, None)
+        expected = owner.get_detailed_report_data(None, None)
+        idle = reader.writer_thread is None and reader.compaction_thread is None
+        reader.close()
+        owner.close()
+    assert idle, "readonly logger started a writer or compaction"
+    assert matches and same(report, expected), "readonly logger reports differently"
+    assert rows == ROWS + 1, f"{rows} rows, not {ROWS + 1}"
+
+
+def test_retention():
+    """Segment files holding only expired records are deleted"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'retention.db'), storage='segments')
+        logger.segments.max_records = ROWS // 10
+        fill(logger, int(time.time() * 1000), DAYS, ROWS, PROCESSES)
+        before = logger.count_traffic_rows()
+        logger.cleanup_old_data(days=1, archive_days=0)
+        after = logger.count_traffic_rows()
+        segments = len(logger.segments.list_segments())
+        logger.close()
+    # Only whole segments go, so some rows older than a day may remain
+    assert before == ROWS and 0 < after < before, f"{before} rows before, {after} after"
+    assert segments < 10, f"{segments} segments left"
+
+
+def main():
+    """Run the segment storage tests"""
+    print("=" * 70)
+    print(f"Segment storage tests (NumPy {'available' if have_numpy() else 'not installed'})")
+    print("=" * 70)
+
+    failed = 0
+    for test in (test_reports_match, test_recovery, test_shared_segments,
+                 test_readonly_logger, test_retention):
+        try:
+            test()
+            print(f"[OK] {test.__doc__}")
+        except AssertionError as e:
+            print(f"[FAIL] {test.__doc__}: {e}")
+            failed += 1
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
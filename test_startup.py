@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script to enforce startup import-time budgets for each entry point
+"""
+
+import sys
+
+from benchmark_startup import ENTRY_POINTS, measure_startup
+
+
+# Import-time budgets (seconds) for each entry point's startup imports.
+# Importing scapy.all alone takes longer than any of these; Scapy,
+# python-docx and NumPy (HEAVY_MODULES) must not be loaded at all.
+STARTUP_BUDGETS = {
+    'main.py': 0.5,
+    'main_tui.py': 0.3,
+    'main_headless.py': 0.3,
+}
+
+
+def test_startup_budgets():
+    """Every entry point starts within budget without heavy imports"""
+    failures = []
+    for name, modules in ENTRY_POINTS.items():
+        budget = STARTUP_BUDGETS[name]
+        elapsed, heavy = measure_startup(modules)
+
+        if elapsed is None:
+            print(f"[!] {name}: could not import ({heavy})")
+            failures.append(f"{name} could not import ({heavy})")
+            continue
+
+        ok = elapsed <= budget and not heavy
+        status = "OK  " if ok else "FAIL"
+        print(f"[{status}] {name:<20} {elapsed * 1000:7.1f} ms "
+              f"(budget {budget * 1000:.0f} ms)")
+        if elapsed > budget:
+            failures.append(f"{name} took {elapsed * 1000:.1f} ms")
+        if heavy:
+            print(f"       loaded at startup: {', '.join(heavy)}")
+            failures.append(f"{name} loaded {', '.join(heavy)}")
+
+    assert not failures, '; '.join(failures)
+
+
+def main():
+    """Run the startup budget test"""
+    print("=" * 70)
+    print("Startup Import-Time Budget Test")
+    print("=" * 70)
+
+    try:
+        test_startup_budgets()
+    except AssertionError as e:
+        print("=" * 70)
+        print(f"[FAIL] {test_startup_budgets.__doc__}: {e}")
+        return False
+    print("=" * 70)
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Traffic archive test.
+
+Logs DAYS days of synthetic traffic, archives everything older than
+RETENTION days and checks that reports, raw row reads, counts and
+exports are unchanged, with both storage modes; that a report only
+decompresses the blocks of the days holding its edges; that the
+archive itself expires after its retention; and that retention without
+an archive keeps every remaining raw row readable.
+
+Usage:
+    python3 test_traffic_archive.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import database_logger
+from database_logger import DatabaseLogger, DAY_MS, _partition_name, _partition_start
+from sample_traffic import fill, random_ranges, same
+
+PROCESSES = 30
+ROWS = 60000
+DAYS = 40
+RETENTION = 10
+RANGES = 30
+
+
+def snapshot(logger, now):
+    """Everything the archive must leave unchanged"""
+    results = []
+    for start, end in random_ranges(now, DAYS, RANGES):
+        for method in ('get_detailed_report_data', 'get_traffic_report',
+                       'count_traffic_rows'):
+            results.append(getattr(logger, method)(start, end))
+    results.append(logger.get_detailed_report_data(None, None))
+    results.append(sorted(logger.iter_traffic_rows()))
+    return results
+
+
+def _archive_matches(storage):
+    """Archived traffic answers reports, reads and exports like the live tables"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'archive.db'), storage=storage)
+        now = int(time.time() * 1000)
+        fill(logger, now, DAYS, ROWS, PROCESSES)
+
+        expected = snapshot(logger, now)
+        logger.cleanup_old_data(days=RETENTION, archive_days=365)
+        archived = logger.archive_horizon is not None and len(logger.partitions) <= RETENTION + 1
+        actual = snapshot(logger, now)
+
+        export_file = os.path.join(tmp, 'traffic.csv.gz')
+        ok, written = logger.export_data(export_file, 'traffic', None, None)
+        logger.close()
+
+        # Reopening picks the horizon up from the database
+        logger = DatabaseLogger(os.path.join(tmp, 'archive.db'), storage=storage)
+        reopened = same(expected[-2], logger.get_detailed_report_data(None, None))
+        logger.close()
+
+    mismatches = sum(not same(x, y) for x, y in zip(expected, actual))
+    assert archived, "expired days were not archived"
+    assert not mismatches, f"{mismatches} mismatching results"
+    assert ok and written == ROWS, f"export wrote {written} of {ROWS} rows"
+    assert reopened, "reopened logger reports differently"
+
+
+def test_archive_sqlite():
+    """Archived day partitions answer like the live tables"""
+    _archive_matches('sqlite')
+
+
+def test_archive_segments():
+    """Archived segment records answer like the live tables"""
+    _archive_matches('segments')
+
+
+def test_edge_blocks():
+    """A report decompresses only the blocks of the days holding its edges"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'edges.db'))
+        now = int(time.time() * 1000)
+        fill(logger, now, DAYS, ROWS, PROCESSES)
+        logger.cleanup_old_data(days=RETENTION, archive_days=365)
+
+        decoded = []
+        decode_block = database_logger.decode_block
+
+        def counting_decode(block, day, process_id):
+            decoded.append(day)
+            return decode_block(block, day, process_id)
+
+        database_logger.decode_block = counting_decode
+        try:
+            start = now - (DAYS - 1) * DAY_MS + 12345
+            end = now - (RETENTION + 5) * DAY_MS - 54321
+            logger.get_detailed_report_data(datetime.fromtimestamp(start / 1000),
+                                            datetime.fromtimestamp(end / 1000))
+        finally:
+            database_logger.decode_block = decode_block
+        logger.close()
+
+    edge_days = {start - start % DAY_MS, end - end % DAY_MS}
+    assert decoded and set(decoded) == edge_days, f"decoded days {sorted(set(decoded))}"
+
+
+def test_archive_retention():
+    """Archive blocks older than archive_days are deleted"""
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = DatabaseLogger(os.path.join(tmp, 'retention.db'))
+        now = int(time.time() * 1000)
+        fill(logger, now, DAYS, ROWS, PROCESSES)
+
+        recent = datetime.fromtimestamp((now - 2 * RETENTION * DAY_MS) / 1000)
+        before = logger.count_traffic_rows(recent, None)
+        logger.cleanup_old_data(days=RETENTION, archive_days=3 * RETENTION)
+        after = logger.count_traffic_rows(recent, None)
+        total = logger.count_traffic_rows()
+        logger.close()
+    assert before == after, "recent archived rows were deleted"
+    assert after < total < ROWS, "old archive blocks were kept"
+
+
+def test_plain_retention():
+    """Retention without an archive keeps the processes of the rows it keeps"""
+    for storage in ('sqlite', 'segments'):
+        with tempfile.TemporaryDirectory() as tmp:
+            logger = DatabaseLogger(os.path.join(tmp, 'plain.db'), storage=storage)
+            now = int(time.time() * 1000)
+            fill(logger, now, DAYS, ROWS // 10, PROCESSES)
+            # A process seen only on the cutoff day, before the cutoff: its
+            # day is kept, so its rows must stay attributed to it
+            cutoff_day = _partition_start(_partition_name(now - RETENTION * DAY_MS))
+            logger.import_traffic([(cutoff_day, 1, 'cutoff-day', 100, 200, 1.0, 2.0, 'DNS')])
+            logger.cleanup_old_data(days=RETENTION, archive_days=0)
+            # Reused process ids must not claim the kept rows either
+            logger.import_traffic([(now, 2, 'newcomer', 1, 1, 0.0, 0.0, 'DNS')])
+
+            count = logger.count_traffic_rows()
+            rows = list(logger.iter_traffic_rows())
+            logger.close()
+        names = [row[2] for row in rows if row[1] in (1, 2)]
+        assert count == len(rows), f"{storage}: {count} rows counted, {len(rows)} read"
+        assert sorted(names) == ['cutoff-day', 'newcomer'], f"{storage}: {names}"
+
+
+def main():
+    """Run the traffic archive tests"""
+    print("=" * 70)
+    print("Traffic archive tests")
+    print("=" * 70)
+
+    failed = 0
+    for test in (test_archive_sqlite, test_archive_segments, test_edge_blocks,
+                 test_archive_retention, test_plain_retention):
+        try:
+            test()
+            print(f"[OK] {test.__doc__}")
+        except AssertionError as e:
+            print(f"[FAIL] {test.__doc__}: {e}")
+            failed += 1
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
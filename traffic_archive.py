@@ -0,0 +1,106 @@
+"""
+Traffic Archive Module
+Encodes traffic rows as column-oriented, delta/varint-encoded, compressed blocks
+"""
+
+import struct
+import zlib
+from itertools import accumulate, repeat
+
+from config import ARCHIVE_COMPRESSION_LEVEL
+
+# First byte of every block, bumped if the layout ever changes
+BLOCK_VERSION = 1
+
+
+def _zigzag(value):
+    """Map a signed integer to an unsigned one: 0, -1, 1, -2 -> 0, 1, 2, 3"""
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value):
+    """Inverse of _zigzag"""
+    return -((value + 1) >> 1) if value & 1 else value >> 1
+
+
+def _write_varints(out, values):
+    """Append unsigned integers to a bytearray as LEB128 varints"""
+    append = out.append
+    for value in values:
+        while value > 0x7f:
+            append(value & 0x7f | 0x80)
+            value >>= 7
+        append(value)
+
+
+def _read_varints(data, position, count):
+    """Read count varints starting at position; returns (values, next position)"""
+    values = []
+    if not count:
+        return values, position
+    append = values.append
+    value = shift = 0
+    consumed = 0
+    for byte in data[position:]:
+        consumed += 1
+        if byte & 0x80:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        else:
+            append(value | byte << shift)
+            value = shift = 0
+            if len(values) == count:
+                break
+    return values, position + consumed
+
+
+def encode_block(rows, day):
+    """
+    Encode traffic rows (timestamp, process_id, upload_bytes,
+    download_bytes, upload_rate, download_rate, protocol_set_id) of one
+    process and day. Each column is stored whole, one after the other:
+    timestamps as varint deltas from the previous row (the first from
+    day), byte counts as varints, rates as little-endian doubles and
+    protocol set ids as varints (0 for none), then zlib-compressed.
+    """
+    count = len(rows)
+    timestamps, _, uploads, downloads, upload_rates, download_rates, protocol_set_ids = zip(*rows)
+
+    out = bytearray()
+    _write_varints(out, (count,))
+    _write_varints(out, [_zigzag(timestamp - previous) for timestamp, previous
+                         in zip(timestamps, (day,) + timestamps[:-1])])
+    _write_varints(out, map(_zigzag, uploads))
+    _write_varints(out, map(_zigzag, downloads))
+    out += struct.pack(f'<{count}d', *upload_rates)
+    out += struct.pack(f'<{count}d', *download_rates)
+    _write_varints(out, [0 if protocol_set_id is None else protocol_set_id + 1
+                         for protocol_set_id in protocol_set_ids])
+    return bytes((BLOCK_VERSION,)) + zlib.compress(bytes(out), ARCHIVE_COMPRESSION_LEVEL)
+
+
+def decode_block(block, day, process_id):
+    """Decode a block written by encode_block back into its rows"""
+    if block[0] != BLOCK_VERSION:
+        raise ValueError(f"Unknown archive block version: {block[0]}")
+    data = zlib.decompress(block[1:])
+
+    (count,), position = _read_varints(data, 0, 1)
+    deltas, position = _read_varints(data, position, count)
+    uploads, position = _read_varints(data, position, count)
+    downloads, position = _read_varints(data, position, count)
+    upload_rates = struct.unpack_from(f'<{count}d', data, position)
+    position += 8 * count
+    download_rates = struct.unpack_from(f'<{count}d', data, position)
+    position += 8 * count
+    protocol_set_ids, position = _read_varints(data, position, count)
+
+    timestamps = accumulate(map(_unzigzag, deltas), initial=day)
+    next(timestamps)
+    return list(zip(
+        timestamps, repeat(process_id),
+        map(_unzigzag, uploads), map(_unzigzag, downloads),
+        upload_rates, download_rates,
+        [protocol_set_id - 1 if protocol_set_id else None
+         for protocol_set_id in protocol_set_ids]
+    ))